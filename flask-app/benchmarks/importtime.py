@@ -0,0 +1,92 @@
+"""Profiles ``import client_labs.app`` and checks it against a startup budget.
+
+Usage (from flask-app/):
+
+    python -m benchmarks.importtime                       # report and check
+    python -m benchmarks.importtime --budget-ms 300 --top 30
+    python -m benchmarks.importtime --module client_labs.database
+
+Each run imports the module (and, unless ``--no-create-app``, calls
+``create_app()``) in a fresh interpreter under ``python -X importtime``, and
+the fastest of ``--runs`` is kept. The report lists the slowest modules by
+cumulative import time. The check fails (exit status 1) when the import plus
+``create_app()`` takes longer than ``--budget-ms``, or when any module in
+``--forbid`` (the dependencies that should only load on first use) was
+imported.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+FORBIDDEN = ('libsql_client', 'aiohttp', 'authlib', 'cryptography', 'requests', 'sitemap_tool', 'rich')
+
+CHILD = """
+import sys, json, time
+started = time.perf_counter()
+import {module} as target
+if {create_app}:
+    target.create_app()
+elapsed = time.perf_counter() - started
+print(json.dumps([elapsed, sorted(m for m in sys.modules if m.split('.')[0] in {forbid!r})]))
+"""
+
+
+def parse_importtime(stderr):
+    """Returns ``(cumulative_us, module)`` pairs from ``-X importtime`` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line.split(':', 1)[1].split('|'))
+        rows.append((int(cumulative_us), name))
+    return rows
+
+
+def profile(module, create_app, forbid):
+    """Runs one fresh interpreter and returns (seconds, forbidden imports, rows)."""
+    code = CHILD.format(module=module, create_app=create_app, forbid=tuple(forbid))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, ['.', os.environ.get('PYTHONPATH')])))
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          capture_output=True, text=True, env=env, check=True)
+    elapsed, loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+    return elapsed, loaded, parse_importtime(proc.stderr)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--module', default='client_labs.app')
+    parser.add_argument('--no-create-app', dest='create_app', action='store_false')
+    parser.add_argument('--budget-ms', type=float, default=300)
+    parser.add_argument('--forbid', action='append', help='Top-level packages that must not be imported.')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=20)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    forbid = args.forbid or list(FORBIDDEN)
+    create_app = args.create_app and args.module == 'client_labs.app'
+    runs = [profile(args.module, create_app, forbid) for _ in range(args.runs)]
+    elapsed, loaded, rows = min(runs, key=lambda run: run[0])
+
+    print(f"{'cumulative ms':>14}  module")
+    for cumulative_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f}  {name}")
+    what = f"import {args.module}" + (" + create_app()" if create_app else "")
+    print(f"\n{what}: {elapsed * 1000:.0f} ms (budget {args.budget_ms:.0f} ms, best of {args.runs})")
+
+    failures = []
+    if elapsed * 1000 > args.budget_ms:
+        failures.append(f"over budget by {elapsed * 1000 - args.budget_ms:.0f} ms")
+    if loaded:
+        failures.append(f"imported eagerly: {', '.join(loaded)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
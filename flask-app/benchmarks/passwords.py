@@ -0,0 +1,99 @@
+"""Measures password-verification throughput per core.
+
+Usage (from flask-app/):
+
+    python -m benchmarks.passwords                              # calibrated scrypt
+    python -m benchmarks.passwords --algorithm pbkdf2 --work-factor 600000 --target-ms 0
+    python -m benchmarks.passwords --threads 1 --threads 4 --threads 16 --seconds 10
+
+Each row drives ``PasswordHasher.verify`` from ``--threads`` caller threads
+for ``--seconds``, with the hasher's pool limited to ``--max-concurrency``
+(the CPU count by default), and reports verifications per second, per core,
+and the p50/p95 latency seen by callers. Callers beyond the pool size queue,
+so latency grows with threads while throughput should stay flat; that is
+the bounded behaviour a login burst gets. The end-to-end ``login`` scenario
+in ``benchmarks.run`` covers the rest of the request.
+"""
+import os
+import time
+import argparse
+import threading
+from werkzeug.security import generate_password_hash
+from client_labs.passwords import PasswordHasher, HasherBusy, DEFAULT_WORK_FACTORS
+from .run import percentile
+
+PASSWORD = 'bench-password'
+
+
+def run(hasher, pwhash, threads, seconds):
+    """Verifies ``pwhash`` from ``threads`` threads for ``seconds`` and summarises it."""
+    latencies, rejected = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        local = []
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                hasher.verify(pwhash, PASSWORD)
+            except HasherBusy:
+                with lock:
+                    rejected[0] += 1
+                continue
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    rate = len(latencies) / elapsed
+    return {
+        'threads': threads,
+        'verifications': len(latencies),
+        'rejected': rejected[0],
+        'per_second': round(rate, 1),
+        'per_core': round(rate / hasher.max_concurrency, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+    }
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--algorithm', choices=sorted(DEFAULT_WORK_FACTORS), default='scrypt')
+    parser.add_argument('--work-factor', type=int, help='log2(N) for scrypt, iterations for pbkdf2.')
+    parser.add_argument('--target-ms', type=float, default=250, help='Calibration target (0 disables).')
+    parser.add_argument('--max-concurrency', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads', type=int, action='append', help='Caller threads (repeatable).')
+    parser.add_argument('--seconds', type=float, default=5)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    hasher = PasswordHasher(args.algorithm, args.work_factor, args.target_ms,
+                            max_concurrency=args.max_concurrency, max_pending=1024, queue_timeout=60)
+    started = time.perf_counter()
+    method = hasher.method
+    print(f"Method {method} (calibrated in {time.perf_counter() - started:.2f}s), "
+          f"pool of {hasher.max_concurrency} on {os.cpu_count()} CPUs")
+    pwhash = generate_password_hash(PASSWORD, method=method)
+
+    print(f"{'threads':>8}{'verifs':>8}{'busy':>6}{'verif/s':>10}{'per core':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for threads in args.threads or sorted({1, hasher.max_concurrency, hasher.max_concurrency * 4}):
+        r = run(hasher, pwhash, threads, args.seconds)
+        print(f"{r['threads']:>8}{r['verifications']:>8}{r['rejected']:>6}{r['per_second']:>10}"
+              f"{r['per_core']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}")
+    hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
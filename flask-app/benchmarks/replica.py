@@ -0,0 +1,62 @@
+"""Compares user-lookup latency on the primary and on the local read replica.
+
+Usage (from flask-app/):
+
+    TURSO_DATABASE_URL=libsql://... TURSO_AUTH_TOKEN=... \\
+        python -m benchmarks.replica --replica /tmp/replica.db
+    python -m benchmarks.replica --lookups 5000          # file: stand-in primary
+
+Runs ``SELECT * FROM users WHERE id = ?`` ``--lookups`` times through
+``get_db_connection`` (the primary) and through the replica after one sync,
+and reports the p50/p95 latency of each. Without TURSO_DATABASE_URL a
+temporary ``file:`` database stands in for the primary, which shows the
+replica's floor but not the network round trip it saves.
+"""
+import os
+import time
+import argparse
+import tempfile
+from .run import percentile
+
+
+def measure(connect, user_id, lookups):
+    latencies = []
+    for _ in range(lookups):
+        started = time.perf_counter()
+        with connect() as client:
+            client.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return percentile(latencies, 50) * 1e6, percentile(latencies, 95) * 1e6
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--replica', help='Replica file (default: a temporary file).')
+    parser.add_argument('--lookups', type=int, default=2000)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scratch = tempfile.mkdtemp(prefix='replica-bench-')
+    os.environ.setdefault('TURSO_DATABASE_URL', f"file:{os.path.join(scratch, 'primary.db')}")
+    from client_labs import database
+    from client_labs.migrations import migrate
+    from client_labs.replica import Replica
+
+    migrate()
+    with database.get_db_connection() as client:
+        client.execute("INSERT OR IGNORE INTO users (email, name) VALUES ('bench@example.com', 'Bench')")
+        user_id = client.execute("SELECT id FROM users WHERE email = 'bench@example.com'").rows[0][0]
+    replica = Replica(args.replica or os.path.join(scratch, 'replica.db'), max_lag=3600)
+    replica.sync()
+
+    print(f"{'reads from':>12}{'p50 us':>10}{'p95 us':>10}")
+    for name, connect in (('primary', database.get_db_connection), ('replica', replica.client)):
+        p50, p95 = measure(connect, user_id, args.lookups)
+        print(f"{name:>12}{p50:>10.0f}{p95:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,395 @@
+"""Load-tests the portal against a local ``file:`` database.
+
+Usage (from flask-app/):
+
+    python -m benchmarks.run                              # every scenario
+    python -m benchmarks.run -s dashboard -s logs --log-rows 1000000
+    python -m benchmarks.run --save-baseline benchmarks/baselines/local.json
+    python -m benchmarks.run --baseline benchmarks/baselines/local.json --threshold 0.15
+
+The app is served in a subprocess (Werkzeug's threaded server, or gunicorn
+with ``--server gunicorn``) and driven with keep-alive ``http.client``
+connections from ``--concurrency`` threads. Each scenario reports p50/p95/p99
+latency and requests per second. With ``--baseline``, the run fails (exit
+status 1) when a scenario's p95 grows, or its throughput drops, by more than
+``--threshold`` relative to the saved numbers.
+"""
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import shutil
+import socket
+import sqlite3
+import argparse
+import tempfile
+import platform
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlencode
+
+BENCH_EMAIL = 'bench@example.com'
+BENCH_PASSWORD = 'bench-password'
+TOOL_NAMES = ('word_count', 'sitemap_processor', 'batch_word_count')
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled', 'timed_out')
+WORDS = ('lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do')
+
+
+# --- Database seeding ---
+
+def seed_database(db_path, log_rows, batch_size=10000):
+    """Creates the schema, the benchmark user and ``log_rows`` audit-log rows."""
+    from werkzeug.security import generate_password_hash
+    from client_labs import database
+
+    database.init_db()
+    with database.get_db_connection() as client:
+        client.execute(
+            "INSERT INTO users (email, name, password_hash) VALUES (?, ?, ?)",
+            (BENCH_EMAIL, 'Benchmark User', generate_password_hash(BENCH_PASSWORD))
+        )
+    database.close_pools()
+
+    # Bulk rows go straight through sqlite3: seeding isn't what's measured.
+    rng = random.Random(1234)
+    start = time.mktime((2024, 1, 1, 0, 0, 0, 0, 0, -1))
+    with sqlite3.connect(db_path) as conn:
+        for offset in range(0, log_rows, batch_size):
+            rows = []
+            for i in range(offset, min(offset + batch_size, log_rows)):
+                text = ' '.join(rng.choices(WORDS, k=rng.randint(5, 200)))
+                timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start + i * 30))
+                rows.append((timestamp, TOOL_NAMES[i % len(TOOL_NAMES)], text, str(len(text.split()))))
+            conn.executemany(
+                "INSERT INTO logs (timestamp, tool_name, input_data, output_data) VALUES (?, ?, ?, ?)", rows
+            )
+
+
+# --- Server ---
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, port, env):
+    if kind == 'gunicorn':
+        command = [
+            sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+            '--bind', f'127.0.0.1:{port}', '--access-logfile', '/dev/null',
+            'benchmarks.server:create_bench_app()',
+        ]
+    else:
+        command = [sys.executable, '-m', 'benchmarks.server', str(port)]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited early:\n{process.stderr.read().decode(errors='replace')}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/login')
+            conn.getresponse().read()
+            conn.close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Server did not start within 30 seconds")
+
+
+# --- HTTP client ---
+
+class Session:
+    """A keep-alive connection that carries the portal's session cookie."""
+
+    def __init__(self, port):
+        self.port = port
+        self.cookie = None
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=300)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+        if response.getheader('Connection', '').lower() == 'close':
+            self.conn.close()
+            self.conn = None
+        for header, value in response.getheaders():
+            if header.lower() == 'set-cookie' and value.startswith('session='):
+                self.cookie = value.split(';', 1)[0]
+        return response.status, data
+
+    def post_form(self, path, fields):
+        return self.request('POST', path, urlencode(fields),
+                            {'Content-Type': 'application/x-www-form-urlencoded'})
+
+    def login(self):
+        status, _ = self.post_form('/login', {'email': BENCH_EMAIL, 'password': BENCH_PASSWORD})
+        if status != 302 or not self.cookie:
+            raise RuntimeError(f"Benchmark login failed with status {status}")
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+# --- Scenarios ---
+
+def scenario_login(session, i):
+    session.cookie = None
+    return session.post_form('/login', {'email': BENCH_EMAIL, 'password': BENCH_PASSWORD})[0] == 302
+
+
+def scenario_dashboard(session, i):
+    return session.request('GET', '/')[0] == 200
+
+
+def scenario_tool_1(session, i):
+    text = ' '.join(WORDS[(i + n) % len(WORDS)] for n in range(200))
+    return session.post_form('/tool-1', {'text_input': text})[0] == 200
+
+
+def scenario_logs(session, i):
+    # Alternate between the unfiltered first page and a per-tool page.
+    if i % 2:
+        path = '/logs?' + urlencode({'tool_name': TOOL_NAMES[i % len(TOOL_NAMES)]})
+    else:
+        path = '/logs'
+    return session.request('GET', path)[0] == 200
+
+
+def synthetic_sitemap(url_count, seed):
+    urls = [f'https://bench.example/{seed}/page-{n}' for n in range(url_count)]
+    empty = '\n'.join(urls[::10]) + '\n'
+    return json.dumps({'startUrl': urls}).encode(), empty.encode()
+
+
+def make_sitemap_scenario(url_count):
+    def scenario_sitemap(session, i):
+        sitemap, empty = synthetic_sitemap(url_count, i)
+        body, content_type = multipart(
+            {'job_name': f'bench-{i}', 'new_sitemap_filename': 'new.xml'},
+            {'old_sitemap_file': ('old.xml', sitemap), 'empty_pages_file': ('empty.txt', empty)},
+        )
+        status, data = session.request('POST', '/tools/sitemap-processor', body,
+                                       {'Content-Type': content_type, 'Accept': 'application/json'})
+        if status != 202:
+            return False
+        status_url = json.loads(data)['status_url']
+        while True:
+            status, data = session.request('GET', status_url)
+            job = json.loads(data) if status == 200 else {}
+            if job.get('status') in FINISHED_STATUSES:
+                return job['status'] == 'succeeded'
+            time.sleep(0.05)
+    return scenario_sitemap
+
+
+def build_scenarios(args):
+    """Maps scenario name to (request function, request count, needs login)."""
+    return {
+        'login': (scenario_login, args.requests, False),
+        'dashboard': (scenario_dashboard, args.requests, True),
+        'tool-1': (scenario_tool_1, args.requests, True),
+        'logs': (scenario_logs, args.requests, True),
+        'sitemap': (make_sitemap_scenario(args.sitemap_urls), args.sitemap_jobs, True),
+    }
+
+
+# --- Measurement ---
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank method.
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def run_scenario(port, func, count, needs_login, concurrency, warmup):
+    """Issues ``count`` requests from ``concurrency`` threads and summarises them."""
+    sessions = [Session(port) for _ in range(min(concurrency, max(count, 1)))]
+    if needs_login:
+        for session in sessions:
+            session.login()
+    for n in range(warmup):
+        func(sessions[n % len(sessions)], -1 - n)
+
+    latencies, errors = [], []
+    counter = iter(range(count))
+    counter_lock = threading.Lock()
+
+    def worker(session):
+        while True:
+            with counter_lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                ok = func(session, i)
+            except Exception as e:
+                ok = False
+                print(f"  request {i} raised {e!r}", file=sys.stderr)
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors.append(i)
+
+    threads = [threading.Thread(target=worker, args=(session,)) for session in sessions]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    for session in sessions:
+        session.close()
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'concurrency': len(sessions),
+        'rps': round(len(latencies) / wall, 2) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round((latencies[-1] if latencies else 0.0) * 1000, 2),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Returns a description of every scenario that regressed past ``threshold``."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {current['p95_ms']}ms vs baseline {previous['p95_ms']}ms")
+        if previous['rps'] and current['rps'] < previous['rps'] * (1 - threshold):
+            regressions.append(f"{name}: {current['rps']} req/s vs baseline {previous['rps']} req/s")
+        if current['errors'] > previous.get('errors', 0):
+            regressions.append(f"{name}: {current['errors']} errors vs baseline {previous.get('errors', 0)}")
+    return regressions
+
+
+def print_report(results):
+    print(f"{'scenario':<12}{'reqs':>7}{'errs':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<12}{r['requests']:>7}{r['errors']:>6}{r['rps']:>10}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-s', '--scenario', action='append', dest='scenarios',
+                        choices=('login', 'dashboard', 'tool-1', 'logs', 'sitemap'),
+                        help='Scenario to run (repeatable; default: all).')
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn'), default='werkzeug')
+    parser.add_argument('-c', '--concurrency', type=int, default=8)
+    parser.add_argument('-n', '--requests', type=int, default=500, help='Requests per scenario.')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--log-rows', type=int, default=10000, help='Audit-log rows to seed.')
+    parser.add_argument('--sitemap-urls', type=int, default=50000)
+    parser.add_argument('--sitemap-jobs', type=int, default=5)
+    parser.add_argument('-o', '--output', help='Write the results as JSON.')
+    parser.add_argument('--save-baseline', help='Write the results as a new baseline.')
+    parser.add_argument('--baseline', help='Baseline to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed relative regression before failing (default: 0.2).')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = build_scenarios(args)
+    selected = args.scenarios or list(scenarios)
+
+    workdir = tempfile.mkdtemp(prefix='portal-bench-')
+    db_path = os.path.join(workdir, 'bench.db')
+    env = dict(os.environ, TURSO_DATABASE_URL=f'file:{db_path}', SITEMAP_SCRATCH_DIR=os.path.join(workdir, 'uploads'),
+               GUNICORN_INIT_DB='false', GUNICORN_PRELOAD='true')
+    env.pop('TURSO_AUTH_TOKEN', None)
+    os.environ.update(TURSO_DATABASE_URL=env['TURSO_DATABASE_URL'])
+
+    print(f"Seeding {args.log_rows} log rows into {db_path} ...")
+    seed_database(db_path, args.log_rows)
+
+    port = free_port()
+    server = start_server(args.server, port, env)
+    results = {}
+    try:
+        for name in selected:
+            func, count, needs_login = scenarios[name]
+            warmup = 1 if name == 'sitemap' else args.warmup
+            concurrency = 1 if name == 'sitemap' else args.concurrency
+            print(f"Running {name} ({count} requests) ...")
+            results[name] = run_scenario(port, func, count, needs_login, concurrency, warmup)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'server': args.server,
+        'log_rows': args.log_rows,
+        'scenarios': results,
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,35 @@
+"""Serves the portal for benchmark runs.
+
+Started as a subprocess by ``benchmarks.run`` so the load generator and the
+app don't share a GIL. Either Werkzeug's threaded server or gunicorn (through
+``create_bench_app``) can be used.
+"""
+import os
+import sys
+from config import Config
+from client_labs.app import create_app
+
+
+class BenchmarkConfig(Config):
+    """Production defaults, minus what a stdlib HTTP client can't drive."""
+    SECRET_KEY = os.environ.get('FLASK_SECRET_KEY') or 'benchmark-secret'
+    WTF_CSRF_ENABLED = False
+    SESSION_COOKIE_SECURE = False
+    # Every sitemap job should do the work, not hit the result cache.
+    SITEMAP_CACHE_ENABLED = False
+
+
+def create_bench_app():
+    return create_app(BenchmarkConfig)
+
+
+def main(argv):
+    from werkzeug.serving import make_server
+
+    port = int(argv[1])
+    server = make_server('127.0.0.1', port, create_bench_app(), threaded=True)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -1,74 +1,234 @@
 import os
 import hmac
+import time
 from functools import wraps
-from flask import Flask, render_template, request, redirect, url_for, session, flash, g, Blueprint
-from .auth import login_required, RegistrationForm, LoginForm
-from .tools import word_count
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.exceptions import RequestEntityTooLarge
+from flask_wtf.csrf import generate_csrf
+from flask import Flask, render_template, request, redirect, url_for, session, flash, g, Blueprint, abort, jsonify, Response, stream_with_context, current_app
+from .auth import login_required, csrf_required, RegistrationForm, LoginForm
+from .tools import analyze_text, analyze_stream
+from .cache import TTLCache
 from . import database
+from . import log_store
+from . import metrics
+from . import assets
+from . import replica
+from . import log_rollups
+from .jobs import job_queue
+from .log_writer import log_writer
+from .passwords import password_hasher, HasherBusy
+from .ratelimit import limiter, rate_limit, body_cost
+from .batch import batch_analyzer, batch_word_count_command, to_csv
+from .uploads import UploadRequest
+from .scheduler import PeriodicTask
+from .blueprints.sitemap_tool.workspace import sweep_uploads_command, sweep_from_config
 from .database import init_db_command
+from .migrations import migrate_command
+from . import log_export
+from .log_export import export_logs_command
+from . import log_retention
 from .blueprints.sitemap_tool.routes import sitemap_tool_bp
-from authlib.integrations.flask_client import OAuth
+from .oauth_cache import LazyOAuth, discovery_cache
 
-app = Flask(__name__)
-app.cli.add_command(init_db_command)
+# --- Extensions ---
+
+# Authlib is imported when a client is first used; Google's discovery
+# metadata and signing keys are read through a shared cache.
+oauth = LazyOAuth()
+
+# Users keyed by id, so most requests skip the users-table round trip.
+# Sized from the app config in create_app().
+user_cache = TTLCache()
+
+# The dashboard's usage stats, shared by every user for DASHBOARD_STATS_TTL seconds.
+dashboard_cache = TTLCache(max_size=1)
 
 # --- Blueprints --- 
 
 # Blueprint for client-specific static files (CSS)
 client_labs_bp = Blueprint('client_labs', __name__,
                            static_folder='static', static_url_path='/client_labs/static')
-app.register_blueprint(client_labs_bp)
 
 # Blueprint for shared, main-site assets (logo, main CSS)
 main_assets_bp = Blueprint('main_assets', __name__, 
                            static_folder=os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'main-site', 'assets')),
                            static_url_path='/assets')
-app.register_blueprint(main_assets_bp)
-
-# Register other functional blueprints
-app.register_blueprint(sitemap_tool_bp)
 
-
-# --- App Configuration ---
-
-app.config.from_object('config.DevelopmentConfig')
-oauth = OAuth(app)
-oauth.register(
-    name='google',
-    client_id=app.config.get('GOOGLE_CLIENT_ID'),
-    client_secret=app.config.get('GOOGLE_CLIENT_SECRET'),
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-    client_kwargs={'scope': 'openid email profile'},
-)
+# Blueprint for the portal's own pages
+main_bp = Blueprint('main', __name__)
+
+# Characters of a tool's input kept in the audit log.
+LOG_PREVIEW_CHARS = 1000
+# Pasted text longer than this is counted but not sent back in the form.
+ECHO_MAX_CHARS = 20000
+
+# Columns safe to keep in the (signed, but readable) session cookie.
+SESSION_USER_FIELDS = ('id', 'email', 'name', 'google_id')
+
+def create_app(config_object='config.DevelopmentConfig'):
+    """Creates and configures a Flask application for the client portal."""
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+    app.request_class = UploadRequest
+    # For POST forms checked by auth.csrf_required rather than a FlaskForm.
+    app.jinja_env.globals['csrf_token'] = generate_csrf
+
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(export_logs_command)
+    app.cli.add_command(sweep_uploads_command)
+    app.cli.add_command(batch_word_count_command)
+    app.cli.add_command(log_retention.prune_logs_command)
+    app.cli.add_command(replica.sync_replica_command)
+    app.cli.add_command(log_rollups.backfill_rollups_command)
+
+    app.register_blueprint(client_labs_bp)
+    app.register_blueprint(main_assets_bp)
+    app.register_blueprint(main_bp)
+    app.register_blueprint(sitemap_tool_bp)
+    assets.init_app(app)
+
+    discovery_cache.init_app(app)
+    oauth.init_app(app)
+    oauth.register(
+        name='google',
+        client_id=app.config.get('GOOGLE_CLIENT_ID'),
+        client_secret=app.config.get('GOOGLE_CLIENT_SECRET'),
+        server_metadata_url=app.config['GOOGLE_DISCOVERY_URL'],
+        client_kwargs={'scope': 'openid email profile'},
+        overwrite=True,
+    )
+
+    user_cache.max_size = app.config['USER_CACHE_MAX_SIZE']
+    user_cache.ttl = app.config['USER_CACHE_TTL']
+    dashboard_cache.ttl = app.config['DASHBOARD_STATS_TTL']
+    job_queue.init_app(app)
+    log_writer.init_app(app)
+    batch_analyzer.init_app(app)
+    password_hasher.init_app(app)
+    limiter.init_app(app)
+    metrics.init_app(app)
+    metrics.register_cache('user', user_cache)
+    metrics.register_cache('dashboard', dashboard_cache)
+    app.extensions['upload_sweeper'] = PeriodicTask(
+        'upload-sweeper', app.config['UPLOAD_SWEEP_INTERVAL'], lambda: sweep_from_config(app)
+    )
+    app.extensions['replica_sync'] = PeriodicTask(
+        'replica-sync', replica.sync_interval(), replica.sync_configured
+    )
+    app.extensions['log_retention'] = PeriodicTask(
+        'log-retention', app.config['LOG_RETENTION_INTERVAL'], lambda: log_retention.run_from_config(app)
+    )
+    return app
 
 def setup_app(app):
     # Initialize database
     with app.app_context():
         database.init_db()
 
-@app.before_request
+# How long a request waits for its queued audit-log record before stamping the session.
+# Allowance for the log writer's commit itself, on top of its flush interval.
+LOG_COMMIT_MARGIN_SECONDS = 0.5
+
+def note_write(queued=False):
+    """Records that this session wrote, so its reads skip a replica that hasn't caught up.
+
+    ``queued`` writes went to the async log writer and are committed on its
+    next flush; rather than wait for that, the stamp is moved past it, so
+    the session reads the primary until a sync that started afterwards.
+    """
+    if replica.get_replica() is None:
+        return
+    written_at = time.time()
+    if queued and log_writer.mode != 'sync':
+        written_at += log_writer.flush_interval + LOG_COMMIT_MARGIN_SECONDS
+    session['db_written_at'] = written_at
+
+def read_connection():
+    """A connection for this request's reads (the local replica, when it is fresh enough)."""
+    return database.get_read_connection(session.get('db_written_at'))
+
+def fetch_user(user_id):
+    """Loads a user row from the database as a dictionary."""
+    with read_connection() as client:
+        result_set = client.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+        user = result_set.rows[0] if result_set.rows else None
+        return dict(zip(result_set.columns, user)) if user else None
+
+def login_user(user_dict):
+    """Stores the user in the session (and the snapshot, if enabled)."""
+    session['user_id'] = user_dict['id']
+    if current_app.config['USER_SESSION_SNAPSHOT']:
+        session['user'] = {key: user_dict.get(key) for key in SESSION_USER_FIELDS}
+    user_cache.invalidate(user_dict['id'])
+
+def upgrade_password_hash(user_id, old_hash, password):
+    """Re-hashes a password with the current parameters after a successful login."""
+    try:
+        new_hash = password_hasher.hash(password)
+    except HasherBusy:
+        return  # Upgraded on a later login instead.
+    with database.get_db_connection() as client:
+        # Skipped if the password changed in the meantime.
+        client.execute(
+            "UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?",
+            (new_hash, user_id, old_hash)
+        )
+    note_write()
+    password_hasher.stats['rehashes'] += 1
+    user_cache.invalidate(user_id)
+
+def busy_response():
+    """Tells the client to retry when every password-hashing slot is taken."""
+    return Response("Too many sign-in attempts in progress, please retry shortly.",
+                    status=503, headers={'Retry-After': '1'}, mimetype='text/plain')
+
+@main_bp.before_app_request
+def start_background_tasks():
+    """Starts this worker's periodic maintenance threads on its first request."""
+    current_app.extensions['upload_sweeper'].ensure_running()
+    current_app.extensions['log_retention'].ensure_running()
+    current_app.extensions['replica_sync'].ensure_running()
+
+@main_bp.before_app_request
 def load_logged_in_user():
-    """If a user id is in the session, load the user object from
-    the database into g.user."""
-    user_id = session.get('user_id')
+    """If a user id is in the session, load the user object into g.user.
+
+    Static files never need the user. Otherwise the session snapshot is used
+    when enabled, then the user cache, and only then the database.
+    """
+    # Checked before touching the session, which would add "Vary: Cookie"
+    # and keep shared caches from storing static responses.
+    endpoint = request.endpoint or ''
+    if endpoint.endswith('static') or endpoint == 'assets.built':
+        g.user = None
+        return
 
+    user_id = session.get('user_id')
     if user_id is None:
         g.user = None
-    else:
-        with database.get_db_connection() as client:
-            result_set = client.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-            user = result_set.rows[0] if result_set.rows else None
-            g.user = dict(zip(result_set.columns, user)) if user else None
+        return
+
+    snapshot = session.get('user')
+    if current_app.config['USER_SESSION_SNAPSHOT'] and snapshot and snapshot.get('id') == user_id:
+        g.user = dict(snapshot)
+        return
+
+    user = user_cache.get_or_load(user_id, lambda: fetch_user(user_id))
+    g.user = dict(user) if user else None
 
 # --- Routes ---
-@app.route("/")
+@main_bp.route("/")
 @login_required
 def index():
-    """Renders the dashboard page."""
-    return render_template("dashboard.html")
+    """Renders the dashboard page with per-tool usage and recent activity."""
+    return render_template("dashboard.html", stats=dashboard_cache.get_or_load('stats', load_dashboard_stats))
+
+def load_dashboard_stats():
+    with database.get_db_connection() as client:
+        return log_rollups.dashboard_stats(client)
 
-@app.route("/login", methods=['GET', 'POST'])
+@main_bp.route("/login", methods=['GET', 'POST'])
 def login():
     """Handles user login."""
     form = LoginForm()
@@ -81,16 +241,23 @@ def login():
             user = result_set.rows[0] if result_set.rows else None
 
         user_dict = dict(zip(result_set.columns, user)) if user else None
-        if user_dict and user_dict.get('password_hash') and check_password_hash(user_dict['password_hash'], password):
-            session['user_id'] = user_dict['id']
-            return redirect(url_for('index'))
+        pwhash = user_dict.get('password_hash') if user_dict else None
+        try:
+            valid = password_hasher.verify(pwhash, password)
+        except HasherBusy:
+            return busy_response()
+        if valid:
+            if password_hasher.needs_rehash(pwhash):
+                upgrade_password_hash(user_dict['id'], pwhash, password)
+            login_user(user_dict)
+            return redirect(url_for('.index'))
         else:
             flash('Invalid email or password')
-            return redirect(url_for('login'))
+            return redirect(url_for('.login'))
 
     return render_template('login.html', form=form)
 
-@app.route('/register', methods=['GET', 'POST'])
+@main_bp.route('/register', methods=['GET', 'POST'])
 def register():
     """Handles user registration."""
     form = RegistrationForm()
@@ -102,26 +269,35 @@ def register():
             result_set = client.execute("SELECT * FROM users WHERE email = ?", (email,))
             user = result_set.rows[0] if result_set.rows else None
 
-            if user:
-                flash('Email address already exists')
-                return redirect(url_for('register'))
+        if user:
+            flash('Email address already exists')
+            return redirect(url_for('.register'))
 
-            client.execute(
+        # Hashed without holding a pooled connection.
+        try:
+            pwhash = password_hasher.hash(password)
+        except HasherBusy:
+            return busy_response()
+
+        with database.get_db_connection() as client:
+            result_set = client.execute(
                 "INSERT INTO users (email, password_hash) VALUES (?, ?)",
-                (email, generate_password_hash(password))
+                (email, pwhash)
             )
+            user_cache.invalidate(result_set.last_insert_rowid)
+        note_write()
 
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
 
     return render_template('register.html', form=form)
 
-@app.route('/login/google')
+@main_bp.route('/login/google')
 def google_login():
     """Redirects to Google's authorization page."""
-    redirect_uri = url_for('google_authorize', _external=True)
+    redirect_uri = url_for('.google_authorize', _external=True)
     return oauth.google.authorize_redirect(redirect_uri)
 
-@app.route('/login/google/callback')
+@main_bp.route('/login/google/callback')
 def google_authorize():
     """Handles the callback from Google."""
     token = oauth.google.authorize_access_token()
@@ -142,53 +318,163 @@ def google_authorize():
             )
             result_set = client.execute("SELECT * FROM users WHERE google_id = ?", (google_id,))
             user = result_set.rows[0] if result_set.rows else None
+            note_write()
 
     # Store the user's ID in the session by converting the row to a dictionary
     user_dict = dict(zip(result_set.columns, user))
-    session['user_id'] = user_dict['id']
+    login_user(user_dict)
 
-    return redirect(url_for('index'))
+    return redirect(url_for('.index'))
 
-@app.route("/logout")
+@main_bp.route("/logout")
 def logout():
     """Logs the user out."""
-    session.pop("user_id", None)
-    return redirect(url_for("login"))
+    user_id = session.pop("user_id", None)
+    session.pop("user", None)
+    if user_id is not None:
+        user_cache.invalidate(user_id)
+    return redirect(url_for('.login'))
 
-@app.route("/protected")
+@main_bp.route("/protected")
 @login_required
 def protected():
     """Renders the protected page."""
     return render_template("protected.html")
 
-@app.route("/tool-1", methods=["GET", "POST"])
+@main_bp.route("/tool-1", methods=["GET", "POST"])
 @login_required
+@rate_limit('word_count', limit='RATELIMIT_TOOL', cost=body_cost('RATELIMIT_BYTES_PER_TOKEN'),
+            max_concurrent='RATELIMIT_TOOL_MAX_CONCURRENT')
 def tool_1():
     """Renders the tool_1 page and handles form submission."""
     if request.method == "POST":
-        text = request.form.get("text_input")
-        result = word_count(text)
+        try:
+            upload = request.files.get("text_file")
+        except RequestEntityTooLarge:
+            # Werkzeug holds form fields in memory, so pastes are capped at
+            # MAX_FORM_MEMORY_SIZE; files are spooled and may be far larger.
+            config = current_app.config
+            flash(f"Pasted text is limited to {config['MAX_FORM_MEMORY_SIZE'] // 1000} KB and files to "
+                  f"{config['MAX_UPLOAD_FILE_BYTES'] // (1024 * 1024)} MB. "
+                  "Upload long documents as a file instead of pasting them.", 'danger')
+            return render_template("tool_1.html", result=None, stats=None, text_input=""), 413
+        if upload and upload.filename:
+            # Uploads are spooled to disk by UploadRequest; read them in chunks.
+            stats = analyze_stream(upload.stream, preview_chars=LOG_PREVIEW_CHARS)
+            text = ""
+        else:
+            text = request.form.get("text_input") or ""
+            stats = analyze_text(text, preview_chars=LOG_PREVIEW_CHARS)
 
-        # Log the interaction
-        with database.get_db_connection() as client:
-            client.execute(
-                "INSERT INTO logs (tool_name, input_data, output_data) VALUES (?, ?, ?)",
-                ("word_count", text, str(result))
-            )
+        # Log the interaction, keeping only a preview of large inputs
+        log_input = stats.preview
+        if stats.characters > len(stats.preview):
+            log_input += f"\n... [{stats.characters} characters in total]"
+        log_writer.write("word_count", log_input, str(stats.words))
+        note_write(queued=True)
 
-        return render_template("tool_1.html", result=result, text_input=text)
-    return render_template("tool_1.html", result=None, text_input="")
+        echo = text if len(text) <= ECHO_MAX_CHARS else ""
+        return render_template("tool_1.html", result=stats.words, stats=stats.as_dict(), text_input=echo)
+    return render_template("tool_1.html", result=None, stats=None, text_input="")
 
-@app.route("/logs")
+@main_bp.route("/tool-1/batch", methods=["POST"])
+@login_required
+@csrf_required
+@rate_limit('batch_word_count', limit='RATELIMIT_TOOL', cost=body_cost('RATELIMIT_BYTES_PER_TOKEN'),
+            max_concurrent='RATELIMIT_TOOL_MAX_CONCURRENT')
+def tool_1_batch():
+    """Counts words in several uploaded documents (or zip archives) in parallel."""
+    fmt = request.values.get("format", "json")
+    if fmt not in ("json", "csv"):
+        abort(400)
+    report = batch_analyzer.analyze_uploads(
+        request.files.getlist("files"), max_file_bytes=current_app.config['MAX_UPLOAD_FILE_BYTES']
+    )
+
+    # One multi-row insert for the whole batch
+    log_writer.write_many([
+        ("batch_word_count", doc['document'], f"Error: {doc['error']}" if doc['error'] else str(doc['words']))
+        for doc in report['documents']
+    ])
+    note_write(queued=True)
+
+    if fmt == "csv":
+        return Response(to_csv(report), mimetype="text/csv",
+                        headers={'Content-Disposition': 'attachment; filename="word-counts.csv"'})
+    return jsonify(report)
+
+@main_bp.route("/logs")
 @login_required
 def logs():
-    """Displays all logs from the database."""
-    with database.get_db_connection() as client:
-        result_set = client.execute("SELECT * FROM logs ORDER BY timestamp DESC")
-                    columns = [d.name for d in result_set.column_descriptions]
-                    logs = [dict(zip(columns, row)) for row in result_set.rows]    
-    return render_template("logs.html", logs=logs)
+    """Displays one page of logs, optionally filtered by tool and date range."""
+    filters = {
+        'tool_name': request.args.get('tool_name') or None,
+        'start': request.args.get('start') or None,
+        'end': request.args.get('end') or None,
+    }
+    cursor = request.args.get('cursor') or None
+    try:
+        filters['start'] = log_store.parse_date(filters['start'])
+        filters['end'] = log_store.parse_date(filters['end'])
+        if cursor:
+            log_store.decode_cursor(cursor)
+    except ValueError:
+        abort(400)
+
+    with read_connection() as client:
+        logs, next_cursor = log_store.list_logs(client, cursor=cursor, **filters)
+        tool_names = log_store.list_tool_names(client)
+    return render_template("logs.html", logs=logs, next_cursor=next_cursor,
+                           filters=filters, tool_names=tool_names,
+                           preview_chars=log_store.PREVIEW_CHARS)
+
+@main_bp.route("/logs/export")
+@login_required
+def export_logs():
+    """Streams the (optionally filtered) logs table as CSV or NDJSON."""
+    fmt = request.args.get('format', 'csv')
+    compress = request.args.get('gzip', '').lower() in ['true', '1', 't']
+    try:
+        start = log_store.parse_date(request.args.get('start'))
+        end = log_store.parse_date(request.args.get('end'))
+    except ValueError:
+        abort(400)
+    if fmt not in log_export.FORMATS:
+        abort(400)
+
+    chunks = log_export.export_logs(fmt, compress, request.args.get('tool_name') or None, start, end)
+    filename = log_export.export_filename(fmt, compress)
+    return Response(
+        stream_with_context(chunks),
+        mimetype='application/gzip' if compress else log_export.MIMETYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+@main_bp.route("/logs/<int:log_id>")
+@login_required
+def log_detail(log_id):
+    """Returns a single log entry with its full input and output."""
+    with read_connection() as client:
+        log = log_store.get_log(client, log_id)
+    if log is None:
+        abort(404)
+    if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+        return jsonify(log)
+    return render_template("log_detail.html", log=log)
+
+_app = None
+
+def __getattr__(name):
+    # ``client_labs.app:app`` (tests, ``flask --app client_labs.app``) is built
+    # on first access, so servers using ``create_app()`` only build one app.
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
+    app = create_app()
     setup_app(app)
     app.run(debug=app.config['DEBUG'])
\ No newline at end of file
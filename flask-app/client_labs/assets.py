@@ -0,0 +1,197 @@
+"""Fingerprinted, precompressed static assets.
+
+``flask build-assets`` copies the static files of the asset blueprints into
+ASSETS_BUILD_DIR under content-hashed names, next to gzip (and, when the
+``brotli`` package is installed, brotli) variants, and records them in a
+manifest. Templates call ``asset_url`` exactly like ``url_for``; when the
+file is in the manifest the fingerprinted URL is returned, which is served
+with an immutable Cache-Control, a strong ETag and the best encoding the
+client accepts. Files missing from the manifest (or every file, before the
+first build) fall back to the blueprints' regular static endpoints.
+
+CSS ``url()`` references are not rewritten; none of the current stylesheets
+use them.
+"""
+import os
+import gzip
+import json
+import shutil
+import hashlib
+import mimetypes
+import tempfile
+import click
+from flask import Blueprint, current_app, url_for, request, send_file, abort
+from flask.cli import with_appcontext
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip variants are always built.
+    brotli = None
+
+# Blueprints whose static folders are built.
+ASSET_BLUEPRINTS = ('client_labs', 'main_assets')
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'application/xml', 'image/svg+xml')
+MANIFEST_FILE = 'manifest.json'
+HASH_CHARS = 12
+ONE_YEAR = 365 * 24 * 3600
+
+assets_bp = Blueprint('assets', __name__)
+
+
+# --- Build ---
+
+def _compressible(filename):
+    mimetype = mimetypes.guess_type(filename)[0] or ''
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def _write_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build_assets(app, out_dir=None):
+    """Writes hashed and precompressed copies of every asset. Returns the manifest."""
+    out_dir = out_dir or build_dir(app)
+    manifest = {}
+    for name in ASSET_BLUEPRINTS:
+        blueprint = app.blueprints[name]
+        source_root = blueprint.static_folder
+        for dirpath, _, filenames in os.walk(source_root):
+            for filename in sorted(filenames):
+                if filename.startswith('.'):
+                    continue
+                source = os.path.join(dirpath, filename)
+                relative = os.path.relpath(source, source_root).replace(os.sep, '/')
+                with open(source, 'rb') as f:
+                    data = f.read()
+                digest = hashlib.sha256(data).hexdigest()[:HASH_CHARS]
+                stem, ext = os.path.splitext(relative)
+                hashed = f"{name}/{stem}.{digest}{ext}"
+                target = os.path.join(out_dir, *hashed.split('/'))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if not os.path.exists(target):
+                    _write_atomic(target, data)
+
+                encodings = []
+                if _compressible(filename):
+                    variants = [('gzip', '.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+                    if brotli is not None:
+                        variants.insert(0, ('br', '.br', lambda d: brotli.compress(d, quality=11)))
+                    for encoding, suffix, compress in variants:
+                        compressed = compress(data)
+                        # Not worth negotiating for tiny files that don't shrink.
+                        if len(compressed) < len(data):
+                            _write_atomic(target + suffix, compressed)
+                            encodings.append(encoding)
+
+                manifest.setdefault(name, {})[relative] = {
+                    'path': hashed,
+                    'etag': digest,
+                    'size': len(data),
+                    'encodings': encodings,
+                }
+    os.makedirs(out_dir, exist_ok=True)
+    _write_atomic(os.path.join(out_dir, MANIFEST_FILE), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    if 'assets' in app.extensions:
+        app.extensions['assets'] = AssetManifest(manifest)
+    return manifest
+
+
+def build_dir(app):
+    return app.config.get('ASSETS_BUILD_DIR') or os.path.join(app.root_path, 'static-build')
+
+
+@click.command('build-assets')
+@click.option('--clean', is_flag=True, help='Remove previously built files first.')
+@with_appcontext
+def build_assets_command(clean):
+    """Writes fingerprinted, precompressed copies of the static assets."""
+    out_dir = build_dir(current_app)
+    if clean:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    manifest = build_assets(current_app, out_dir)
+    count = sum(len(files) for files in manifest.values())
+    click.echo(f"Built {count} assets into {out_dir}" + ("" if brotli else " (brotli not installed; gzip only)"))
+
+
+# --- Manifest ---
+
+class AssetManifest:
+    """The built manifest, indexed by (blueprint, filename) and by hashed path."""
+
+    def __init__(self, entries=None):
+        self.entries = entries or {}
+        self.by_path = {
+            entry['path']: entry for files in self.entries.values() for entry in files.values()
+        }
+
+    @classmethod
+    def load(cls, directory):
+        try:
+            with open(os.path.join(directory, MANIFEST_FILE), encoding='utf-8') as f:
+                return cls(json.load(f))
+        except FileNotFoundError:
+            return cls()
+
+    def lookup(self, blueprint, filename):
+        return self.entries.get(blueprint, {}).get(filename)
+
+
+def asset_url(endpoint, **values):
+    """``url_for`` that prefers fingerprinted URLs for built static assets."""
+    blueprint, _, view = endpoint.rpartition('.')
+    manifest = current_app.extensions.get('assets')
+    if manifest is not None and view == 'static' and 'filename' in values:
+        entry = manifest.lookup(blueprint, values['filename'])
+        if entry is not None:
+            values = {key: value for key, value in values.items() if key != 'filename'}
+            return url_for('assets.built', filename=entry['path'], **values)
+    return url_for(endpoint, **values)
+
+
+# --- Serving ---
+
+def _pick_encoding(available):
+    accepted = request.accept_encodings
+    best, best_quality = None, 0
+    for encoding in available:
+        quality = accepted.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+@assets_bp.route('/static-build/<path:filename>')
+def built(filename):
+    """Serves a fingerprinted asset, precompressed if the client accepts it."""
+    manifest = current_app.extensions.get('assets')
+    entry = manifest.by_path.get(filename) if manifest is not None else None
+    if entry is None:
+        abort(404)
+    path = os.path.join(build_dir(current_app), *filename.split('/'))
+    encoding = _pick_encoding(entry['encodings'])
+    if encoding is not None:
+        path += '.br' if encoding == 'br' else '.gz'
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    etag = entry['etag'] + (f'-{encoding}' if encoding else '')
+    response = send_file(path, mimetype=mimetype, etag=etag, conditional=True, max_age=ONE_YEAR)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    if entry['encodings']:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    """Registers the build command, the asset route and the ``asset_url`` template helper."""
+    app.cli.add_command(build_assets_command)
+    app.register_blueprint(assets_bp)
+    app.jinja_env.globals['asset_url'] = asset_url
+    if app.config.get('ASSETS_ENABLED', True):
+        app.extensions['assets'] = AssetManifest.load(build_dir(app))
@@ -1,6 +1,8 @@
 from functools import wraps
-from flask import redirect, url_for, g
+from flask import redirect, url_for, g, request, current_app, abort
 from flask_wtf import FlaskForm
+from flask_wtf.csrf import validate_csrf
+from wtforms import ValidationError
 from wtforms import StringField, PasswordField, SubmitField
 from wtforms.validators import DataRequired, Email, EqualTo
 
@@ -21,6 +23,23 @@ def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if g.user is None:
-            return redirect(url_for("login"))
+            return redirect(url_for("main.login"))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def csrf_required(f):
+    """Checks the CSRF token of POSTs that don't go through a FlaskForm.
+
+    The token comes from the ``csrf_token`` form field (``{{ csrf_token() }}``
+    in templates) or an X-CSRFToken header, and is skipped when
+    WTF_CSRF_ENABLED is off, as FlaskForm does.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if request.method == "POST" and current_app.config.get('WTF_CSRF_ENABLED', True):
+            try:
+                validate_csrf(request.form.get('csrf_token') or request.headers.get('X-CSRFToken'))
+            except ValidationError as e:
+                abort(400, e.args[0])
         return f(*args, **kwargs)
     return decorated_function
\ No newline at end of file
@@ -0,0 +1,174 @@
+import io
+import os
+import csv
+import json
+import shutil
+import zipfile
+import tempfile
+import threading
+import click
+from werkzeug.exceptions import RequestEntityTooLarge, BadRequest
+from .jobs import BACKENDS
+from .tools import analyze_stream
+from .uploads import save_upload
+
+CSV_FIELDS = ('document', 'words', 'characters', 'lines', 'unique_words', 'error')
+
+
+# --- Documents ---
+
+def analyze_document(path, member=None, top_n=10):
+    """Analyzes a file, or one member of a zip archive. Runs on pool workers."""
+    try:
+        if member is None:
+            with open(path, 'rb') as f:
+                stats = analyze_stream(f, top_n=top_n)
+        else:
+            with zipfile.ZipFile(path) as archive, archive.open(member) as f:
+                stats = analyze_stream(f, top_n=top_n)
+    except Exception as e:
+        return {'error': str(e)}
+    result = stats.as_dict()
+    result['error'] = None
+    return result
+
+
+def collect_documents(paths, max_documents, max_total_bytes):
+    """Expands zip archives into (name, path, member) tasks.
+
+    Limits are checked against the archives' declared sizes before anything
+    is decompressed.
+    """
+    tasks, total = [], 0
+    for name, path in paths:
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or info.filename.startswith('__MACOSX/'):
+                        continue
+                    total += info.file_size
+                    tasks.append((f"{name}/{info.filename}", path, info.filename))
+        else:
+            total += os.path.getsize(path)
+            tasks.append((name, path, None))
+        if len(tasks) > max_documents:
+            raise RequestEntityTooLarge(f"A batch may contain at most {max_documents} documents.")
+        if total > max_total_bytes:
+            raise RequestEntityTooLarge(f"A batch may contain at most {max_total_bytes} bytes of text.")
+    return tasks
+
+
+def summarize(results):
+    """Adds the aggregate totals over every successfully analysed document."""
+    ok = [r for r in results if not r['error']]
+    return {
+        'documents': len(results),
+        'failed': len(results) - len(ok),
+        'words': sum(r['words'] for r in ok),
+        'characters': sum(r['characters'] for r in ok),
+        'lines': sum(r['lines'] for r in ok),
+    }
+
+
+def to_csv(report):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(report['documents'])
+    totals = report['totals']
+    writer.writerow({'document': 'TOTAL', 'words': totals['words'], 'characters': totals['characters'],
+                     'lines': totals['lines'], 'error': f"{totals['failed']} failed" if totals['failed'] else ''})
+    return out.getvalue()
+
+
+# --- Analyzer ---
+
+class BatchAnalyzer:
+    """Fans documents out to a worker pool (one of the job queue's backends).
+
+    The pool is created lazily per process, like the job queue's. 'process'
+    is the default: word counting is CPU-bound and would hold the GIL.
+    """
+
+    def __init__(self, backend='process', max_workers=None, max_documents=1000, max_total_bytes=256 * 1024 * 1024):
+        self._lock = threading.Lock()
+        self._backend = None
+        self._pid = None
+        self.configure(backend, max_workers, max_documents, max_total_bytes)
+
+    def init_app(self, app):
+        self.configure(
+            app.config['BATCH_BACKEND'],
+            app.config['BATCH_MAX_WORKERS'],
+            app.config['BATCH_MAX_DOCUMENTS'],
+            app.config['BATCH_MAX_TOTAL_BYTES'],
+        )
+
+    def configure(self, backend=None, max_workers=None, max_documents=None, max_total_bytes=None):
+        if backend is not None and backend not in BACKENDS:
+            raise ValueError(f"Unknown batch backend: {backend!r}")
+        self.shutdown()
+        self.backend_name = backend or getattr(self, 'backend_name', 'process')
+        self.max_workers = max_workers or getattr(self, 'max_workers', None)
+        self.max_documents = max_documents or getattr(self, 'max_documents', 1000)
+        self.max_total_bytes = max_total_bytes or getattr(self, 'max_total_bytes', 256 * 1024 * 1024)
+
+    def _get_backend(self):
+        with self._lock:
+            if self._backend is None or self._pid != os.getpid():
+                self._backend = BACKENDS[self.backend_name](self.max_workers)
+                self._pid = os.getpid()
+            return self._backend
+
+    def analyze_paths(self, paths, top_n=10):
+        """Analyzes (name, path) pairs in parallel and returns the report dict."""
+        tasks = collect_documents(paths, self.max_documents, self.max_total_bytes)
+        if not tasks:
+            raise BadRequest("No documents were uploaded.")
+        backend = self._get_backend()
+        futures = [backend.submit(analyze_document, path, member, top_n) for _, path, member in tasks]
+        documents = []
+        for (name, _, _), future in zip(tasks, futures):
+            documents.append({'document': name, **future.result()})
+        return {'documents': documents, 'totals': summarize(documents)}
+
+    def analyze_uploads(self, file_storages, max_file_bytes=None, top_n=10):
+        """Saves uploaded files (or zips) to a scratch directory and analyzes them."""
+        scratch = tempfile.mkdtemp(prefix='batch-')
+        try:
+            paths = []
+            for i, upload in enumerate(file_storages):
+                if not upload or not upload.filename:
+                    continue
+                path = os.path.join(scratch, str(i))
+                save_upload(upload, path, max_bytes=max_file_bytes)
+                paths.append((os.path.basename(upload.filename), path))
+            return self.analyze_paths(paths, top_n=top_n)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    def shutdown(self, wait=True):
+        backend = getattr(self, '_backend', None)
+        if backend is not None and self._pid == os.getpid():
+            self._backend = None
+            backend.shutdown(wait=wait)
+
+
+batch_analyzer = BatchAnalyzer()
+
+
+# --- CLI ---
+
+@click.command('batch-word-count')
+@click.argument('files', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['json', 'csv']), default='json', show_default=True)
+@click.option('-o', '--output', type=click.File('w'), default='-', help='Output file (default: stdout).')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: CPU count).')
+def batch_word_count_command(files, fmt, output, workers):
+    """Counts words in text files and zip archives in parallel."""
+    analyzer = BatchAnalyzer(max_workers=workers)
+    try:
+        report = analyzer.analyze_paths([(os.path.basename(path), path) for path in files])
+    finally:
+        analyzer.shutdown()
+    output.write(to_csv(report) if fmt == 'csv' else json.dumps(report, indent=2) + '\n')
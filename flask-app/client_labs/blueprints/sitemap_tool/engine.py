@@ -0,0 +1,393 @@
+"""Streaming sitemap diff/merge engine.
+
+Reads XML sitemaps, gzipped sitemaps and sitemap indexes (with their child
+sitemaps uploaded alongside them in a zip) without loading them whole,
+removes the listed empty pages, de-duplicates, appends new URLs and writes
+the result sharded into files of at most 50,000 URLs plus an index.
+
+Memory stays bounded: parsed elements are discarded as soon as they are
+read, and URL sets keep compact digests that spill to an on-disk SQLite
+table past ``max_in_memory`` entries.
+"""
+import os
+import re
+import gzip
+import shutil
+import hashlib
+import sqlite3
+import zipfile
+import posixpath
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from xml.etree.ElementTree import iterparse
+from xml.sax.saxutils import escape
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+MAX_URLS_PER_SITEMAP = 50_000
+MAX_BYTES_PER_SITEMAP = 50 * 1024 * 1024  # Uncompressed, as the protocol requires.
+MAX_INDEX_DEPTH = 2
+MAX_EXTRACT_BYTES = 4 * 1024 ** 3
+URL_RE = re.compile(r'https?://\S+')
+URL_FIELDS = ('lastmod', 'changefreq', 'priority')
+
+
+# --- Input ---
+
+class _CountingReader:
+    """Counts the raw bytes read from a file into ``stats['bytes_read']``."""
+
+    def __init__(self, f, stats):
+        self._f = f
+        self._stats = stats
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self._stats['bytes_read'] += len(data)
+        return data
+
+
+@contextmanager
+def open_sitemap(path, stats=None):
+    """Opens a sitemap for binary reading, decompressing it if it is gzipped.
+
+    With ``stats``, the (compressed) bytes consumed are added to
+    ``stats['bytes_read']``, for progress reporting.
+    """
+    with open(path, 'rb') as raw:
+        magic = raw.read(2)
+        raw.seek(0)
+        source = _CountingReader(raw, stats) if stats is not None else raw
+        if magic == b'\x1f\x8b':
+            with gzip.GzipFile(fileobj=source, mode='rb') as f:
+                yield f
+        else:
+            yield source
+
+
+def is_xml_source(path):
+    """True for XML (plain or gzipped) and zip uploads; False for legacy JSON."""
+    if zipfile.is_zipfile(path):
+        return True
+    with open_sitemap(path) as f:
+        head = f.read(512).lstrip(b'\xef\xbb\xbf \t\r\n')
+    return head.startswith(b'<')
+
+
+_local_names = {}
+
+
+def _local(tag):
+    # Memoised: a document only ever uses a handful of distinct tags.
+    name = _local_names.get(tag)
+    if name is None:
+        name = _local_names[tag] = tag.rsplit('}', 1)[-1]
+    return name
+
+
+def iter_entries(path, stats=None):
+    """Yields ('url', {'loc', 'lastmod', ...}) and ('sitemap', loc) entries in document order."""
+    with open_sitemap(path, stats) as f:
+        context = iterparse(f, events=('start', 'end'))
+        _, root = next(context)
+        for event, elem in context:
+            if event == 'start':
+                continue
+            kind = _local(elem.tag)
+            if kind != 'url' and kind != 'sitemap':
+                continue
+            fields = {}
+            for child in elem:
+                if child.text:
+                    fields[_local(child.tag)] = child.text.strip()
+            loc = fields.get('loc')
+            if loc:
+                if kind == 'sitemap':
+                    yield 'sitemap', loc
+                elif len(fields) == 1:
+                    yield 'url', fields
+                else:
+                    yield 'url', {key: fields[key] for key in ('loc',) + URL_FIELDS if fields.get(key)}
+            # Drop everything parsed so far; the tree never grows.
+            root.clear()
+
+
+def local_resolver(directory):
+    """Resolves a child sitemap's <loc> to a file of the same name in ``directory``."""
+    def resolve(loc):
+        name = posixpath.basename(urlsplit(loc).path)
+        path = os.path.join(directory, name)
+        return path if name and os.path.isfile(path) else None
+    return resolve
+
+
+def iter_sitemap_urls(path, resolve, stats, depth=0):
+    """Yields URL entries from a sitemap, following index entries through ``resolve``."""
+    for kind, value in iter_entries(path, stats):
+        if kind == 'url':
+            yield value
+        elif depth >= MAX_INDEX_DEPTH:
+            stats['skipped_children'] += 1
+        else:
+            child = resolve(value)
+            if child is None:
+                stats['missing_children'].append(value)
+                continue
+            stats['child_sitemaps'] += 1
+            yield from iter_sitemap_urls(child, resolve, stats, depth + 1)
+
+
+def extract_archive(path, dest, max_bytes=MAX_EXTRACT_BYTES):
+    """Extracts the sitemap files of a zip upload, flattened, into ``dest``.
+
+    Returns the extracted paths. Declared sizes are checked before anything
+    is written, and member paths are reduced to their basenames.
+    """
+    os.makedirs(dest, exist_ok=True)
+    paths = []
+    with zipfile.ZipFile(path) as archive:
+        members = [info for info in archive.infolist()
+                   if not info.is_dir() and info.filename.lower().endswith(('.xml', '.xml.gz', '.gz'))]
+        if sum(info.file_size for info in members) > max_bytes:
+            raise ValueError(f"Archive expands to more than {max_bytes} bytes")
+        for info in members:
+            name = posixpath.basename(info.filename)
+            if not name or name.startswith('.'):
+                continue
+            target = os.path.join(dest, name)
+            with archive.open(info) as src, open(target, 'wb') as out:
+                shutil.copyfileobj(src, out, 64 * 1024)
+            paths.append(target)
+    return sorted(paths)
+
+
+def root_tag(path):
+    with open_sitemap(path) as f:
+        for _, elem in iterparse(f, events=('start',)):
+            return _local(elem.tag)
+    return None
+
+
+def iter_text_urls(path):
+    """Yields every http(s) URL in a text file, line by line."""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            yield from URL_RE.findall(line)
+
+
+# --- URL sets ---
+
+class DigestSet:
+    """A set of URLs stored as 16-byte digests, spilling to SQLite when large."""
+
+    def __init__(self, spill_path, max_in_memory=1_000_000):
+        self.spill_path = spill_path
+        self.max_in_memory = max_in_memory
+        self._memory = set()
+        self._db = None
+        self._spilled = 0
+
+    @staticmethod
+    def _digest(url):
+        return hashlib.blake2b(url.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+    def _on_disk(self, digest):
+        return self._db is not None and self._db.execute(
+            "SELECT 1 FROM digests WHERE digest = ?", (digest,)).fetchone() is not None
+
+    def __contains__(self, url):
+        digest = self._digest(url)
+        return digest in self._memory or self._on_disk(digest)
+
+    def add(self, url):
+        """Adds ``url``; returns False if it was already present."""
+        digest = self._digest(url)
+        if digest in self._memory or self._on_disk(digest):
+            return False
+        self._memory.add(digest)
+        if len(self._memory) >= self.max_in_memory:
+            self._spill()
+        return True
+
+    def _spill(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.spill_path)
+            self._db.execute("PRAGMA journal_mode = OFF")
+            self._db.execute("PRAGMA synchronous = OFF")
+            self._db.execute("CREATE TABLE IF NOT EXISTS digests (digest BLOB PRIMARY KEY) WITHOUT ROWID")
+        self._db.executemany("INSERT OR IGNORE INTO digests VALUES (?)", ((d,) for d in self._memory))
+        self._db.commit()
+        self._spilled += len(self._memory)
+        self._memory.clear()
+
+    def __len__(self):
+        return len(self._memory) + self._spilled
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+            os.remove(self.spill_path)
+
+
+# --- Output ---
+
+class ShardedSitemapWriter:
+    """Writes <url> entries into sitemap files of at most ``max_urls`` URLs.
+
+    A single shard is written straight to ``filename``. When more are
+    needed, shards are named ``<stem>-00001.xml`` and ``filename`` becomes a
+    sitemap index listing them, under ``base_url`` if given (relative names
+    otherwise).
+    """
+
+    def __init__(self, directory, filename, max_urls=MAX_URLS_PER_SITEMAP,
+                 max_bytes=MAX_BYTES_PER_SITEMAP, base_url=None):
+        self.directory = directory
+        self.filename = filename
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self.base_url = base_url.rstrip('/') + '/' if base_url else ''
+        self.stem = filename[:-4] if filename.lower().endswith('.xml') else filename
+        self.shards = []
+        self.total = 0
+        self._file = None
+        self._count = 0
+        self._bytes = 0
+
+    def _open_shard(self):
+        name = f"{self.stem}-{len(self.shards) + 1:05d}.xml"
+        self.shards.append(name)
+        self._file = open(os.path.join(self.directory, name), 'w', encoding='utf-8')
+        header = f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'
+        self._file.write(header)
+        self._count, self._bytes = 0, len(header)
+
+    def _close_shard(self):
+        if self._file is not None:
+            self._file.write('</urlset>\n')
+            self._file.close()
+            self._file = None
+
+    def write(self, entry):
+        line = f'<url><loc>{escape(entry["loc"])}</loc>'
+        if len(entry) > 1:
+            line += ''.join(f'<{key}>{escape(entry[key])}</{key}>' for key in URL_FIELDS if entry.get(key))
+        line += '</url>\n'
+        size = len(line) if line.isascii() else len(line.encode('utf-8'))
+        if self._file is None or self._count >= self.max_urls or self._bytes + size + 10 > self.max_bytes:
+            self._close_shard()
+            self._open_shard()
+        self._file.write(line)
+        self._count += 1
+        self._bytes += size
+        self.total += 1
+
+    def close(self):
+        """Finishes the output and returns the names of the files written."""
+        if self._file is None and not self.shards:
+            self._open_shard()  # An empty but valid urlset.
+        self._close_shard()
+        target = os.path.join(self.directory, self.filename)
+        if len(self.shards) == 1:
+            os.replace(os.path.join(self.directory, self.shards[0]), target)
+            self.shards = []
+            return [self.filename]
+        with open(target, 'w', encoding='utf-8') as index:
+            index.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">\n')
+            for name in self.shards:
+                index.write(f'<sitemap><loc>{escape(self.base_url + name)}</loc></sitemap>\n')
+            index.write('</sitemapindex>\n')
+        return [self.filename] + self.shards
+
+
+# --- Pipeline ---
+
+def format_summary(stats):
+    rows = [
+        ("Previous Number of URLs", stats['previous']),
+        ("Number of URLs Removed", stats['removed']),
+        ("Duplicate URLs Skipped", stats['duplicates']),
+        ("Number of URLs Added", stats['added']),
+        ("New Total URLs", stats['total']),
+        ("Child Sitemaps Read", stats['child_sitemaps']),
+        ("Output Files", len(stats['files'])),
+    ]
+    lines = ["Final Summary"] + [f"{label:<28}{value}" for label, value in rows]
+    for loc in stats['missing_children'][:20]:
+        lines.append(f"Missing child sitemap: {loc}")
+    if len(stats['missing_children']) > 20:
+        lines.append(f"... and {len(stats['missing_children']) - 20} more missing child sitemaps")
+    return '\n'.join(lines) + '\n'
+
+
+PROGRESS_EVERY = 5000  # URLs between progress callbacks
+
+
+def process_sitemaps(work_dir, old_sitemap_filename, empty_pages_filename, new_sitemap_filename,
+                     new_urls_filename=None, base_url=None, max_in_memory=1_000_000,
+                     max_urls=MAX_URLS_PER_SITEMAP, progress=None):
+    """Removes empty pages from a (possibly indexed) sitemap and merges in new URLs.
+
+    Returns a stats dict; ``stats['files']`` lists the output files written
+    to ``work_dir`` and ``stats['summary']`` is a printable report.
+    ``progress(phase, fraction=None, force=False, **counts)`` is called as
+    work advances (see ``JobContext.report_progress``), which throttles it.
+    """
+    report = progress or (lambda phase, **kwargs: None)
+    stats = {'previous': 0, 'removed': 0, 'duplicates': 0, 'added': 0, 'total': 0, 'bytes_read': 0,
+             'child_sitemaps': 0, 'skipped_children': 0, 'missing_children': []}
+    source = os.path.join(work_dir, old_sitemap_filename)
+    if zipfile.is_zipfile(source):
+        report('extracting')
+        sources_dir = os.path.join(work_dir, 'sitemap-sources')
+        extracted = extract_archive(source, sources_dir)
+        indexes = [path for path in extracted if root_tag(path) == 'sitemapindex']
+        roots = indexes[:1] or extracted
+        resolve = local_resolver(sources_dir)
+        total_bytes = sum(os.path.getsize(path) for path in extracted)
+    else:
+        roots = [source]
+        resolve = local_resolver(work_dir)
+        total_bytes = os.path.getsize(source)
+
+    removals = DigestSet(os.path.join(work_dir, 'removals.sqlite'), max_in_memory)
+    seen = DigestSet(os.path.join(work_dir, 'seen.sqlite'), max_in_memory)
+    writer = ShardedSitemapWriter(work_dir, new_sitemap_filename, max_urls=max_urls, base_url=base_url)
+    try:
+        report('loading empty pages')
+        for url in iter_text_urls(os.path.join(work_dir, empty_pages_filename)):
+            removals.add(url)
+        report('loading empty pages', empty_pages=len(removals), force=True)
+
+        report('parsing', fraction=0.0)
+        for root in roots:
+            for entry in iter_sitemap_urls(root, resolve, stats):
+                stats['previous'] += 1
+                if entry['loc'] in removals:
+                    stats['removed'] += 1
+                elif seen.add(entry['loc']):
+                    writer.write(entry)
+                else:
+                    stats['duplicates'] += 1
+                if stats['previous'] % PROGRESS_EVERY == 0:
+                    report('parsing', fraction=min(stats['bytes_read'] / total_bytes, 1.0) if total_bytes else None,
+                           parsed=stats['previous'], removed=stats['removed'], duplicates=stats['duplicates'])
+        report('parsing', fraction=1.0, parsed=stats['previous'], removed=stats['removed'],
+               duplicates=stats['duplicates'], force=True)
+
+        if new_urls_filename and os.path.exists(os.path.join(work_dir, new_urls_filename)):
+            report('adding new URLs')
+            for url in iter_text_urls(os.path.join(work_dir, new_urls_filename)):
+                if seen.add(url):
+                    writer.write({'loc': url})
+                    stats['added'] += 1
+    finally:
+        stats['files'] = writer.close()
+        removals.close()
+        seen.close()
+
+    stats['total'] = writer.total
+    stats['summary'] = format_summary(stats)
+    report('done', parsed=stats['previous'], removed=stats['removed'], added=stats['added'],
+           total=stats['total'], files=len(stats['files']))
+    return stats
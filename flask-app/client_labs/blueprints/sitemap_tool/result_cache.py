@@ -0,0 +1,108 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+
+RESULT_FILE = 'result.txt'
+MANIFEST_FILE = 'manifest.json'
+
+
+def job_cache_key(input_digests, options):
+    """Returns the cache key for a job from its input digests and options.
+
+    ``input_digests`` maps each input role (e.g. ``old_sitemap``) to the
+    sha256 hex digest of the uploaded file, or None when it was not supplied.
+    """
+    payload = json.dumps({'inputs': input_digests, 'options': options}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """A bounded, content-addressed on-disk cache of finished sitemap jobs.
+
+    Each entry is a directory named by its key that holds the result text and
+    the output files. Reads touch the entry's mtime, and ``put`` evicts the
+    least recently used entries once ``max_entries`` or ``max_bytes`` is
+    exceeded. Entries are published with an atomic rename, so concurrent
+    workers never see a half-written entry.
+    """
+
+    def __init__(self, root, max_bytes=1024 ** 3, max_entries=500):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        if len(key) != 64 or not all(c in '0123456789abcdef' for c in key):
+            raise ValueError(f"Invalid cache key: {key!r}")
+        return os.path.join(self.root, key)
+
+    def get(self, key):
+        """Returns ``(result, output_dir)`` for a cached job, or None."""
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, RESULT_FILE), encoding='utf-8') as f:
+                result = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return result, path
+
+    def restore(self, key, dest_dir):
+        """Copies a cached job's output files into ``dest_dir``. Returns the result, or None."""
+        entry = self.get(key)
+        if entry is None:
+            return None
+        result, path = entry
+        with open(os.path.join(path, MANIFEST_FILE), encoding='utf-8') as f:
+            filenames = json.load(f)['files']
+        for filename in filenames:
+            shutil.copyfile(os.path.join(path, filename), os.path.join(dest_dir, filename))
+        return result
+
+    def discard(self, key):
+        """Deletes a cached entry, e.g. one that could not be restored."""
+        shutil.rmtree(self._path(key), ignore_errors=True)
+
+    def put(self, key, result, source_dir, filenames):
+        """Stores a job's result and output files, then enforces the size limits."""
+        final_path = self._path(key)
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=self.root)
+        try:
+            for filename in filenames:
+                shutil.copyfile(os.path.join(source_dir, filename), os.path.join(staging, filename))
+            with open(os.path.join(staging, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+                json.dump({'files': list(filenames)}, f)
+            with open(os.path.join(staging, RESULT_FILE), 'w', encoding='utf-8') as f:
+                f.write(result)
+            os.rename(staging, final_path)
+        except OSError:
+            # Another worker stored the same key first (or the copy failed).
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.isdir(final_path):
+                raise
+        self.evict()
+
+    def evict(self):
+        """Deletes least recently used entries until both limits are met."""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if name.startswith('.') or not os.path.isdir(path):
+                    continue
+                size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+                entries.append((os.path.getmtime(path), path, size))
+            entries.sort()
+            total = sum(size for _, _, size in entries)
+            count = len(entries)
+            for _, path, size in entries:
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                count -= 1
+                total -= size
@@ -1,21 +1,28 @@
 import os
+import json
+import time
 import uuid
-from flask import Blueprint, render_template, request, redirect, url_for, session, current_app
+import hashlib
+from flask import Blueprint, render_template, request, redirect, url_for, session, current_app, g, jsonify, abort, Response, stream_with_context
 from functools import wraps
 from werkzeug.utils import secure_filename
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, SubmitField
 from wtforms.validators import DataRequired
-from ... import database
-from ...auth import login_required # Import from auth.py
-from sitemap_tool.main import run_tool_full_process
+from ...auth import login_required, csrf_required # Import from auth.py
+from ...ratelimit import rate_limit, body_cost
+from ...jobs import job_queue, get_job, FINISHED_STATUSES
+from ...uploads import save_upload
+from .tasks import process_sitemap_job
+from .workspace import create_job_dir
+from .result_cache import job_cache_key
 
 sitemap_tool_bp = Blueprint('sitemap_tool', __name__, template_folder='templates')
 
 class SitemapToolForm(FlaskForm):
     job_name = StringField('Job Name', validators=[DataRequired()])
-    old_sitemap_file = FileField('Old Sitemap File', validators=[FileRequired(), FileAllowed(['xml'], 'XML files only!')])
+    old_sitemap_file = FileField('Old Sitemap File', validators=[FileRequired(), FileAllowed(['xml', 'gz', 'zip'], 'XML, gzipped XML or zip files only!')])
     empty_pages_file = FileField('Empty Pages File', validators=[FileRequired(), FileAllowed(['txt'], 'Text files only!')])
     new_urls_file = FileField('New URLs File (Optional)', validators=[FileAllowed(['txt'], 'Text files only!')])
     new_sitemap_filename = StringField('New Sitemap Filename', validators=[DataRequired()])
@@ -23,6 +30,8 @@ class SitemapToolForm(FlaskForm):
 
 @sitemap_tool_bp.route("/tools/sitemap-processor", methods=["GET", "POST"])
 @login_required
+@rate_limit('sitemap_processor', limit='RATELIMIT_SITEMAP', cost=body_cost('RATELIMIT_BYTES_PER_TOKEN'),
+            max_active_jobs='RATELIMIT_SITEMAP_MAX_JOBS')
 def sitemap_processor():
     form = SitemapToolForm()
     if form.validate_on_submit():
@@ -33,47 +42,130 @@ def sitemap_processor():
         new_urls_file = form.new_urls_file.data
         new_sitemap_filename = form.new_sitemap_filename.data
 
-        # 2. Create a unique, secure directory for this job
+        # 2. Create a unique, secure directory for this job on the scratch volume
         job_id = str(uuid.uuid4())
-        upload_path = os.path.join(current_app.root_path, 'uploads', job_id)
-        os.makedirs(upload_path, exist_ok=True)
+        upload_path = create_job_dir(job_id)
 
-        # 3. Save uploaded files
+        # 3. Stream uploaded files into it, fingerprinting them as they are written
+        max_bytes = current_app.config.get('MAX_UPLOAD_FILE_BYTES')
+        digests = {'old_sitemap': hashlib.sha256(), 'empty_pages': hashlib.sha256()}
         old_sitemap_filename_s = secure_filename(old_sitemap_file.filename)
         empty_pages_filename_s = secure_filename(empty_pages_file.filename)
-        old_sitemap_file.save(os.path.join(upload_path, old_sitemap_filename_s))
-        empty_pages_file.save(os.path.join(upload_path, empty_pages_filename_s))
+        save_upload(old_sitemap_file, os.path.join(upload_path, old_sitemap_filename_s), max_bytes,
+                    hasher=digests['old_sitemap'])
+        save_upload(empty_pages_file, os.path.join(upload_path, empty_pages_filename_s), max_bytes,
+                    hasher=digests['empty_pages'])
 
         new_urls_filename_s = None
         if new_urls_file:
             new_urls_filename_s = secure_filename(new_urls_file.filename)
-            new_urls_file.save(os.path.join(upload_path, new_urls_filename_s))
-
-        # 4. Call the tool's main function
-        try:
-            result_string = run_tool_full_process(
-                supplier_dir_absolute=upload_path,
-                old_sitemap_filename=old_sitemap_filename_s,
-                empty_pages_filename=empty_pages_filename_s,
-                new_sitemap_filename=secure_filename(new_sitemap_filename),
-                new_urls_filename=new_urls_filename_s
-            )
-        except Exception as e:
-            result_string = f"Tool execution failed: {e}"
-
-        # 5. Log and render result
-        log_input_data = (
-            f"Job ID: {job_id}, "
-            f"Job Name: {job_name}, "
-            f"Old Sitemap: {old_sitemap_filename_s}, "
-            f"Empty Pages: {empty_pages_filename_s}, "
-            f"New URLs: {new_urls_filename_s}"
+            digests['new_urls'] = hashlib.sha256()
+            save_upload(new_urls_file, os.path.join(upload_path, new_urls_filename_s), max_bytes,
+                        hasher=digests['new_urls'])
+
+        new_sitemap_filename_s = secure_filename(new_sitemap_filename)
+        cache_key = job_cache_key(
+            {role: digest.hexdigest() for role, digest in digests.items()},
+            {'new_sitemap_filename': new_sitemap_filename_s},
+        )
+
+        # 4. Hand the work to the job queue and let the page poll for the result
+        job_id = job_queue.submit(
+            "sitemap_processor",
+            process_sitemap_job,
+            user_id=g.user['id'],
+            job_id=job_id,
+            job_name=job_name,
+            upload_path=upload_path,
+            old_sitemap_filename=old_sitemap_filename_s,
+            empty_pages_filename=empty_pages_filename_s,
+            new_sitemap_filename=new_sitemap_filename_s,
+            new_urls_filename=new_urls_filename_s,
+            cache_key=cache_key,
+            cache_config=result_cache_config()
         )
-        with database.get_db_connection() as client:
-            client.execute(
-                "INSERT INTO logs (tool_name, input_data, output_data) VALUES (?, ?, ?)",
-                ("sitemap_processor", log_input_data, result_string)
-            )
-        return render_template("sitemap_tool.html", form=form, result=result_string)
-
-    return render_template("sitemap_tool.html", form=form, result=None)
\ No newline at end of file
+        if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+            return jsonify(job_id=job_id, status_url=url_for('.job_status', job_id=job_id)), 202
+        return redirect(url_for('.job_page', job_id=job_id))
+
+    return render_template("sitemap_tool.html", form=form, job=None)
+
+def result_cache_config():
+    """Returns the ResultCache settings to hand to a job, or None if disabled."""
+    config = current_app.config
+    if not config.get('SITEMAP_CACHE_ENABLED'):
+        return None
+    return {
+        'root': config.get('SITEMAP_CACHE_DIR') or os.path.join(current_app.root_path, 'sitemap-cache'),
+        'max_bytes': config['SITEMAP_CACHE_MAX_BYTES'],
+        'max_entries': config['SITEMAP_CACHE_MAX_ENTRIES'],
+    }
+
+def _get_own_job(job_id):
+    job = get_job(job_id)
+    if job is None or job['tool_name'] != 'sitemap_processor' or job['user_id'] != g.user['id']:
+        abort(404)
+    return job
+
+@sitemap_tool_bp.route("/tools/sitemap-processor/jobs/<job_id>")
+@login_required
+def job_page(job_id):
+    """Renders the tool page with the job's current status."""
+    return render_template("sitemap_tool.html", form=SitemapToolForm(), job=_get_own_job(job_id))
+
+@sitemap_tool_bp.route("/tools/sitemap-processor/jobs/<job_id>/status")
+@login_required
+def job_status(job_id):
+    """Returns the job's status and, once finished, its result."""
+    return jsonify(_job_payload(_get_own_job(job_id)))
+
+def _job_payload(job):
+    return {
+        'id': job['id'],
+        'status': job['status'],
+        'finished': job['status'] in FINISHED_STATUSES,
+        'progress': json.loads(job['progress']) if job.get('progress') else None,
+        'result': job['result'],
+        'error': job['error'],
+    }
+
+@sitemap_tool_bp.route("/tools/sitemap-processor/jobs/<job_id>/events")
+@login_required
+def job_events(job_id):
+    """Streams the job's status and progress as Server-Sent Events.
+
+    Each stream lasts at most SITEMAP_EVENTS_MAX_SECONDS so it doesn't pin a
+    worker thread; browsers reconnect on their own until the job finishes.
+    """
+    _get_own_job(job_id)
+    interval = current_app.config['SITEMAP_EVENTS_POLL_INTERVAL']
+    deadline = time.monotonic() + current_app.config['SITEMAP_EVENTS_MAX_SECONDS']
+
+    def stream():
+        yield f"retry: {int(interval * 1000)}\n\n"
+        last = None
+        while True:
+            job = get_job(job_id)
+            payload = json.dumps(_job_payload(job))
+            if payload != last:
+                yield f"data: {payload}\n\n"
+                last = payload
+            else:
+                yield ": keep-alive\n\n"
+            if job['status'] in FINISHED_STATUSES or time.monotonic() >= deadline:
+                return
+            time.sleep(interval)
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@sitemap_tool_bp.route("/tools/sitemap-processor/jobs/<job_id>/cancel", methods=["POST"])
+@login_required
+@csrf_required
+def cancel_job(job_id):
+    """Cancels a queued or running job."""
+    _get_own_job(job_id)
+    job_queue.cancel(job_id)
+    if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+        return jsonify(status=get_job(job_id)['status'])
+    return redirect(url_for('.job_page', job_id=job_id))
@@ -0,0 +1,76 @@
+import os
+import logging
+from ...jobs import JobCancelled
+from ...log_writer import log_writer
+from .result_cache import ResultCache
+from .engine import is_xml_source, process_sitemaps
+
+log = logging.getLogger(__name__)
+
+
+def process_sitemap_job(ctx, job_name, upload_path, old_sitemap_filename, empty_pages_filename,
+                        new_sitemap_filename, new_urls_filename=None, cache_key=None, cache_config=None):
+    """Runs the sitemap tool for an uploaded job and logs the outcome.
+
+    XML sitemaps (plain, gzipped, or a zip holding an index and its child
+    sitemaps) go through the streaming engine; JSON ones through the
+    original sitemap_tool. When a result cache is configured, identical
+    inputs are served from it and successful runs are stored in it.
+    Failures are logged and re-raised, so the job is recorded as failed;
+    a job cancelled or timed out mid-run is logged as cancelled.
+    """
+    cache = ResultCache(**cache_config) if cache_config and cache_key else None
+    result_string = None
+    if cache:
+        ctx.report_progress('checking cache')
+        try:
+            result_string = cache.restore(cache_key, upload_path)
+        except (OSError, ValueError):
+            # A damaged entry counts as a miss; dropping it lets this run store a fresh one.
+            log.warning("Discarding unreadable result cache entry %s", cache_key, exc_info=True)
+            cache.discard(cache_key)
+    cache_status = "disabled" if cache is None else ("hit" if result_string is not None else "miss")
+
+    def write_log(output_data):
+        log_input_data = (
+            f"Job ID: {ctx.job_id}, "
+            f"Job Name: {job_name}, "
+            f"Old Sitemap: {old_sitemap_filename}, "
+            f"Empty Pages: {empty_pages_filename}, "
+            f"New URLs: {new_urls_filename}, "
+            f"Cache: {cache_status}"
+        )
+        log_writer.write("sitemap_processor", log_input_data, output_data)
+
+    if result_string is None:
+        try:
+            if is_xml_source(os.path.join(upload_path, old_sitemap_filename)):
+                stats = process_sitemaps(
+                    upload_path, old_sitemap_filename, empty_pages_filename,
+                    new_sitemap_filename, new_urls_filename, progress=ctx.report_progress
+                )
+                result_string, output_files = stats['summary'], stats['files']
+            else:
+                # Legacy JSON "startUrl" sitemaps. sitemap_tool (and rich)
+                # are only imported by the jobs that need them.
+                from sitemap_tool.main import run_tool_full_process
+                ctx.report_progress('processing')
+                result_string = run_tool_full_process(
+                    supplier_dir_absolute=upload_path,
+                    old_sitemap_filename=old_sitemap_filename,
+                    empty_pages_filename=empty_pages_filename,
+                    new_sitemap_filename=new_sitemap_filename,
+                    new_urls_filename=new_urls_filename
+                )
+                output_files = [new_sitemap_filename]
+            if cache and os.path.exists(os.path.join(upload_path, new_sitemap_filename)):
+                cache.put(cache_key, result_string, upload_path, output_files)
+        except JobCancelled:
+            write_log("Tool execution cancelled")
+            raise
+        except Exception as e:
+            write_log(f"Tool execution failed: {e}")
+            raise
+
+    write_log(result_string)
+    return result_string
@@ -0,0 +1,125 @@
+import os
+import time
+import shutil
+import logging
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from ... import database
+from ...jobs import ACTIVE_STATUSES
+
+log = logging.getLogger(__name__)
+
+
+def scratch_root(app=None):
+    """Returns the directory that holds one workspace per sitemap job."""
+    app = app or current_app
+    return app.config.get('SITEMAP_SCRATCH_DIR') or os.path.join(app.root_path, 'uploads')
+
+
+def create_job_dir(job_id):
+    path = os.path.join(scratch_root(), job_id)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _dir_usage(path):
+    """Returns (total bytes, newest mtime) of everything under ``path``."""
+    total, newest = 0, os.path.getmtime(path)
+    for dirpath, dirnames, filenames in os.walk(path):
+        for name in dirnames + filenames:
+            try:
+                st = os.lstat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            newest = max(newest, st.st_mtime)
+            if name in filenames:
+                total += st.st_size
+    return total, newest
+
+
+def _active_job_ids(job_ids, batch_size=500):
+    active = set()
+    statuses = ', '.join('?' for _ in ACTIVE_STATUSES)
+    with database.get_db_connection() as client:
+        for i in range(0, len(job_ids), batch_size):
+            batch = job_ids[i:i + batch_size]
+            placeholders = ', '.join('?' for _ in batch)
+            result_set = client.execute(
+                f"SELECT id FROM jobs WHERE id IN ({placeholders}) AND status IN ({statuses})",
+                (*batch, *ACTIVE_STATUSES)
+            )
+            active.update(row[0] for row in result_set.rows)
+    return active
+
+
+def sweep_job_dirs(root, max_age=None, max_total_bytes=None, now=None, min_age=60):
+    """Deletes workspaces of finished jobs by age, then by total-size quota.
+
+    Directories of queued or running jobs, and any with a file modified in
+    the last ``min_age`` seconds, are never touched: a job may still be
+    uploading, or still writing after it was cancelled or timed out.
+    Once the age pass is done, the oldest remaining finished workspaces are
+    deleted until the total is within ``max_total_bytes``. Returns a summary
+    dictionary.
+    """
+    now = now or time.time()
+    summary = {'removed': 0, 'bytes_freed': 0, 'bytes_kept': 0}
+    if not os.path.isdir(root):
+        return summary
+
+    entries = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and not os.path.islink(path):
+            size, mtime = _dir_usage(path)
+            entries.append((mtime, name, path, size))
+    entries.sort()  # Oldest first.
+
+    active = _active_job_ids([name for _, name, _, _ in entries])
+    total = sum(size for _, _, _, size in entries)
+
+    for mtime, name, path, size in entries:
+        if name in active or now - mtime < min_age:
+            continue
+        expired = max_age is not None and now - mtime >= max_age
+        over_quota = max_total_bytes is not None and total > max_total_bytes
+        if not (expired or over_quota):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        summary['removed'] += 1
+        summary['bytes_freed'] += size
+
+    summary['bytes_kept'] = total
+    return summary
+
+
+def sweep_from_config(app=None):
+    app = app or current_app
+    summary = sweep_job_dirs(
+        scratch_root(app),
+        max_age=app.config.get('UPLOAD_RETENTION_SECONDS'),
+        max_total_bytes=app.config.get('UPLOAD_QUOTA_BYTES'),
+    )
+    if summary['removed']:
+        log.info("Removed %(removed)d job workspaces, freeing %(bytes_freed)d bytes", summary)
+    return summary
+
+
+@click.command("sweep-uploads")
+@click.option("--max-age", type=float, help="Delete finished workspaces older than this many seconds.")
+@click.option("--max-bytes", type=int, help="Then delete the oldest until the total is below this.")
+@with_appcontext
+def sweep_uploads_command(max_age, max_bytes):
+    """Deletes finished sitemap job workspaces by age and size quota."""
+    config = current_app.config
+    summary = sweep_job_dirs(
+        scratch_root(),
+        max_age=max_age if max_age is not None else config.get('UPLOAD_RETENTION_SECONDS'),
+        max_total_bytes=max_bytes if max_bytes is not None else config.get('UPLOAD_QUOTA_BYTES'),
+    )
+    click.echo(
+        f"Removed {summary['removed']} workspaces ({summary['bytes_freed']} bytes); "
+        f"{summary['bytes_kept']} bytes remain."
+    )
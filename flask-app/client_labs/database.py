@@ -1,15 +1,41 @@
 import os
 import sys
-import libsql_client
+import time
+import atexit
+import threading
+from collections import deque
 from sqlite3 import DatabaseError  # For database-specific exceptions
 import click
 from flask.cli import with_appcontext
 
-def get_db_connection():
-    """Establishes a connection, handling both local file and remote DBs."""
-    db_url = os.getenv("TURSO_DATABASE_URL")
-    auth_token = os.getenv("TURSO_AUTH_TOKEN")
 
+class PoolTimeoutError(RuntimeError):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class PoolClosedError(RuntimeError):
+    """Raised when a client is requested from a pool that has been closed."""
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _libsql():
+    # Imported on first use: libsql_client pulls in aiohttp, which makes up
+    # much of the app's import time and isn't needed by most CLI commands.
+    import libsql_client
+    return libsql_client
+
+
+def _create_client(db_url, auth_token):
+    """Creates a new libsql client, handling both local file and remote DBs."""
     if not db_url:
         raise ValueError("TURSO_DATABASE_URL must be set")
 
@@ -19,8 +45,8 @@ def get_db_connection():
         file_path = db_url[5:]  # Remove 'file:' prefix
         if ".." in file_path:
             raise ValueError("Path traversal attempt detected in TURSO_DATABASE_URL")
-        
-        return libsql_client.create_client_sync(url=db_url)
+
+        return _libsql().create_client_sync(url=db_url)
 
     # Handle remote Turso database
     if not auth_token:
@@ -30,46 +56,343 @@ def get_db_connection():
         # Convert libsql:// URL to https:// for direct HTTP connection
         hostname = db_url.split("://")[1]
         http_url = f"https://{hostname}"
-        
+
         # Pass the NEW https_url to the client
-        client = libsql_client.create_client_sync(url=http_url, auth_token=auth_token)
+        client = _libsql().create_client_sync(url=http_url, auth_token=auth_token)
         return client
     except Exception as e:
         raise
 
-def init_db():
-    """Initializes the database and creates required tables."""
-    client = None
-    try:
-        client = get_db_connection()
-        client.execute("""
-            CREATE TABLE IF NOT EXISTS logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                tool_name TEXT NOT NULL,
-                input_data TEXT,
-                output_data TEXT
-            )
-        """)
-        client.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                google_id TEXT UNIQUE,
-                email TEXT NOT NULL UNIQUE,
-                name TEXT,
-                password_hash TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-    except Exception as e:
-        raise
-    finally:
-        if client:
+
+BUSY_RETRY_SECONDS = 5.0
+
+# Callables invoked as listener(sql, seconds) after every pooled execute/batch.
+query_listeners = []
+
+
+def _sql_text(stmt):
+    if isinstance(stmt, str):
+        return stmt
+    if isinstance(stmt, (tuple, list)):
+        return str(stmt[0])
+    return getattr(stmt, 'sql', str(stmt))
+
+
+def _notify_query(sql, seconds):
+    for listener in query_listeners:
+        try:
+            listener(sql, seconds)
+        except Exception:
+            pass
+
+
+class PooledClient:
+    """A libsql client borrowed from a ConnectionPool.
+
+    Exposes the same execute/batch/transaction API as the wrapped client.
+    Closing it, or leaving its ``with`` block, hands the client back to the
+    pool instead of tearing down its session.
+    """
+
+    def __init__(self, pool, client):
+        self._pool = pool
+        self._client = client
+
+    def _checked_out(self):
+        if self._client is None:
+            raise _libsql().LibsqlError("Client was returned to the pool", "CLIENT_CLOSED")
+        return self._client
+
+    def _retry_busy(self, call):
+        # Local file databases are opened without a busy timeout, so a
+        # concurrent writer fails immediately. The statement did not run;
+        # back off and retry for a bounded time.
+        delay, deadline = 0.005, time.monotonic() + BUSY_RETRY_SECONDS
+        while True:
+            try:
+                return call()
+            except _libsql().LibsqlError as e:
+                if e.code not in ("SQLITE_BUSY", "SQLITE_LOCKED") or time.monotonic() >= deadline:
+                    raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    def _timed(self, sql, call):
+        if not query_listeners:
+            return self._retry_busy(call)
+        start = time.perf_counter()
+        try:
+            return self._retry_busy(call)
+        finally:
+            _notify_query(sql, time.perf_counter() - start)
+
+    def execute(self, stmt, args=None):
+        client = self._checked_out()
+        return self._timed(_sql_text(stmt), lambda: client.execute(stmt, args))
+
+    def batch(self, stmts):
+        client = self._checked_out()
+        sql = '; '.join(_sql_text(s) for s in stmts)
+        return self._timed(sql, lambda: client.batch(stmts))
+
+    def transaction(self):
+        return self._checked_out().transaction()
+
+    @property
+    def closed(self):
+        return self._client is None
+
+    def close(self, suspect=False):
+        client, self._client = self._client, None
+        if client is not None:
+            self._pool.release(client, suspect=suspect)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # SQL errors leave the session intact; anything else (network errors,
+        # timeouts) forces a health check before the client is handed out again.
+        suspect = exc_val is not None and not isinstance(exc_val, _libsql().LibsqlError)
+        self.close(suspect=suspect)
+
+
+class ConnectionPool:
+    """A thread-safe, fork-aware pool of reusable libsql clients.
+
+    Idle clients are reused most-recently-used first, closed after
+    ``max_idle`` seconds without use, and pinged with ``SELECT 1`` before
+    being handed out if they have not been checked for
+    ``health_check_interval`` seconds. At most ``size`` clients exist at once;
+    callers beyond that wait up to ``timeout`` seconds.
+    """
+
+    def __init__(self, factory, size=4, timeout=10.0, max_idle=300.0, health_check_interval=30.0):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self._factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self._cond = threading.Condition()
+        self._closed = False
+        self._reset_locked()
+
+    def _reset_locked(self):
+        self._pid = os.getpid()
+        self._idle = deque()  # (client, released_at, checked_at), newest on the right
+        self._in_use = 0
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "waits": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "timeouts": 0,
+            "evictions": 0,
+            "health_check_failures": 0,
+        }
+
+    def _check_pid_locked(self):
+        # Clients inherited across a fork share the parent's sockets and
+        # event-loop thread; drop them without closing and start afresh.
+        if self._pid != os.getpid():
+            self._reset_locked()
+
+    def _evict_idle_locked(self, now):
+        evicted = []
+        while self._idle and now - self._idle[0][1] >= self.max_idle:
+            evicted.append(self._idle.popleft()[0])
+        self._stats["evictions"] += len(evicted)
+        return evicted
+
+    def _is_healthy(self, client):
+        if client.closed:
+            return False
+        try:
+            client.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        """Checks out a client, creating one if the pool is not yet full."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        client = None
+        checked_at = None
+        with self._cond:
+            self._check_pid_locked()
+            waited = False
+            while True:
+                if self._closed:
+                    raise PoolClosedError("The connection pool has been closed")
+                evicted = self._evict_idle_locked(time.monotonic())
+                if evicted:
+                    _close_quietly(evicted)
+                if self._idle:
+                    client, _, checked_at = self._idle.pop()
+                    self._stats["hits"] += 1
+                    break
+                if self._in_use < self.size:
+                    self._stats["misses"] += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"No database connection available after {self.timeout}s "
+                        f"(pool size {self.size})"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+            self._in_use += 1
+            if waited:
+                wait = time.monotonic() - start
+                self._stats["waits"] += 1
+                self._stats["wait_seconds_total"] += wait
+                self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], wait)
+
+        try:
+            if client is not None and time.monotonic() - checked_at >= self.health_check_interval:
+                if not self._is_healthy(client):
+                    with self._cond:
+                        self._stats["health_check_failures"] += 1
+                    _close_quietly([client])
+                    client = None
+            if client is None:
+                client = self._factory()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return PooledClient(self, client)
+
+    def release(self, client, suspect=False):
+        """Returns a checked-out client to the pool."""
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._in_use -= 1
+            closing = self._closed
+            if not closing and not client.closed:
+                now = time.monotonic()
+                self._idle.append((client, now, 0.0 if suspect else now))
+            self._cond.notify()
+        if closing:
+            _close_quietly([client])
+
+    def close(self):
+        """Closes every idle client; checked-out clients are closed on release.
+
+        A closed pool hands out no more clients.
+        """
+        with self._cond:
+            self._closed = True
+            idle = [entry[0] for entry in self._idle] if self._pid == os.getpid() else []
+            self._idle.clear()
+            self._cond.notify_all()
+        _close_quietly(idle)
+
+    def stats(self):
+        """Returns a snapshot of the pool's counters."""
+        with self._cond:
+            self._check_pid_locked()
+            stats = dict(self._stats)
+            stats.update(size=self.size, idle=len(self._idle), in_use=self._in_use)
+        return stats
+
+
+def _close_quietly(clients):
+    for client in clients:
+        try:
             client.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide pool for the configured database, creating it on first use."""
+    db_url = os.getenv("TURSO_DATABASE_URL")
+    auth_token = os.getenv("TURSO_AUTH_TOKEN")
+    key = (db_url, auth_token)
+
+    pool = _pools.get(key)
+    if pool is None:
+        # Validate the configuration eagerly rather than on first checkout.
+        if not db_url:
+            raise ValueError("TURSO_DATABASE_URL must be set")
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(
+                    lambda: _create_client(db_url, auth_token),
+                    size=_env_int("DB_POOL_SIZE", 4),
+                    timeout=_env_float("DB_POOL_TIMEOUT", 10.0),
+                    max_idle=_env_float("DB_POOL_MAX_IDLE", 300.0),
+                    health_check_interval=_env_float("DB_POOL_HEALTHCHECK_INTERVAL", 30.0),
+                )
+                _pools[key] = pool
+    return pool
+
+
+def get_db_connection():
+    """Checks a client out of the connection pool, for use as a context manager."""
+    return get_pool().acquire()
+
+
+def get_read_connection(written_at=None):
+    """A client for reads that may be served from the local replica.
+
+    Falls back to the primary when no replica is configured, it is too far
+    behind, or it has not yet caught up with a write made at ``written_at``.
+    """
+    from .replica import get_replica
+    replica = get_replica()
+    client = replica.client(written_at) if replica is not None else None
+    return client if client is not None else get_db_connection()
+
+
+def pool_stats():
+    """Returns the counters of every pool in this process, keyed by database URL."""
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {key[0]: pool.stats() for key, pool in pools}
+
+
+def close_pools():
+    """Closes every pool; the next ``get_pool`` starts a fresh one."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+# Each libsql sync client owns a non-daemon event-loop thread, and the
+# interpreter joins those threads *before* running atexit handlers. Close idle
+# clients from threading's shutdown hook (as concurrent.futures does) so a
+# warm pool never blocks process exit.
+if hasattr(threading, "_register_atexit"):
+    threading._register_atexit(close_pools)
+else:
+    atexit.register(close_pools)
+
+
+def init_db():
+    """Brings the schema up to date by applying pending migrations."""
+    from .migrations import migrate
+    return migrate()
 
 @click.command("init-db")
 @with_appcontext
 def init_db_command():
-    """Clears existing data and creates new tables."""
+    """Creates the tables, or migrates existing ones to the latest schema."""
     init_db()
-    click.echo("Initialized the database.")
\ No newline at end of file
+    click.echo("Initialized the database.")
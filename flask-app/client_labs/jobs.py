@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from . import database
+from .log_writer import log_writer
+
+log = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+TIMED_OUT = 'timed_out'
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED, TIMED_OUT)
+
+# Minimum seconds between progress writes for a job.
+PROGRESS_INTERVAL = 1.0
+
+
+class JobCancelled(Exception):
+    """Raised inside a job that was cancelled or timed out while running."""
+
+
+# --- Backends ---
+
+class InlineBackend:
+    """Runs each job synchronously in the submitting thread. Used by tests."""
+
+    def __init__(self, max_workers=None):
+        pass
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class ThreadBackend:
+    """Runs jobs on a thread pool inside the web worker."""
+
+    def __init__(self, max_workers=None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+
+    def submit(self, fn, *args):
+        return self._executor.submit(fn, *args)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+def _init_process_worker():
+    # Pool processes exit without running exit hooks, so anything buffered
+    # would be lost: write logs synchronously there (jobs are off the request
+    # path anyway).
+    log_writer.configure(mode='sync')
+
+
+class ProcessBackend(ThreadBackend):
+    """Runs jobs on a process pool, for CPU-bound work that would hold the GIL."""
+
+    def __init__(self, max_workers=None):
+        self._executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_process_worker)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+BACKENDS = {
+    'inline': InlineBackend,
+    'thread': ThreadBackend,
+    'process': ProcessBackend,
+}
+
+
+def register_backend(name, factory):
+    """Registers a queue backend. ``factory(max_workers)`` must return an
+    object with ``submit(fn, *args) -> Future`` and ``shutdown(wait)``."""
+    BACKENDS[name] = factory
+
+
+# --- Job state ---
+
+def create_job(job_id, tool_name, user_id=None):
+    with database.get_db_connection() as client:
+        client.execute(
+            "INSERT INTO jobs (id, tool_name, user_id, status) VALUES (?, ?, ?, ?)",
+            (job_id, tool_name, user_id, QUEUED)
+        )
+
+
+def get_job(job_id):
+    """Returns the job row as a dictionary, or None."""
+    with database.get_db_connection() as client:
+        result_set = client.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        row = result_set.rows[0] if result_set.rows else None
+        return dict(zip(result_set.columns, row)) if row else None
+
+
+def count_active_jobs(user_id, tool_name, max_age):
+    """Queued or running jobs of a user, ignoring any older than ``max_age`` seconds.
+
+    A worker that died mid-job leaves its row active; the age bound keeps
+    such rows from counting against the user forever.
+    """
+    placeholders = ', '.join('?' for _ in ACTIVE_STATUSES)
+    with database.get_db_connection() as client:
+        result_set = client.execute(
+            f"SELECT COUNT(*) FROM jobs WHERE user_id = ? AND status IN ({placeholders}) "
+            f"AND tool_name = ? AND created_at >= datetime('now', ?)",
+            (user_id, *ACTIVE_STATUSES, tool_name, f"-{int(max_age)} seconds")
+        )
+    return result_set.rows[0][0]
+
+
+def set_status(job_id, status, from_statuses, result=None, error=None):
+    """Moves a job to ``status`` if it is still in one of ``from_statuses``.
+
+    Returns True if the transition happened. The guard makes late results
+    from timed-out or cancelled jobs harmless.
+    """
+    placeholders = ', '.join('?' for _ in from_statuses)
+    timestamp_column = 'started_at' if status == RUNNING else 'finished_at'
+    with database.get_db_connection() as client:
+        result_set = client.execute(
+            f"UPDATE jobs SET status = ?, result = COALESCE(?, result), error = COALESCE(?, error), "
+            f"{timestamp_column} = CURRENT_TIMESTAMP WHERE id = ? AND status IN ({placeholders})",
+            (status, result, error, job_id, *from_statuses)
+        )
+    return result_set.rows_affected > 0
+
+
+def set_progress(job_id, progress):
+    """Stores a running job's progress (a JSON-serialisable dict).
+
+    Returns False if the job is no longer running.
+    """
+    with database.get_db_connection() as client:
+        result_set = client.execute(
+            "UPDATE jobs SET progress = ? WHERE id = ? AND status = ?",
+            (json.dumps(progress), job_id, RUNNING)
+        )
+    return result_set.rows_affected > 0
+
+
+class JobContext:
+    """Handed to every job function; lets long jobs notice cancellation and report progress."""
+
+    def __init__(self, job_id, progress_interval=PROGRESS_INTERVAL):
+        self.job_id = job_id
+        self.progress_interval = progress_interval
+        self.progress = {}
+        self._phase_started = time.monotonic()
+        self._last_write = None
+
+    def is_cancelled(self):
+        job = get_job(self.job_id)
+        return job is None or job['status'] != RUNNING
+
+    def report_progress(self, phase=None, fraction=None, force=False, **counts):
+        """Records progress, writing it at most once per ``progress_interval``.
+
+        A new ``phase`` is always written. ``fraction`` (0-1) of the current
+        phase yields an estimate of the seconds remaining in it. Raises
+        JobCancelled when a write finds the job cancelled or timed out, so
+        jobs stop at their next progress checkpoint.
+        """
+        now = time.monotonic()
+        if phase is not None and phase != self.progress.get('phase'):
+            self._phase_started = now
+            self.progress = {'phase': phase}
+            force = True
+        self.progress.update(counts)
+        if fraction is not None:
+            elapsed = now - self._phase_started
+            self.progress['percent'] = round(min(fraction, 1.0) * 100, 1)
+            self.progress['eta_seconds'] = round(elapsed * (1 - fraction) / fraction, 1) if fraction > 0 else None
+        if force or self._last_write is None or now - self._last_write >= self.progress_interval:
+            self._last_write = now
+            if not set_progress(self.job_id, self.progress):
+                raise JobCancelled(f"Job {self.job_id} is no longer running")
+
+
+def run_job(job_id, func, kwargs):
+    """Executes a job and records its outcome. Runs on the backend's workers."""
+    if not set_status(job_id, RUNNING, (QUEUED,)):
+        return None  # Cancelled while queued.
+    try:
+        result = func(JobContext(job_id), **kwargs)
+    except JobCancelled:
+        log.info("Job %s stopped after being cancelled or timing out", job_id)
+        return None
+    except Exception as e:
+        log.exception("Job %s failed", job_id)
+        set_status(job_id, FAILED, (RUNNING,), error=str(e))
+        return None
+    set_status(job_id, SUCCEEDED, (RUNNING,), result=result)
+    return result
+
+
+# --- Queue ---
+
+class JobQueue:
+    """Submits jobs to a worker pool and enforces per-job timeouts.
+
+    Backends and the watchdog thread are created lazily per process, so the
+    queue is safe to configure in a preloading gunicorn master. A running
+    thread or process cannot be killed safely, so timeouts and cancellation
+    mark the job as finished and discard whatever it returns. Jobs stop at
+    their next ``ctx.report_progress`` write (or may poll
+    ``ctx.is_cancelled()``).
+    """
+
+    def __init__(self, backend='thread', max_workers=2, timeout=600):
+        self.configure(backend, max_workers, timeout)
+
+    def init_app(self, app):
+        self.configure(
+            app.config['JOB_BACKEND'],
+            app.config['JOB_MAX_WORKERS'],
+            app.config['JOB_TIMEOUT'],
+        )
+
+    def configure(self, backend=None, max_workers=None, timeout=None):
+        if backend is not None and backend not in BACKENDS:
+            raise ValueError(f"Unknown job backend: {backend!r}")
+        self.shutdown(wait=False)
+        self.backend_name = backend or getattr(self, 'backend_name', 'thread')
+        self.max_workers = max_workers or getattr(self, 'max_workers', 2)
+        self.timeout = timeout or getattr(self, 'timeout', 600)
+        self._lock = threading.Lock()
+        self._backend = None
+        self._pid = None
+        self._pending = {}  # job_id -> (future, deadline)
+
+    def _get_backend(self):
+        with self._lock:
+            if self._backend is None or self._pid != os.getpid():
+                self._backend = BACKENDS[self.backend_name](self.max_workers)
+                self._pid = os.getpid()
+                self._pending = {}
+                if self.backend_name != 'inline':
+                    threading.Thread(target=self._watch, args=(self._backend,),
+                                     name='job-watchdog', daemon=True).start()
+            return self._backend
+
+    def submit(self, tool_name, func, user_id=None, timeout=None, job_id=None, **kwargs):
+        """Queues ``func(ctx, **kwargs)`` and returns the job's id."""
+        job_id = job_id or str(uuid.uuid4())
+        create_job(job_id, tool_name, user_id)
+        backend = self._get_backend()
+        future = backend.submit(run_job, job_id, func, kwargs)
+        if not future.done():
+            with self._lock:
+                self._pending[job_id] = (future, time.monotonic() + (timeout or self.timeout))
+            future.add_done_callback(lambda f: self._forget(job_id))
+        return job_id
+
+    def _forget(self, job_id):
+        with self._lock:
+            self._pending.pop(job_id, None)
+
+    def cancel(self, job_id):
+        """Cancels a queued or running job. Returns True if it was still active."""
+        with self._lock:
+            future, _ = self._pending.get(job_id, (None, None))
+        if future is not None:
+            future.cancel()
+        return set_status(job_id, CANCELLED, ACTIVE_STATUSES)
+
+    def _watch(self, backend):
+        while self._backend is backend:
+            time.sleep(1)
+            now = time.monotonic()
+            with self._lock:
+                expired = [job_id for job_id, (_, deadline) in self._pending.items() if deadline <= now]
+            for job_id in expired:
+                try:
+                    future, _ = self._pending.get(job_id, (None, None))
+                    if future is not None:
+                        future.cancel()
+                    set_status(job_id, TIMED_OUT, ACTIVE_STATUSES, error="Job exceeded its time limit")
+                except Exception:
+                    log.exception("Could not time out job %s", job_id)
+                self._forget(job_id)
+
+    def shutdown(self, wait=True):
+        backend = getattr(self, '_backend', None)
+        if backend is not None and self._pid == os.getpid():
+            self._backend = None
+            backend.shutdown(wait=wait)
+
+
+job_queue = JobQueue()
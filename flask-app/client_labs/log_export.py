@@ -0,0 +1,73 @@
+import io
+import csv
+import json
+import zlib
+import click
+from flask.cli import with_appcontext
+from . import log_store
+
+EXPORT_FIELDS = ("id", "timestamp", "tool_name", "input_data", "output_data")
+FORMATS = ("csv", "ndjson")
+MIMETYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def iter_csv(rows):
+    """Yields a CSV document, one encoded chunk per row, starting with a header."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_ndjson(rows):
+    """Yields one encoded JSON object per row."""
+    for row in rows:
+        yield (json.dumps({field: row.get(field) for field in EXPORT_FIELDS}) + "\n").encode("utf-8")
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip-compresses a stream of byte chunks incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_logs(fmt="csv", compress=False, tool_name=None, start=None, end=None, batch_size=1000):
+    """Returns an iterator of byte chunks holding the matching logs in ``fmt``."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt!r}")
+    rows = log_store.iter_logs(tool_name=tool_name, start=start, end=end, batch_size=batch_size)
+    chunks = iter_csv(rows) if fmt == "csv" else iter_ndjson(rows)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def export_filename(fmt, compress):
+    return f"logs.{fmt}" + (".gz" if compress else "")
+
+
+@click.command("export-logs")
+@click.option("--format", "fmt", type=click.Choice(FORMATS), default="csv", show_default=True)
+@click.option("--output", "-o", type=click.File("wb"), default="-", help="Destination file (default: stdout).")
+@click.option("--gzip", "compress", is_flag=True, help="Gzip-compress the output.")
+@click.option("--tool", "tool_name", help="Only export logs for this tool.")
+@click.option("--start", help="First day to export (YYYY-MM-DD).")
+@click.option("--end", help="Last day to export (YYYY-MM-DD).")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows fetched per query.")
+@with_appcontext
+def export_logs_command(fmt, output, compress, tool_name, start, end, batch_size):
+    """Streams the logs table as CSV or NDJSON."""
+    try:
+        start, end = log_store.parse_date(start), log_store.parse_date(end)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    for chunk in export_logs(fmt, compress, tool_name, start, end, batch_size):
+        output.write(chunk)
@@ -0,0 +1,357 @@
+"""Retention, archival and compaction for the ``logs`` table.
+
+Each tool keeps its logs for the number of days in LOG_RETENTION_POLICIES
+(``word_count=30,sitemap_processor=180``); other tools use
+LOG_RETENTION_DAYS, and 0 keeps a tool's logs forever. Expired rows are
+handled in chunks of LOG_RETENTION_BATCH_SIZE, oldest first. For each chunk:
+
+1. The full rows are written to the archive and flushed to disk.
+   - ``ndjson``: one gzip member per chunk in ``logs-<run>.ndjson.gz``.
+   - ``sqlite``: INSERT OR IGNORE into ``logs-archive.sqlite``, so a chunk
+     archived twice is stored once.
+   - ``none``: nothing is archived.
+2. The rows are then deleted in one short transaction, so the pruning
+   holds a write lock for one chunk at a time, never for the whole run.
+
+Compaction (LOG_PAYLOAD_MIN_BYTES > 0) moves payloads longer than that
+into ``log_payloads`` as zlib blobs and leaves a preview in the row, so
+the rows the /logs view scans stay small. ``log_store`` puts the full text
+back when a single log or an export is read.
+
+Freed pages are reused by SQLite and Turso; no VACUUM is run, since it
+would lock the whole database.
+"""
+import os
+import json
+import time
+import uuid
+import gzip
+import zlib
+import sqlite3
+import logging
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from . import database
+from . import log_store
+from . import replica
+
+log = logging.getLogger(__name__)
+
+ARCHIVE_FORMATS = ('ndjson', 'sqlite', 'none')
+LOG_COLUMNS = ('id', 'timestamp', 'tool_name', 'input_data', 'output_data')
+LEASE_NAME = 'log-retention'
+
+
+def parse_policies(value):
+    """Parses ``tool=days,tool=days`` into a dict. Raises ValueError if malformed."""
+    policies = {}
+    for item in (value or '').split(','):
+        if not item.strip():
+            continue
+        tool_name, sep, days = item.partition('=')
+        if not sep or not tool_name.strip():
+            raise ValueError(f"Invalid retention policy: {item!r}")
+        policies[tool_name.strip()] = float(days)
+    return policies
+
+
+def _cutoff(days, now):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now - days * 86400))
+
+
+def _payload_bytes(row):
+    return sum(len((row.get(column) or '').encode('utf-8')) for column in ('input_data', 'output_data'))
+
+
+# --- Archives ---
+
+class NdjsonArchive:
+    """Appends chunks to a gzipped NDJSON file, one gzip member per chunk."""
+
+    def __init__(self, directory, run_id):
+        self.path = os.path.join(directory, f"logs-{run_id}.ndjson.gz")
+
+    def write(self, rows):
+        data = ''.join(json.dumps({column: row.get(column) for column in LOG_COLUMNS}) + '\n' for row in rows)
+        with open(self.path, 'ab') as f:
+            f.write(gzip.compress(data.encode('utf-8')))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        pass
+
+
+class SqliteArchive:
+    """Copies chunks into a local SQLite file with the logs table's columns."""
+
+    def __init__(self, directory, run_id):
+        self.path = os.path.join(directory, 'logs-archive.sqlite')
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS logs (
+                id INTEGER PRIMARY KEY,
+                timestamp DATETIME,
+                tool_name TEXT NOT NULL,
+                input_data TEXT,
+                output_data TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_tool_name_timestamp ON logs (tool_name, timestamp)")
+
+    def write(self, rows):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO logs (id, timestamp, tool_name, input_data, output_data) VALUES (?, ?, ?, ?, ?)",
+                [tuple(row.get(column) for column in LOG_COLUMNS) for row in rows],
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+class NullArchive:
+    path = None
+
+    def write(self, rows):
+        pass
+
+    def close(self):
+        pass
+
+
+def open_archive(fmt, directory, run_id):
+    if fmt not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unknown archive format: {fmt!r}")
+    if fmt == 'none':
+        return NullArchive()
+    os.makedirs(directory, exist_ok=True)
+    return (NdjsonArchive if fmt == 'ndjson' else SqliteArchive)(directory, run_id)
+
+
+# --- Pruning ---
+
+def _expired_chunk(client, tool_clause, params, cutoff, batch_size):
+    result_set = client.execute(
+        f"SELECT id, timestamp, tool_name, input_data, output_data FROM logs "
+        f"WHERE {tool_clause} AND timestamp < ? ORDER BY timestamp, id LIMIT ?",
+        [*params, cutoff, batch_size],
+    )
+    rows = [dict(zip(result_set.columns, row)) for row in result_set.rows]
+    stored = {row['id']: _payload_bytes(row) for row in rows}
+    log_store.restore_payloads(client, rows)
+    if rows:
+        # Compacted rows also free their blobs.
+        placeholders = ', '.join('?' for _ in rows)
+        blob_sizes = client.execute(
+            f"SELECT log_id, COALESCE(length(input_data), 0) + COALESCE(length(output_data), 0) "
+            f"FROM log_payloads WHERE log_id IN ({placeholders})",
+            [row['id'] for row in rows],
+        ).rows
+        for log_id, size in blob_sizes:
+            stored[log_id] += size
+    return rows, sum(stored.values())
+
+
+def _delete_rows(client, ids):
+    placeholders = ', '.join('?' for _ in ids)
+    client.batch([
+        (f"DELETE FROM log_payloads WHERE log_id IN ({placeholders})", list(ids)),
+        (f"DELETE FROM logs WHERE id IN ({placeholders})", list(ids)),
+    ])
+
+
+def prune_logs(policies=None, default_days=0, archive_format='ndjson', archive_dir=None,
+               batch_size=500, dry_run=False, now=None):
+    """Archives and deletes expired logs. Returns a summary of what was reclaimed."""
+    policies = policies or {}
+    now = time.time() if now is None else now
+    run_id = time.strftime('%Y%m%dT%H%M%S', time.gmtime(now)) + '-' + uuid.uuid4().hex[:6]
+    summary = {'archived': 0, 'deleted': 0, 'bytes_reclaimed': 0, 'by_tool': {}, 'archive': None}
+
+    # (clause, params, days) per policy; the default covers every unlisted tool.
+    scopes = [("tool_name = ?", [tool_name], days) for tool_name, days in sorted(policies.items())]
+    if policies:
+        placeholders = ', '.join('?' for _ in policies)
+        scopes.append((f"tool_name NOT IN ({placeholders})", sorted(policies), default_days))
+    else:
+        scopes.append(("1 = 1", [], default_days))
+
+    archive = None
+    try:
+        for clause, params, days in scopes:
+            if not days or days <= 0:
+                continue
+            cutoff = _cutoff(days, now)
+            if dry_run:
+                with database.get_db_connection() as client:
+                    rows = client.execute(
+                        f"SELECT tool_name, COUNT(*), COALESCE(SUM(COALESCE(length(input_data), 0) + COALESCE(length(output_data), 0)), 0) "
+                        f"FROM logs WHERE {clause} AND timestamp < ? GROUP BY tool_name",
+                        [*params, cutoff],
+                    ).rows
+                for tool_name, count, size in rows:
+                    summary['by_tool'][tool_name] = summary['by_tool'].get(tool_name, 0) + count
+                    summary['deleted'] += count
+                    summary['bytes_reclaimed'] += size
+                continue
+
+            while True:
+                # One pooled connection per chunk, released between chunks.
+                with database.get_db_connection() as client:
+                    rows, size = _expired_chunk(client, clause, params, cutoff, batch_size)
+                    if not rows:
+                        break
+                    if archive is None:
+                        archive = open_archive(archive_format, archive_dir, run_id)
+                        summary['archive'] = archive.path
+                    archive.write(rows)
+                    _delete_rows(client, [row['id'] for row in rows])
+                if archive_format != 'none':
+                    summary['archived'] += len(rows)
+                summary['deleted'] += len(rows)
+                summary['bytes_reclaimed'] += size
+                for row in rows:
+                    summary['by_tool'][row['tool_name']] = summary['by_tool'].get(row['tool_name'], 0) + 1
+                if len(rows) < batch_size:
+                    break
+    finally:
+        if archive is not None:
+            archive.close()
+    return summary
+
+
+# --- Compaction ---
+
+def compact_payloads(min_bytes, batch_size=500, preview_chars=log_store.PREVIEW_CHARS):
+    """Moves payloads longer than ``min_bytes`` characters into ``log_payloads``."""
+    summary = {'compacted': 0, 'bytes_saved': 0}
+    if not min_bytes or min_bytes <= 0:
+        return summary
+    last_id = 0
+    while True:
+        with database.get_db_connection() as client:
+            result_set = client.execute(
+                "SELECT id, input_data, output_data FROM logs "
+                "WHERE id > ? AND (length(input_data) > ? OR length(output_data) > ?) "
+                "AND id NOT IN (SELECT log_id FROM log_payloads) ORDER BY id LIMIT ?",
+                [last_id, min_bytes, min_bytes, batch_size],
+            )
+            rows = result_set.rows
+            if not rows:
+                break
+            statements = []
+            for log_id, input_data, output_data in rows:
+                blobs, lengths, previews, saved = [], [], [], 0
+                for text in (input_data, output_data):
+                    if text is not None and len(text) > min_bytes:
+                        blob = zlib.compress(text.encode('utf-8'), 6)
+                        preview = text[:preview_chars]
+                        saved += len(text.encode('utf-8')) - len(blob) - len(preview.encode('utf-8'))
+                        blobs.append(blob)
+                        lengths.append(len(text))
+                        previews.append(preview)
+                    else:
+                        blobs.append(None)
+                        lengths.append(None)
+                        previews.append(text)
+                statements.append((
+                    "INSERT INTO log_payloads (log_id, input_data, output_data, input_length, output_length) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [log_id, *blobs, *lengths],
+                ))
+                statements.append((
+                    "UPDATE logs SET input_data = ?, output_data = ? WHERE id = ?",
+                    [*previews, log_id],
+                ))
+                summary['bytes_saved'] += saved
+            client.batch(statements)
+        summary['compacted'] += len(rows)
+        last_id = rows[-1][0]
+        if len(rows) < batch_size:
+            break
+    return summary
+
+
+# --- Scheduling ---
+
+def acquire_lease(name, holder, ttl, now=None):
+    """Takes (or renews) a named lease for ``ttl`` seconds. Returns whether we hold it."""
+    now = time.time() if now is None else now
+    with database.get_db_connection() as client:
+        client.execute(
+            "INSERT INTO maintenance_leases (name, holder, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+            "WHERE maintenance_leases.holder = excluded.holder OR maintenance_leases.expires_at < ?",
+            (name, holder, now + ttl, now),
+        )
+        rows = client.execute("SELECT holder FROM maintenance_leases WHERE name = ?", (name,)).rows
+    return bool(rows) and rows[0][0] == holder
+
+
+def settings_from_config(app):
+    config = app.config
+    return {
+        'policies': parse_policies(config['LOG_RETENTION_POLICIES']),
+        'default_days': config['LOG_RETENTION_DAYS'],
+        'archive_format': config['LOG_ARCHIVE_FORMAT'],
+        'archive_dir': config['LOG_ARCHIVE_DIR'] or os.path.join(app.instance_path, 'log-archive'),
+        'batch_size': config['LOG_RETENTION_BATCH_SIZE'],
+    }
+
+
+def run_from_config(app=None):
+    """One scheduled pass: compaction, then pruning, if this worker holds the lease."""
+    app = app or current_app
+    holder = f"{os.uname().nodename}:{os.getpid()}"
+    if not acquire_lease(LEASE_NAME, holder, ttl=max(app.config['LOG_RETENTION_INTERVAL'], 60) * 2):
+        return None
+    settings = settings_from_config(app)
+    summary = compact_payloads(app.config['LOG_PAYLOAD_MIN_BYTES'], settings['batch_size'])
+    summary.update(prune_logs(**settings))
+    trim_replica_changes()
+    if summary['deleted'] or summary['compacted']:
+        log.info("Log retention: deleted %(deleted)d rows (%(bytes_reclaimed)d bytes), "
+                 "compacted %(compacted)d (%(bytes_saved)d bytes saved)", summary)
+    return summary
+
+
+def trim_replica_changes():
+    # Retention deletes are logged for read replicas too; keep that log bounded.
+    with database.get_db_connection() as client:
+        replica.trim_changes(client, replica.change_retention())
+
+
+@click.command("prune-logs")
+@click.option("--dry-run", is_flag=True, help="Only report what would be deleted.")
+@click.option("--format", "archive_format", type=click.Choice(ARCHIVE_FORMATS), help="Archive format.")
+@click.option("--archive-dir", help="Where archives are written.")
+@click.option("--batch-size", type=int, help="Rows archived and deleted per transaction.")
+@click.option("--compact/--no-compact", default=True, help="Move large payloads out of row first.")
+@with_appcontext
+def prune_logs_command(dry_run, archive_format, archive_dir, batch_size, compact):
+    """Archives and deletes logs past their tool's retention period."""
+    try:
+        settings = settings_from_config(current_app)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    if archive_format:
+        settings['archive_format'] = archive_format
+    if archive_dir:
+        settings['archive_dir'] = archive_dir
+    if batch_size:
+        settings['batch_size'] = batch_size
+
+    if compact and not dry_run:
+        compacted = compact_payloads(current_app.config['LOG_PAYLOAD_MIN_BYTES'], settings['batch_size'])
+        if compacted['compacted']:
+            click.echo(f"Compacted {compacted['compacted']} rows, saving {compacted['bytes_saved']} bytes.")
+    summary = prune_logs(dry_run=dry_run, **settings)
+    if not dry_run:
+        trim_replica_changes()
+    for tool_name, count in sorted(summary['by_tool'].items()):
+        click.echo(f"  {tool_name}: {count}")
+    verb = "Would delete" if dry_run else "Deleted"
+    click.echo(f"{verb} {summary['deleted']} rows ({summary['bytes_reclaimed']} bytes)"
+               + (f"; archived to {summary['archive']}" if summary['archive'] else "") + ".")
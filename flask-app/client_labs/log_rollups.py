@@ -0,0 +1,107 @@
+"""Per-tool, per-day usage counts for the dashboard.
+
+``log_writer`` adds ``rollup_statements(records)`` to the batch that
+inserts the log rows, so each flush updates one row per (day, tool) it
+touched instead of the dashboard counting ``logs`` on every view.
+``dashboard_stats`` reads only the rollups plus the newest few logs
+(served by the timestamp index), and the app caches its result for
+DASHBOARD_STATS_TTL seconds.
+"""
+import time
+import click
+from flask.cli import with_appcontext
+from . import database
+
+RECENT_LIMIT = 10
+SERIES_DAYS = 14
+
+UPSERT_SQL = (
+    "INSERT INTO log_rollups (day, tool_name, runs, last_run_at) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (day, tool_name) DO UPDATE SET runs = runs + excluded.runs, "
+    "last_run_at = max(COALESCE(last_run_at, ''), excluded.last_run_at)"
+)
+
+
+def rollup_statements(records):
+    """UPSERTs adding (timestamp, tool_name, ...) records to their day's counts."""
+    counts = {}
+    for timestamp, tool_name, *_ in records:
+        key = (timestamp[:10], tool_name)
+        runs, last_run_at = counts.get(key, (0, timestamp))
+        counts[key] = (runs + 1, max(last_run_at, timestamp))
+    return [(UPSERT_SQL, [day, tool_name, runs, last_run_at])
+            for (day, tool_name), (runs, last_run_at) in sorted(counts.items())]
+
+
+def _day(now, days_ago=0):
+    return time.strftime('%Y-%m-%d', time.gmtime(now - days_ago * 86400))
+
+
+def dashboard_stats(client, now=None, series_days=SERIES_DAYS, recent_limit=RECENT_LIMIT):
+    """Per-tool totals, a daily series and the latest runs."""
+    now = time.time() if now is None else now
+    today, week_start, series_start = _day(now), _day(now, 6), _day(now, series_days - 1)
+    result_set = client.execute(
+        "SELECT tool_name, SUM(runs), SUM(CASE WHEN day = ? THEN runs ELSE 0 END), "
+        "SUM(CASE WHEN day >= ? THEN runs ELSE 0 END), MAX(last_run_at) "
+        "FROM log_rollups GROUP BY tool_name ORDER BY SUM(runs) DESC, tool_name",
+        (today, week_start),
+    )
+    tools = [
+        {'tool_name': tool_name, 'total': total, 'today': today_runs, 'last_7_days': week_runs,
+         'last_run_at': last_run_at}
+        for tool_name, total, today_runs, week_runs, last_run_at in result_set.rows
+    ]
+
+    by_day = dict(tuple(row) for row in client.execute(
+        "SELECT day, SUM(runs) FROM log_rollups WHERE day >= ? GROUP BY day", (series_start,)
+    ).rows)
+    series = [{'day': day, 'runs': by_day.get(day, 0)}
+              for day in (_day(now, ago) for ago in range(series_days - 1, -1, -1))]
+
+    result_set = client.execute(
+        "SELECT id, timestamp, tool_name FROM logs ORDER BY timestamp DESC, id DESC LIMIT ?",
+        (recent_limit,),
+    )
+    recent = [dict(zip(result_set.columns, row)) for row in result_set.rows]
+    return {
+        'tools': tools,
+        'total_runs': sum(tool['total'] for tool in tools),
+        'runs_today': sum(tool['today'] for tool in tools),
+        'series': series,
+        'recent': recent,
+    }
+
+
+def backfill_rollups(since=None):
+    """Recounts the rollups of every day (from ``since``) that still has logs.
+
+    Days whose logs were pruned keep their counts. Runs as one statement, so
+    concurrent log writes are either counted here or added afterwards.
+    """
+    since = since[:10] if since else None  # Whole days only, or the counts would be partial.
+    # The SELECT always has a WHERE, so SQLite can't read the upsert's ON as a join.
+    where, params = ("WHERE timestamp >= ?", [since]) if since else ("WHERE 1", [])
+    with database.get_db_connection() as client:
+        client.execute(
+            "INSERT INTO log_rollups (day, tool_name, runs, last_run_at) "
+            f"SELECT substr(timestamp, 1, 10), tool_name, COUNT(*), MAX(timestamp) FROM logs {where} "
+            "GROUP BY substr(timestamp, 1, 10), tool_name "
+            "ON CONFLICT (day, tool_name) DO UPDATE SET runs = excluded.runs, last_run_at = excluded.last_run_at",
+            params,
+        )
+        result_set = client.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(runs), 0) FROM log_rollups{' WHERE day >= ?' if since else ''}",
+            [since] if since else [],
+        )
+    days_tools, runs = result_set.rows[0]
+    return {'rollups': days_tools, 'runs': runs}
+
+
+@click.command("backfill-rollups")
+@click.option("--since", help="Only recount days from this date (YYYY-MM-DD).")
+@with_appcontext
+def backfill_rollups_command(since):
+    """Rebuilds the dashboard's per-day usage counts from the logs table."""
+    summary = backfill_rollups(since)
+    click.echo(f"Recounted {summary['runs']} runs in {summary['rollups']} day/tool rollups.")
@@ -0,0 +1,156 @@
+import zlib
+import base64
+from datetime import datetime
+from . import database
+
+PAGE_SIZE = 50
+PREVIEW_CHARS = 300
+
+# Payloads compacted into log_payloads keep a preview in-row, so only their
+# lengths come from the joined table.
+LIST_COLUMNS = """
+    logs.id, logs.timestamp, logs.tool_name,
+    substr(logs.input_data, 1, ?) AS input_preview,
+    COALESCE(p.input_length, length(logs.input_data)) AS input_length,
+    substr(logs.output_data, 1, ?) AS output_preview,
+    COALESCE(p.output_length, length(logs.output_data)) AS output_length
+"""
+
+
+def encode_cursor(timestamp, log_id):
+    """Encodes a (timestamp, id) position as an opaque, URL-safe cursor."""
+    raw = f"{timestamp}|{log_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Decodes a cursor from encode_cursor. Raises ValueError if it is malformed."""
+    try:
+        timestamp, log_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").rsplit("|", 1)
+        return timestamp, int(log_id)
+    except (UnicodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def parse_date(value):
+    """Parses a YYYY-MM-DD filter value, returning None when it is empty."""
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+
+
+def build_filters(tool_name=None, start=None, end=None):
+    """Returns the WHERE clauses and parameters for the given log filters.
+
+    ``start`` and ``end`` are inclusive YYYY-MM-DD dates.
+    """
+    clauses, params = [], []
+    if tool_name:
+        clauses.append("tool_name = ?")
+        params.append(tool_name)
+    if start:
+        clauses.append("timestamp >= ?")
+        params.append(start)
+    if end:
+        clauses.append("timestamp < date(?, '+1 day')")
+        params.append(end)
+    return clauses, params
+
+
+def list_logs(client, tool_name=None, start=None, end=None, cursor=None,
+              limit=PAGE_SIZE, preview_chars=PREVIEW_CHARS):
+    """Returns one page of logs, newest first, and the cursor for the next page.
+
+    Pages are keyed on (timestamp, id) so every page is an index range scan,
+    however deep the user pages. Payload columns are truncated in SQL so the
+    full inputs and outputs never leave the database.
+    """
+    clauses, params = build_filters(tool_name, start, end)
+    if cursor:
+        clauses.append("(timestamp, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    result_set = client.execute(
+        f"SELECT {LIST_COLUMNS} FROM logs LEFT JOIN log_payloads p ON p.log_id = logs.id "
+        f"{where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+        [preview_chars, preview_chars, *params, limit + 1],
+    )
+    rows = [dict(zip(result_set.columns, row)) for row in result_set.rows]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    return rows, next_cursor
+
+
+def load_payloads(client, log_ids):
+    """Returns {log_id: {column: text}} for the given logs' out-of-row payloads."""
+    if not log_ids:
+        return {}
+    placeholders = ', '.join('?' for _ in log_ids)
+    result_set = client.execute(
+        f"SELECT log_id, input_data, output_data FROM log_payloads WHERE log_id IN ({placeholders})",
+        list(log_ids),
+    )
+    return {
+        log_id: {
+            column: zlib.decompress(blob).decode('utf-8')
+            for column, blob in (('input_data', input_blob), ('output_data', output_blob))
+            if blob is not None
+        }
+        for log_id, input_blob, output_blob in result_set.rows
+    }
+
+
+def restore_payloads(client, rows):
+    """Replaces the previews of compacted rows with their full payloads, in place."""
+    payloads = load_payloads(client, [row["id"] for row in rows])
+    for row in rows:
+        row.update(payloads.get(row["id"], {}))
+    return rows
+
+
+def get_log(client, log_id):
+    """Returns a single log row with its full payloads, or None."""
+    result_set = client.execute("SELECT * FROM logs WHERE id = ?", (log_id,))
+    row = result_set.rows[0] if result_set.rows else None
+    if not row:
+        return None
+    return restore_payloads(client, [dict(zip(result_set.columns, row))])[0]
+
+
+def list_tool_names(client):
+    """Returns the distinct tool names present in the logs table."""
+    result_set = client.execute("SELECT DISTINCT tool_name FROM logs ORDER BY tool_name")
+    return [row[0] for row in result_set.rows]
+
+
+def iter_logs(tool_name=None, start=None, end=None, batch_size=1000, connect=None):
+    """Yields full log rows, oldest first, fetching ``batch_size`` rows per query.
+
+    A connection is only held for the duration of each batch query, so a slow
+    consumer (e.g. a client downloading an export) never pins a pooled client.
+    """
+    connect = connect or database.get_db_connection
+    base_clauses, base_params = build_filters(tool_name, start, end)
+    position = None
+    while True:
+        clauses, params = list(base_clauses), list(base_params)
+        if position is not None:
+            clauses.append("(timestamp, id) > (?, ?)")
+            params.extend(position)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with connect() as client:
+            result_set = client.execute(
+                f"SELECT id, timestamp, tool_name, input_data, output_data FROM logs {where} "
+                "ORDER BY timestamp, id LIMIT ?",
+                [*params, batch_size],
+            )
+            columns = result_set.columns
+            rows = restore_payloads(client, [dict(zip(columns, row)) for row in result_set.rows])
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        position = (rows[-1]["timestamp"], rows[-1]["id"])
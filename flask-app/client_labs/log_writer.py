@@ -0,0 +1,197 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from . import database
+from . import log_rollups
+
+log = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 200  # 4 bound parameters per row stays well under SQLite's limit.
+
+
+def utc_timestamp():
+    """Returns the current UTC time in the format of SQLite's CURRENT_TIMESTAMP."""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+
+
+def insert_records(records):
+    """Writes (timestamp, tool_name, input_data, output_data) records.
+
+    Up to MAX_BATCH_SIZE records go in one INSERT; larger sets are sent as
+    several INSERTs. Either way the batch also updates the dashboard's
+    rollups, in one round trip and one transaction.
+    """
+    if not records:
+        return
+    statements = []
+    for start in range(0, len(records), MAX_BATCH_SIZE):
+        chunk = records[start:start + MAX_BATCH_SIZE]
+        placeholders = ', '.join('(?, ?, ?, ?)' for _ in chunk)
+        params = [value for record in chunk for value in record]
+        statements.append((
+            f"INSERT INTO logs (timestamp, tool_name, input_data, output_data) VALUES {placeholders}",
+            params
+        ))
+    statements.extend(log_rollups.rollup_statements(records))
+    with database.get_db_connection() as client:
+        client.batch(statements)
+
+
+class LogWriter:
+    """Buffers audit-log records and writes them in multi-row batches.
+
+    In ``async`` mode a background thread flushes whenever ``batch_size``
+    records are waiting or ``flush_interval`` seconds have passed. The
+    queue is bounded: when it is full, ``write`` blocks for up to
+    ``block_timeout`` seconds and then writes the record itself, so a slow
+    database pushes back on callers instead of growing memory. ``sync`` mode
+    writes every record immediately and is what tests use.
+
+    Records carry the time they were logged, not the time they were flushed.
+    """
+
+    def __init__(self, mode='async', batch_size=100, flush_interval=1.0, max_queue=10000, block_timeout=0.5):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.stats = {'enqueued': 0, 'written': 0, 'batches': 0, 'sync_writes': 0, 'dropped': 0}
+        self.configure(mode, batch_size, flush_interval, max_queue, block_timeout)
+
+    def init_app(self, app):
+        self.configure(
+            app.config['LOG_WRITER_MODE'],
+            app.config['LOG_WRITER_BATCH_SIZE'],
+            app.config['LOG_WRITER_FLUSH_INTERVAL'],
+            app.config['LOG_WRITER_QUEUE_SIZE'],
+            app.config['LOG_WRITER_BLOCK_TIMEOUT'],
+        )
+
+    def configure(self, mode=None, batch_size=None, flush_interval=None, max_queue=None, block_timeout=None):
+        if mode is not None and mode not in ('async', 'sync'):
+            raise ValueError(f"Unknown log writer mode: {mode!r}")
+        self.close()
+        self.mode = mode or getattr(self, 'mode', 'async')
+        self.batch_size = min(batch_size or getattr(self, 'batch_size', 100), MAX_BATCH_SIZE)
+        self.flush_interval = flush_interval or getattr(self, 'flush_interval', 1.0)
+        self.max_queue = max_queue or getattr(self, 'max_queue', 10000)
+        self.block_timeout = block_timeout if block_timeout is not None else getattr(self, 'block_timeout', 0.5)
+        self._queue = queue.Queue(maxsize=self.max_queue)
+
+    def write(self, tool_name, input_data, output_data):
+        """Records a tool invocation in the logs table.
+
+        Returns an event that is set once the record is committed (or dropped).
+        """
+        record = (utc_timestamp(), tool_name, input_data, output_data)
+        done = threading.Event()
+        if self.mode == 'sync':
+            self._write_now([record])
+            done.set()
+            return done
+        self._ensure_thread()
+        try:
+            self._queue.put((record, done), timeout=self.block_timeout)
+            self.stats['enqueued'] += 1
+        except queue.Full:
+            self._write_now([record])
+            done.set()
+        return done
+
+    def write_many(self, entries):
+        """Records several (tool_name, input_data, output_data) entries at once.
+
+        Bypasses the queue, so the entries are written together in a single
+        round trip before this returns.
+        """
+        timestamp = utc_timestamp()
+        self._write_now([(timestamp, *entry) for entry in entries])
+
+    def _write_now(self, records):
+        insert_records(records)
+        self.stats['sync_writes'] += len(records)
+        self.stats['written'] += len(records)
+
+    def _ensure_thread(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A forked child inherits the queue object but not the thread.
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._thread = threading.Thread(target=self._run, args=(self._queue,), name='log-writer', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self, records_queue):
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                first = records_queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            item = first
+            while True:
+                if item is None:
+                    stopping = True
+                else:
+                    batch.append(item)
+                if stopping or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = records_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            self._flush_batch([record for record, _ in batch])
+            for _, done in batch:
+                done.set()
+            for _ in range(len(batch) + (1 if stopping else 0)):
+                records_queue.task_done()
+
+    def _flush_batch(self, batch):
+        if not batch:
+            return
+        for attempt in range(2):
+            try:
+                insert_records(batch)
+                self.stats['written'] += len(batch)
+                self.stats['batches'] += 1
+                return
+            except Exception:
+                if attempt:
+                    log.exception("Dropping %d log records after a failed write", len(batch))
+                    self.stats['dropped'] += len(batch)
+                else:
+                    time.sleep(0.5)
+
+    def flush(self):
+        """Blocks until every queued record has been written."""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def close(self):
+        """Flushes pending records and stops the background thread."""
+        with self._lock:
+            thread, pid = self._thread, self._pid
+            self._thread = self._pid = None
+        if thread is not None and pid == os.getpid():
+            self._queue.put(None)
+            thread.join()
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+
+log_writer = LogWriter()
+
+# Registered after database's hook, so it runs first: pending records are
+# written before the connection pools are closed.
+if hasattr(threading, "_register_atexit"):
+    threading._register_atexit(log_writer.close)
+else:
+    atexit.register(log_writer.close)
@@ -0,0 +1,316 @@
+import time
+import hmac
+import bisect
+import logging
+import threading
+from flask import g, request, request_started, has_request_context, Response, abort
+from . import database
+from .log_writer import log_writer
+from .passwords import password_hasher
+from .oauth_cache import discovery_cache
+from . import replica
+from .ratelimit import limiter
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, '') for name in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._values = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(entry)) for key, entry in self._values.items()]
+        for key, entry in items:
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                yield f'{self.name}_bucket', labels + (('le', bound),), cumulative
+            yield f'{self.name}_bucket', labels + (('le', '+Inf'),), entry[-1]
+            yield f'{self.name}_sum', labels, entry[-2]
+            yield f'{self.name}_count', labels, entry[-1]
+
+
+class Registry:
+    """Holds metrics and collectors and renders the Prometheus text format.
+
+    Metrics are per process: with several gunicorn workers, each scrape sees
+    the worker that happened to answer it.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """Adds a callable returning ``(name, type, help, [(labels, value), ...])`` tuples."""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception:
+                log.exception("Metrics collector %r failed", collector)
+                continue
+            for name, metric_type, help, samples in families:
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(tuple(labels))} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Time spent handling requests.', ('endpoint', 'method', 'status'))
+request_db_queries = registry.histogram(
+    'http_request_db_queries', 'Database queries issued per request.', ('endpoint',), COUNT_BUCKETS)
+query_duration = registry.histogram(
+    'db_query_duration_seconds', 'Database query latency.', ('operation',), QUERY_BUCKETS)
+slow_queries = registry.counter(
+    'db_slow_queries_total', 'Queries slower than SLOW_QUERY_MS.', ('operation',))
+
+
+def _pool_collector():
+    totals = {}
+    for stats in database.pool_stats().values():
+        for key, value in stats.items():
+            totals[key] = totals.get(key, 0) + value
+    for key in ('hits', 'misses', 'waits', 'timeouts', 'evictions', 'health_check_failures'):
+        yield f'db_pool_{key}_total', 'counter', f'Connection pool {key.replace("_", " ")}.', [((), totals.get(key, 0))]
+    yield ('db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a pooled connection.',
+           [((), totals.get('wait_seconds_total', 0.0))])
+    for key in ('idle', 'in_use'):
+        yield f'db_pool_{key}_connections', 'gauge', f'Pooled connections {key.replace("_", " ")}.', [((), totals.get(key, 0))]
+
+
+def _log_writer_collector():
+    for key, value in sorted(log_writer.stats.items()):
+        yield f'log_writer_{key}_total', 'counter', f'Audit-log records {key.replace("_", " ")}.', [((), value)]
+    yield 'log_writer_queue_depth', 'gauge', 'Audit-log records waiting to be written.', [((), log_writer.queue_depth())]
+
+
+def _password_collector():
+    stats = password_hasher.stats
+    for key in ('hashes', 'verifications', 'rehashes', 'rejected'):
+        yield f'password_{key}_total', 'counter', f'Password {key} since start.', [((), stats[key])]
+    yield 'password_hash_seconds_total', 'counter', 'Time spent waiting for password hashes.', [((), stats['seconds'])]
+
+
+def _oauth_cache_collector():
+    for key, value in sorted(discovery_cache.stats.items()):
+        yield f'oauth_cache_{key}_total', 'counter', f'OAuth metadata cache {key.replace("_", " ")}.', [((), value)]
+
+
+def _replica_collector():
+    current = replica.get_replica()
+    if current is None:
+        return
+    for key, value in sorted(current.stats.items()):
+        yield f'db_replica_{key}_total', 'counter', f'Read replica {key.replace("_", " ")}.', [((), value)]
+    lag = current.lag()
+    if lag is not None:
+        yield 'db_replica_lag_seconds', 'gauge', 'Seconds since the last replica sync started.', [((), lag)]
+
+
+def _ratelimit_collector():
+    counts = sorted(limiter.stats.items())
+    yield 'ratelimit_allowed_total', 'counter', 'Rate-limited requests let through.', [
+        ((('scope', scope),), value) for (scope, outcome), value in counts if outcome == 'allowed']
+    yield 'ratelimit_rejected_total', 'counter', 'Requests rejected with 429, by the limit hit.', [
+        ((('scope', scope), ('limit', outcome)), value) for (scope, outcome), value in counts if outcome != 'allowed']
+
+
+_caches = {}
+
+
+def register_cache(name, cache):
+    """Exports hit/miss counters and the size of a TTLCache under ``cache=name``."""
+    _caches[name] = cache
+
+
+def _cache_collector():
+    caches = sorted(_caches.items())
+    yield 'cache_hits_total', 'counter', 'Cache lookups served from memory.', [
+        ((('cache', name),), cache.hits) for name, cache in caches]
+    yield 'cache_misses_total', 'counter', 'Cache lookups that missed.', [
+        ((('cache', name),), cache.misses) for name, cache in caches]
+    yield 'cache_entries', 'gauge', 'Entries currently cached.', [
+        ((('cache', name),), len(cache)) for name, cache in caches]
+
+
+registry.register_collector(_pool_collector)
+registry.register_collector(_log_writer_collector)
+registry.register_collector(_cache_collector)
+registry.register_collector(_password_collector)
+registry.register_collector(_oauth_cache_collector)
+registry.register_collector(_replica_collector)
+registry.register_collector(_ratelimit_collector)
+
+
+def _operation(sql):
+    stripped = sql.lstrip() if isinstance(sql, str) else ''
+    return stripped.split(None, 1)[0].upper() if stripped else 'UNKNOWN'
+
+
+class QueryRecorder:
+    """Database query listener: per-request totals, latency histogram and slow-query log."""
+
+    def __init__(self, slow_query_seconds=None):
+        self.slow_query_seconds = slow_query_seconds
+
+    def __call__(self, sql, seconds):
+        operation = _operation(sql)
+        query_duration.observe(seconds, operation=operation)
+        if has_request_context():
+            g._metrics_db_queries = g.get('_metrics_db_queries', 0) + 1
+            g._metrics_db_seconds = g.get('_metrics_db_seconds', 0.0) + seconds
+        if self.slow_query_seconds is not None and seconds >= self.slow_query_seconds:
+            slow_queries.inc(operation=operation)
+            text = sql if isinstance(sql, str) else repr(sql)
+            log.warning("Slow query (%.1f ms): %s", seconds * 1000, text[:2000])
+
+
+def _request_started(sender, **extra):
+    # A signal rather than a before_request hook: it fires ahead of every
+    # hook, so queries made by blueprints' hooks (loading the user) count.
+    g._metrics_start = time.perf_counter()
+    g._metrics_db_queries = 0
+    g._metrics_db_seconds = 0.0
+
+
+def _make_after_request(server_timing):
+    def after_request(response):
+        start = g.get('_metrics_start')
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or 'unmatched'
+        queries = g.get('_metrics_db_queries', 0)
+        db_seconds = g.get('_metrics_db_seconds', 0.0)
+        request_duration.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+        request_db_queries.observe(queries, endpoint=endpoint)
+        if server_timing:
+            response.headers.add(
+                'Server-Timing',
+                f'app;dur={elapsed * 1000:.1f}, db;dur={db_seconds * 1000:.1f};desc="{queries} queries"'
+            )
+        return response
+    return after_request
+
+
+def metrics_view():
+    """Serves every metric in the Prometheus text exposition format.
+
+    Needs the METRICS_TOKEN bearer token when one is set; otherwise a
+    logged-in user, unless METRICS_PUBLIC is on.
+    """
+    from flask import current_app
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            abort(401)
+    elif not current_app.config.get('METRICS_PUBLIC') and g.get('user') is None:
+        abort(401)
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Hooks request timing, DB query instrumentation and /metrics into the app."""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    slow_ms = app.config.get('SLOW_QUERY_MS')
+    recorder = QueryRecorder(slow_ms / 1000 if slow_ms else None)
+    # Replace any listener installed by a previous app in this process.
+    database.query_listeners[:] = [
+        listener for listener in database.query_listeners if not isinstance(listener, QueryRecorder)
+    ] + [recorder]
+    request_started.connect(_request_started, app)
+    app.after_request(_make_after_request(app.config.get('SERVER_TIMING_ENABLED', True)))
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
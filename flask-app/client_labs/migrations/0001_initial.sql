@@ -0,0 +1,38 @@
+-- The schema init_db used to create. Every statement is IF NOT EXISTS, so
+-- databases created before migrations existed adopt it unchanged.
+
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    tool_name TEXT NOT NULL,
+    input_data TEXT,
+    output_data TEXT
+);
+
+-- Back the keyset-paginated /logs view and its tool filter.
+CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs (timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_logs_tool_name_timestamp ON logs (tool_name, timestamp, id);
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    google_id TEXT UNIQUE,
+    email TEXT NOT NULL UNIQUE,
+    name TEXT,
+    password_hash TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    tool_name TEXT NOT NULL,
+    user_id INTEGER,
+    status TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME,
+    finished_at DATETIME,
+    result TEXT,
+    error TEXT,
+    progress TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_user_status ON jobs (user_id, status);
@@ -0,0 +1,17 @@
+-- Large log payloads moved out of the logs rows by `flask prune-logs`,
+-- zlib-compressed. A NULL column means that payload stayed in-row; the
+-- lengths are of the original text, for the /logs listing.
+CREATE TABLE IF NOT EXISTS log_payloads (
+    log_id INTEGER PRIMARY KEY,
+    input_data BLOB,
+    output_data BLOB,
+    input_length INTEGER,
+    output_length INTEGER
+);
+
+-- Leases for maintenance jobs, so only one worker runs a scheduled job.
+CREATE TABLE IF NOT EXISTS maintenance_leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
@@ -0,0 +1,12 @@
+-- Change log read by local read replicas (see client_labs/replica.py): one
+-- row per inserted, updated or deleted row of a replicated table. The
+-- triggers that fill it are installed by the first replica to sync, so a
+-- deployment without replicas writes nothing here.
+CREATE TABLE IF NOT EXISTS replica_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_replica_changes_changed_at ON replica_changes (changed_at);
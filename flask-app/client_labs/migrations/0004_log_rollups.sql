@@ -0,0 +1,11 @@
+-- Runs per tool per UTC day, kept up to date by the log writer in the same
+-- transaction as the log rows, so the dashboard never scans logs. Rollups
+-- outlive log retention; `flask backfill-rollups` recounts the days that
+-- still have logs.
+CREATE TABLE IF NOT EXISTS log_rollups (
+    day TEXT NOT NULL,
+    tool_name TEXT NOT NULL,
+    runs INTEGER NOT NULL DEFAULT 0,
+    last_run_at DATETIME,
+    PRIMARY KEY (day, tool_name)
+);
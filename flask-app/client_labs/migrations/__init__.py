@@ -0,0 +1,160 @@
+"""Versioned schema migrations.
+
+Each ``NNNN_description.sql`` file in this package is an up-migration,
+applied in version order. Applied versions are recorded in ``schema_version``.
+A migration and its ``schema_version`` row run in one batch, i.e. one
+transaction, so a failed migration leaves nothing behind.
+
+Several workers may start at once. Each one applies whatever it sees as
+pending. When two race on the same version, the loser's batch fails (on
+its own DDL, or on the ``schema_version`` primary key) and rolls back. The
+loser then finds the version recorded and moves on. 0001 is the schema the
+old ``init_db`` created, written with IF NOT EXISTS so that existing
+databases adopt it.
+"""
+import os
+import re
+import sqlite3
+import click
+from flask.cli import with_appcontext
+from .. import database
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+FILENAME_RE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+
+class MigrationError(RuntimeError):
+    """Raised when a migration fails and was not applied by another worker."""
+
+
+class Migration:
+    """One up-migration file."""
+
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    @property
+    def filename(self):
+        return os.path.basename(self.path)
+
+    def statements(self):
+        with open(self.path, encoding='utf-8') as f:
+            return split_statements(f.read())
+
+
+def split_statements(sql):
+    """Splits a script into complete statements (semicolons in strings or triggers are kept)."""
+    statements, current = [], ''
+    for line in sql.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statement = _strip_comments(current)
+            if statement:
+                statements.append(statement)
+            current = ''
+    if _strip_comments(current):
+        raise ValueError(f"Incomplete SQL statement: {current.strip()[:80]!r}")
+    return statements
+
+
+def _strip_comments(sql):
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return '\n'.join(lines).strip()
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """Returns the migrations in ``directory``, sorted by version."""
+    migrations = {}
+    for filename in sorted(os.listdir(directory)):
+        match = FILENAME_RE.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version}: {filename}")
+        migrations[version] = Migration(version, match.group(2), os.path.join(directory, filename))
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def _ensure_version_table(client):
+    client.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(client):
+    return {row[0] for row in client.execute("SELECT version FROM schema_version").rows}
+
+
+def _adopt_legacy_schema(client):
+    # Jobs tables from before progress reporting lack the column that
+    # 0001's CREATE TABLE IF NOT EXISTS would otherwise have added.
+    def job_columns():
+        return [row[1] for row in client.execute("PRAGMA table_info(jobs)").rows]
+
+    columns = job_columns()
+    if columns and 'progress' not in columns:
+        try:
+            client.execute("ALTER TABLE jobs ADD COLUMN progress TEXT")
+        except Exception:
+            if 'progress' not in job_columns():
+                raise
+
+
+def migrate(target=None, directory=MIGRATIONS_DIR):
+    """Applies pending migrations up to ``target`` (default: all). Returns those applied here."""
+    migrations = [m for m in load_migrations(directory) if target is None or m.version <= target]
+    applied_here = []
+    with database.get_db_connection() as client:
+        _ensure_version_table(client)
+        applied = applied_versions(client)
+        if 1 not in applied:
+            _adopt_legacy_schema(client)
+        for migration in migrations:
+            if migration.version in applied:
+                continue
+            statements = migration.statements() + [(
+                "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                (migration.version, migration.name),
+            )]
+            try:
+                client.batch(statements)
+            except Exception as e:
+                applied = applied_versions(client)
+                if migration.version in applied:
+                    continue  # Another worker got there first.
+                raise MigrationError(f"Migration {migration.filename} failed: {e}") from e
+            applied.add(migration.version)
+            applied_here.append(migration)
+    return applied_here
+
+
+def migration_status(directory=MIGRATIONS_DIR):
+    """Returns ``(migration, applied)`` pairs for every known migration."""
+    with database.get_db_connection() as client:
+        _ensure_version_table(client)
+        applied = applied_versions(client)
+    return [(m, m.version in applied) for m in load_migrations(directory)]
+
+
+@click.command("migrate")
+@click.option('--target', type=int, help='Stop after this version.')
+@click.option('--status', is_flag=True, help='List migrations and whether they are applied.')
+@with_appcontext
+def migrate_command(target, status):
+    """Applies pending schema migrations."""
+    if status:
+        for migration, applied in migration_status():
+            click.echo(f"{'applied' if applied else 'pending'}  {migration.filename}")
+        return
+    applied = migrate(target)
+    for migration in applied:
+        click.echo(f"Applied {migration.filename}")
+    if not applied:
+        click.echo("Schema is up to date.")
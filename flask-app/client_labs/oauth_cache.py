@@ -0,0 +1,278 @@
+"""Cached OpenID discovery metadata and signing keys (JWKS).
+
+Out of the box, Authlib fetches ``server_metadata_url`` and ``jwks_uri`` the
+first time each worker handles a Google callback, inside that request. The
+``CachedOAuth`` registry (``oauth_client``, loaded through ``LazyOAuth``)
+reads both documents through ``discovery_cache`` instead:
+
+- Documents are kept in memory and in OAUTH_CACHE_DIR (default: the app's
+  instance folder), so new and recycled workers start warm even when Google
+  is slow. The directory is created private (0700) and cache files owned by
+  another user are ignored, so nobody else on the host can plant keys.
+- The lifetime comes from the response's Cache-Control (max-age minus Age)
+  or Expires header. It is clamped to [OAUTH_CACHE_MIN_TTL, MAX_TTL] and
+  defaults to OAUTH_CACHE_DEFAULT_TTL.
+- Near the end of its lifetime, and for up to OAUTH_CACHE_MAX_STALE seconds
+  after it, a document is served as-is while a background thread revalidates
+  it (with If-None-Match / If-Modified-Since). When the upstream fails, the
+  last good copy keeps being served.
+- An ID token signed with an unknown key forces a JWKS refresh, at most
+  once every FORCE_REFRESH_INTERVAL seconds.
+
+``prewarm()`` is called from gunicorn's ``post_worker_init`` hook.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from email.utils import parsedate_to_datetime
+
+log = logging.getLogger(__name__)
+
+MAX_TTL = 7 * 24 * 3600
+REFRESH_AHEAD = 0.1  # Revalidate during the last 10% of a document's lifetime.
+FORCE_REFRESH_INTERVAL = 60
+
+
+def cache_lifetime(headers, default_ttl, min_ttl=0, max_ttl=MAX_TTL, now=None):
+    """Seconds a response may be cached, from its Cache-Control/Age or Expires headers."""
+    directives = {}
+    for part in headers.get('Cache-Control', '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"')
+
+    ttl = default_ttl
+    if 'no-store' in directives or 'no-cache' in directives:
+        ttl = 0
+    elif 'max-age' in directives:
+        try:
+            ttl = int(directives['max-age']) - int(headers.get('Age') or 0)
+        except ValueError:
+            pass
+    elif headers.get('Expires'):
+        try:
+            expires = parsedate_to_datetime(headers['Expires']).timestamp()
+            ttl = expires - (now if now is not None else time.time())
+        except (TypeError, ValueError):
+            ttl = 0  # An invalid Expires means "already expired".
+    return min(max_ttl, max(min_ttl, ttl))
+
+
+class DiscoveryCache:
+    """Memory- and disk-backed cache of JSON documents fetched over HTTP."""
+
+    def __init__(self, cache_dir=None, default_ttl=3600, min_ttl=60, max_stale=24 * 3600, timeout=5.0):
+        self._lock = threading.Lock()
+        self._url_locks = {}
+        self._entries = {}
+        self._refreshing = set()
+        self.urls = []
+        self.stats = {'hits': 0, 'stale_hits': 0, 'fetches': 0, 'not_modified': 0, 'errors': 0}
+        self.configure(cache_dir, default_ttl, min_ttl, max_stale, timeout)
+
+    def init_app(self, app):
+        self.configure(
+            app.config['OAUTH_CACHE_DIR'] or os.path.join(app.instance_path, 'oauth-cache'),
+            app.config['OAUTH_CACHE_DEFAULT_TTL'],
+            app.config['OAUTH_CACHE_MIN_TTL'],
+            app.config['OAUTH_CACHE_MAX_STALE'],
+            app.config['OAUTH_HTTP_TIMEOUT'],
+        )
+        self.urls = [app.config['GOOGLE_DISCOVERY_URL']]
+
+    def configure(self, cache_dir=None, default_ttl=3600, min_ttl=60, max_stale=24 * 3600, timeout=5.0):
+        self.cache_dir = cache_dir  # None keeps documents in memory only.
+        self.default_ttl = default_ttl
+        self.min_ttl = min_ttl
+        self.max_stale = max_stale
+        self.timeout = timeout
+        with self._lock:
+            self._entries.clear()
+
+    # --- Storage ---
+
+    def _path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest()[:32] + '.json')
+
+    def _load(self, url):
+        entry = self._entries.get(url)
+        if entry is not None or self.cache_dir is None:
+            return entry
+        try:
+            fd = os.open(self._path(url), os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))
+            with os.fdopen(fd, encoding='utf-8') as f:
+                if hasattr(os, 'getuid') and os.fstat(f.fileno()).st_uid != os.getuid():
+                    log.warning("Ignoring %s: owned by another user", self._path(url))
+                    return None
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('url') != url:
+            return None
+        with self._lock:
+            return self._entries.setdefault(url, entry)
+
+    def _store(self, entry):
+        with self._lock:
+            self._entries[entry['url']] = entry
+        if self.cache_dir is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp, self._path(entry['url']))
+        except OSError:
+            log.warning("Could not write the OAuth cache in %s", self.cache_dir, exc_info=True)
+
+    # --- Fetching ---
+
+    def _fetch(self, url, entry):
+        import requests
+        headers = {'Accept': 'application/json'}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        self.stats['fetches'] += 1
+        resp = requests.get(url, headers=headers, timeout=self.timeout)
+        now = time.time()
+        if resp.status_code == 304 and entry is not None:
+            self.stats['not_modified'] += 1
+            data = entry['data']
+        else:
+            resp.raise_for_status()
+            data = resp.json()
+        ttl = cache_lifetime(resp.headers, self.default_ttl, self.min_ttl, now=now)
+        new_entry = {
+            'url': url,
+            'data': data,
+            'fetched_at': now,
+            'expires_at': now + ttl,
+            'etag': resp.headers.get('ETag') or (entry or {}).get('etag'),
+            'last_modified': resp.headers.get('Last-Modified') or (entry or {}).get('last_modified'),
+        }
+        self._store(new_entry)
+        return new_entry
+
+    def _url_lock(self, url):
+        with self._lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def _refresh(self, url, seen):
+        """Fetches ``url`` once, however many threads ask at the same time."""
+        import requests
+        with self._url_lock(url):
+            current = self._entries.get(url)
+            if current is not None and current is not seen:
+                return current  # Refreshed while we waited for the lock.
+            try:
+                return self._fetch(url, current or seen)
+            except (requests.RequestException, ValueError):
+                self.stats['errors'] += 1
+                if seen is None:
+                    raise
+                log.warning("Refreshing %s failed; serving the cached copy", url, exc_info=True)
+                return seen
+
+    def _refresh_in_background(self, url, seen):
+        with self._lock:
+            if url in self._refreshing:
+                return
+            self._refreshing.add(url)
+
+        def run():
+            try:
+                self._refresh(url, seen)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(url)
+
+        threading.Thread(target=run, name='oauth-cache-refresh', daemon=True).start()
+
+    def get(self, url, force=False):
+        """Returns the JSON document at ``url``, fetching it only when it must."""
+        entry = self._load(url)
+        now = time.time()
+        if entry is None:
+            return self._refresh(url, None)['data']
+
+        if force:
+            if now - entry['fetched_at'] < FORCE_REFRESH_INTERVAL:
+                return entry['data']
+            return self._refresh(url, entry)['data']
+
+        expires_at = entry['expires_at']
+        if now < expires_at:
+            self.stats['hits'] += 1
+            if now > expires_at - (expires_at - entry['fetched_at']) * REFRESH_AHEAD:
+                self._refresh_in_background(url, entry)
+            return entry['data']
+        if now < expires_at + self.max_stale:
+            self.stats['stale_hits'] += 1
+            self._refresh_in_background(url, entry)
+            return entry['data']
+        return self._refresh(url, entry)['data']
+
+    def prewarm(self):
+        """Loads the configured discovery documents and their key sets."""
+        for url in self.urls:
+            try:
+                metadata = self.get(url)
+                if metadata.get('jwks_uri'):
+                    self.get(metadata['jwks_uri'])
+            except Exception:
+                log.warning("Could not prewarm OAuth metadata from %s", url, exc_info=True)
+
+    def prewarm_in_background(self):
+        threading.Thread(target=self.prewarm, name='oauth-cache-prewarm', daemon=True).start()
+
+
+discovery_cache = DiscoveryCache()
+
+
+class LazyOAuth:
+    """Stands in for the Authlib registry until a client is first used.
+
+    Authlib pulls in ``cryptography`` and ``requests``, which most workers
+    and CLI commands never need at startup. ``init_app`` and ``register``
+    calls are recorded, and the real ``CachedOAuth`` registry is built on
+    the first attribute access (``oauth.google``).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._oauth = None
+        self._app = None
+        self._registrations = {}
+
+    def init_app(self, app):
+        self._app = app
+        if self._oauth is not None:
+            self._oauth.init_app(app)
+
+    def register(self, name, **kwargs):
+        self._registrations[name] = kwargs
+        if self._oauth is not None:
+            self._oauth.register(name, **kwargs)
+
+    def _load(self):
+        with self._lock:
+            if self._oauth is None:
+                from .oauth_client import CachedOAuth
+                oauth = CachedOAuth(self._app)
+                for name, kwargs in self._registrations.items():
+                    oauth.register(name, **kwargs)
+                self._oauth = oauth
+            return self._oauth
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._load(), name)
@@ -0,0 +1,29 @@
+"""Authlib clients that read OpenID metadata and JWKS through ``discovery_cache``.
+
+Imported lazily by ``oauth_cache.LazyOAuth``.
+"""
+from authlib.integrations.flask_client import OAuth, FlaskOAuth2App
+from . import oauth_cache
+
+
+class CachedOAuth2App(FlaskOAuth2App):
+    """A Flask OAuth 2 client whose metadata and JWKS come from ``discovery_cache``."""
+
+    def load_server_metadata(self):
+        if self._server_metadata_url:
+            self.server_metadata.update(oauth_cache.discovery_cache.get(self._server_metadata_url))
+        return self.server_metadata
+
+    def fetch_jwk_set(self, force=False):
+        uri = self.load_server_metadata().get('jwks_uri')
+        if not uri:
+            return super().fetch_jwk_set(force)
+        jwk_set = oauth_cache.discovery_cache.get(uri, force=force)
+        self.server_metadata['jwks'] = jwk_set
+        return jwk_set
+
+
+class CachedOAuth(OAuth):
+    """The Flask OAuth registry, creating ``CachedOAuth2App`` clients."""
+
+    oauth2_client_cls = CachedOAuth2App
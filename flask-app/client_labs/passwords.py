@@ -0,0 +1,214 @@
+"""Password hashing off the request threads, with calibration and rehashing.
+
+Hashes are Werkzeug's own ``method$salt$hash`` strings, so existing rows
+keep verifying. The configured work factor is a floor:
+
+- ``scrypt``: the work factor is log2(N), which sets the memory per hash
+  (128 * r * N bytes). Calibration raises ``p`` until one hash takes about
+  PASSWORD_TARGET_MS; OpenSSL runs the ``p`` lanes one after another, so this
+  adds CPU time without adding memory.
+- ``pbkdf2``: the work factor is the number of sha256 iterations, which
+  calibration scales up to the target.
+
+Both run inside OpenSSL with the GIL released, so they are handed to a small
+thread pool sized to the CPU count. A semaphore bounds the hashes that may
+be running or waiting; past that, callers wait up to PASSWORD_QUEUE_TIMEOUT
+and then get ``HasherBusy`` rather than piling up behind a login burst.
+Calibration happens once per configuration, off the import path: in the
+gunicorn master before forking when the app is preloaded, otherwise in the
+background as each worker boots (or on first use). The pool is created
+lazily in each process.
+
+Calibration is noisy and can land on different parameters in each worker,
+so a stored hash is only redone when it is numerically weaker than the
+floor, or well below the current target (REHASH_TOLERANCE), never merely
+because its method string differs.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+log = logging.getLogger(__name__)
+
+ALGORITHMS = ('scrypt', 'pbkdf2')
+DEFAULT_WORK_FACTORS = {'scrypt': 15, 'pbkdf2': 600000}
+SCRYPT_BLOCK_SIZE = 8
+MAX_SCRYPT_LOG_N = 20
+MAX_SCRYPT_P = 64
+PBKDF2_ROUNDING = 10000
+CALIBRATION_PASSWORD = 'calibration-password'
+# Hashes costing at least this fraction of the calibrated target are kept.
+REHASH_TOLERANCE = 0.5
+
+
+class HasherBusy(Exception):
+    """Raised when no hashing slot frees up within the queue timeout."""
+
+
+def method_for(algorithm, work_factor, scaling=1):
+    """The Werkzeug method string for an algorithm, work factor and calibration step."""
+    if algorithm == 'scrypt':
+        return f"scrypt:{2 ** work_factor}:{SCRYPT_BLOCK_SIZE}:{scaling}"
+    return f"pbkdf2:sha256:{work_factor * scaling}"
+
+
+def hash_method(pwhash):
+    """The ``method`` part of a stored hash (``scrypt:32768:8:1``)."""
+    return pwhash.split('$', 1)[0] if pwhash else ''
+
+
+def method_cost(method):
+    """Parses a method string into (kind, memory, work), or None if unrecognised.
+
+    ``memory`` is scrypt's 128 * r * N in units of 128 bytes (0 for pbkdf2);
+    ``work`` is proportional to the CPU time of one hash.
+    """
+    parts = method.split(':')
+    try:
+        if parts[0] == 'scrypt' and len(parts) == 4:
+            n, r, p = (int(part) for part in parts[1:])
+            return 'scrypt', n * r, n * r * p
+        if parts[0] == 'pbkdf2' and len(parts) == 3:
+            return f"pbkdf2:{parts[1]}", 0, int(parts[2])
+    except ValueError:
+        pass
+    return None
+
+
+def _time_hash(method):
+    started = time.perf_counter()
+    generate_password_hash(CALIBRATION_PASSWORD, method=method)
+    return time.perf_counter() - started
+
+
+def calibrate(algorithm, work_factor, target_seconds):
+    """Returns the cheapest method at or above the floor that takes ``target_seconds``."""
+    method = method_for(algorithm, work_factor)
+    if target_seconds <= 0:
+        return method
+    _time_hash(method)  # Warm up OpenSSL before measuring.
+    elapsed = min(_time_hash(method) for _ in range(2))
+    if elapsed >= target_seconds:
+        return method
+    if algorithm == 'scrypt':
+        # Cost is linear in p, so one measurement is enough.
+        p = min(MAX_SCRYPT_P, max(1, round(target_seconds / elapsed)))
+        return method_for(algorithm, work_factor, p)
+    iterations = work_factor * target_seconds / elapsed
+    iterations = max(work_factor, int(round(iterations / PBKDF2_ROUNDING)) * PBKDF2_ROUNDING)
+    return method_for(algorithm, iterations)
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords on a bounded pool."""
+
+    def __init__(self, algorithm='scrypt', work_factor=None, target_ms=0,
+                 max_concurrency=None, max_pending=32, queue_timeout=5.0):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._calibrated = {}
+        self._dummy_hash = None
+        self.stats = {'hashes': 0, 'verifications': 0, 'rehashes': 0, 'rejected': 0, 'seconds': 0.0}
+        self.configure(algorithm, work_factor, target_ms, max_concurrency, max_pending, queue_timeout)
+
+    def init_app(self, app):
+        self.configure(
+            app.config['PASSWORD_ALGORITHM'],
+            app.config['PASSWORD_WORK_FACTOR'],
+            app.config['PASSWORD_TARGET_MS'],
+            app.config['PASSWORD_MAX_CONCURRENCY'],
+            app.config['PASSWORD_MAX_PENDING'],
+            app.config['PASSWORD_QUEUE_TIMEOUT'],
+        )
+
+    def configure(self, algorithm='scrypt', work_factor=None, target_ms=0,
+                  max_concurrency=None, max_pending=32, queue_timeout=5.0):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown password algorithm: {algorithm!r}")
+        self.shutdown()
+        self.algorithm = algorithm
+        self.work_factor = work_factor or DEFAULT_WORK_FACTORS[algorithm]
+        if algorithm == 'scrypt' and self.work_factor > MAX_SCRYPT_LOG_N:
+            raise ValueError(f"scrypt work factor is log2(N); {self.work_factor} needs too much memory")
+        self.target_ms = target_ms or 0
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(self.max_concurrency + self.max_pending)
+        self._dummy_hash = None
+
+    @property
+    def method(self):
+        """The Werkzeug method new hashes use, calibrated on first access."""
+        key = (self.algorithm, self.work_factor, self.target_ms)
+        method = self._calibrated.get(key)
+        if method is None:
+            method = calibrate(self.algorithm, self.work_factor, self.target_ms / 1000)
+            self._calibrated[key] = method
+            if self.target_ms:
+                log.info("Password hashing calibrated to %s (target %d ms)", method, self.target_ms)
+        return method
+
+    def calibrate_in_background(self):
+        """Calibrates on a daemon thread so the first login doesn't pay for it."""
+        threading.Thread(target=lambda: self.method, name='password-calibration', daemon=True).start()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix='password-hasher')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.stats['rejected'] += 1
+            raise HasherBusy("Too many password hashes in progress")
+        started = time.perf_counter()
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+            self.stats['seconds'] += time.perf_counter() - started
+
+    def hash(self, password):
+        """Returns a new hash of ``password`` with the current method."""
+        self.stats['hashes'] += 1
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """Checks ``password`` against ``pwhash``.
+
+        A missing hash (unknown user, Google-only account) is checked against
+        a throwaway hash, so the response time doesn't reveal which it was.
+        """
+        self.stats['verifications'] += 1
+        if not pwhash:
+            if self._dummy_hash is None:
+                self._dummy_hash = generate_password_hash(CALIBRATION_PASSWORD, method=self.method)
+            self._run(check_password_hash, self._dummy_hash, password)
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Whether ``pwhash`` is weaker than the floor, well below the target, or another algorithm."""
+        stored = method_cost(hash_method(pwhash))
+        current = method_cost(self.method)
+        if stored is None or stored[0] != current[0]:
+            return True
+        floor = method_cost(method_for(self.algorithm, self.work_factor))
+        _, memory, work = stored
+        return memory < floor[1] or work < floor[2] or work < current[2] * REHASH_TOLERANCE
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=False)
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,272 @@
+"""Per-user rate limits and concurrency caps for the expensive tools.
+
+``@rate_limit`` goes under ``@login_required`` and checks, per user:
+
+- a token bucket per scope (route). ``"10/minute"`` holds 10 tokens and
+  refills 10 a minute; a request costs 1 token, or more when ``cost``
+  says so (large uploads and pastes);
+- optionally, how many requests of the scope are in flight at once;
+- optionally, how many of the user's background jobs are queued or
+  running (read from the jobs table, so it holds across workers).
+
+A request over any limit gets a 429 with Retry-After and is counted in
+``limiter.stats`` (exported at /metrics). Limits are config keys, so they
+can be tuned per deployment. The ``memory`` backend keeps buckets per
+process. The ``sqlite`` backend keeps them in a local SQLite file that
+every worker on the host shares.
+"""
+import os
+import math
+import time
+import uuid
+import sqlite3
+import threading
+from functools import wraps
+from contextlib import contextmanager
+from flask import current_app, g, request, jsonify, Response
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+SWEEP_EVERY = 1000
+SLOT_TTL = 600  # In-flight slots left by a crashed worker expire after this.
+
+
+def parse_rate(value):
+    """Parses ``"10/minute"`` into (capacity, period_seconds); None or '' means no limit."""
+    if not value:
+        return None
+    count, sep, period = str(value).partition('/')
+    period = period.strip()
+    if period.endswith('s') and period[:-1] in PERIODS:
+        period = period[:-1]
+    if not sep or period not in PERIODS or not count.strip().isdigit() or int(count) <= 0:
+        raise ValueError(f"Invalid rate limit: {value!r} (expected e.g. '10/minute')")
+    return int(count), PERIODS[period]
+
+
+def _refill(tokens, updated_at, capacity, period, now):
+    return min(capacity, tokens + (now - updated_at) * capacity / period)
+
+
+def _take(tokens, capacity, period, cost):
+    """Returns (tokens left, retry_after); retry_after is 0 when the request may go ahead."""
+    cost = min(cost, capacity)  # A request larger than the bucket waits for a full one.
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) * period / capacity
+
+
+# --- Backends ---
+
+class MemoryBackend:
+    """Buckets and slots in this process's memory."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> (tokens, updated_at, full_at)
+        self._slots = {}  # key -> {token: expires_at}
+        self._ops = 0
+
+    def consume(self, key, capacity, period, cost, now):
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (capacity, now, now))
+            tokens, retry_after = _take(_refill(tokens, updated_at, capacity, period, now), capacity, period, cost)
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) * period / capacity)
+            self._ops += 1
+            if self._ops % SWEEP_EVERY == 0:
+                # Buckets that are full again carry no state.
+                for stale in [k for k, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+                    del self._buckets[stale]
+            return retry_after
+
+    def acquire(self, key, limit, now):
+        with self._lock:
+            slots = {t: exp for t, exp in self._slots.get(key, {}).items() if exp > now}
+            if len(slots) >= limit:
+                self._slots[key] = slots
+                return None
+            token = uuid.uuid4().hex
+            slots[token] = now + SLOT_TTL
+            self._slots[key] = slots
+            return token
+
+    def release(self, key, token):
+        with self._lock:
+            slots = self._slots.get(key, {})
+            slots.pop(token, None)
+            if not slots:
+                self._slots.pop(key, None)
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            self._slots.clear()
+
+
+class SqliteBackend:
+    """Buckets and slots in a local SQLite file shared by the workers on a host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._ops = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets "
+                         "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, full_at REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS slots "
+                         "(token TEXT PRIMARY KEY, key TEXT NOT NULL, expires_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_slots_key ON slots (key, expires_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        # The write lock is taken up front, so two workers can't both spend the same tokens.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def consume(self, key, capacity, period, cost, now):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(*row, capacity, period, now) if row else capacity
+            tokens, retry_after = _take(tokens, capacity, period, cost)
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)",
+                         (key, tokens, now, now + (capacity - tokens) * period / capacity))
+            self._ops += 1
+            if self._ops % SWEEP_EVERY == 0:
+                conn.execute("DELETE FROM buckets WHERE full_at <= ?", (now,))
+                conn.execute("DELETE FROM slots WHERE expires_at <= ?", (now,))
+        return retry_after
+
+    def acquire(self, key, limit, now):
+        with self._transaction() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM slots WHERE key = ? AND expires_at > ?",
+                                 (key, now)).fetchone()[0]
+            if count >= limit:
+                return None
+            token = uuid.uuid4().hex
+            conn.execute("INSERT INTO slots (token, key, expires_at) VALUES (?, ?, ?)",
+                         (token, key, now + SLOT_TTL))
+        return token
+
+    def release(self, key, token):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM slots WHERE token = ?", (token,))
+
+    def reset(self):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM buckets")
+            conn.execute("DELETE FROM slots")
+
+
+# --- Limiter ---
+
+class RateLimiter:
+    """Holds the configured backend and the allowed/rejected counters."""
+
+    def __init__(self):
+        self.enabled = True
+        self.backend = MemoryBackend()
+        self._lock = threading.Lock()
+        self.stats = {}  # (scope, outcome) -> count; outcome is 'allowed' or the limit that rejected it.
+
+    def init_app(self, app):
+        self.enabled = app.config['RATELIMIT_ENABLED']
+        name = app.config['RATELIMIT_BACKEND']
+        if name == 'memory':
+            self.backend = MemoryBackend()
+        elif name == 'sqlite':
+            self.backend = SqliteBackend(
+                app.config['RATELIMIT_STORAGE_PATH'] or os.path.join(app.instance_path, 'ratelimit.sqlite'))
+        else:
+            raise ValueError(f"Unknown rate-limit backend: {name!r}")
+
+    def count(self, scope, outcome):
+        with self._lock:
+            self.stats[(scope, outcome)] = self.stats.get((scope, outcome), 0) + 1
+
+    def reset(self):
+        self.backend.reset()
+        with self._lock:
+            self.stats.clear()
+
+
+limiter = RateLimiter()
+
+
+def too_many_requests(retry_after, message):
+    """A 429 telling the client when to retry (JSON for API clients, text otherwise)."""
+    headers = {'Retry-After': str(max(1, math.ceil(retry_after)))}
+    if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+        response = jsonify(error=message, retry_after=int(headers['Retry-After']))
+        response.status_code = 429
+        response.headers.update(headers)
+        return response
+    return Response(message, status=429, headers=headers, mimetype='text/plain')
+
+
+def body_cost(bytes_per_token_key):
+    """A ``cost`` callable charging one token plus one per ``config[bytes_per_token_key]`` of body."""
+    def cost():
+        bytes_per_token = current_app.config[bytes_per_token_key]
+        return 1 + (request.content_length or 0) // bytes_per_token if bytes_per_token else 1
+    return cost
+
+
+def rate_limit(scope, limit=None, cost=None, max_concurrent=None, max_active_jobs=None, methods=('POST',)):
+    """Limits a view per user. ``limit``, ``max_concurrent`` and ``max_active_jobs`` name config keys.
+
+    ``max_active_jobs`` counts the user's active ``scope`` jobs; use it on
+    views that submit to the job queue.
+    """
+    def decorator(view):
+        @wraps(view)
+        def limited(*args, **kwargs):
+            if not limiter.enabled or request.method not in methods or g.get('user') is None:
+                return view(*args, **kwargs)
+            config = current_app.config
+            key = f"{g.user['id']}:{scope}"
+            now = time.time()
+
+            if max_active_jobs and config[max_active_jobs]:
+                from .jobs import count_active_jobs
+                if count_active_jobs(g.user['id'], scope, config['JOB_TIMEOUT']) >= config[max_active_jobs]:
+                    limiter.count(scope, 'jobs')
+                    return too_many_requests(5, "You already have the maximum number of jobs running.")
+
+            # The slot is taken first, so a request turned away for
+            # concurrency doesn't also spend tokens.
+            slots = config[max_concurrent] if max_concurrent else 0
+            token = limiter.backend.acquire(key, slots, now) if slots else None
+            if slots and token is None:
+                limiter.count(scope, 'concurrency')
+                return too_many_requests(1, "Too many requests in progress.")
+
+            rate = parse_rate(config[limit]) if limit else None
+            retry_after = limiter.backend.consume(key, *rate, cost() if cost else 1, now) if rate else 0
+            if retry_after:
+                if token is not None:
+                    limiter.backend.release(key, token)
+                limiter.count(scope, 'rate')
+                return too_many_requests(retry_after, "Too many requests, please slow down.")
+            limiter.count(scope, 'allowed')
+            try:
+                return view(*args, **kwargs)
+            finally:
+                if token is not None:
+                    limiter.backend.release(key, token)
+        return limited
+    return decorator
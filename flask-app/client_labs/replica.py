@@ -0,0 +1,378 @@
+"""A local SQLite read replica of the tables most requests read.
+
+With DB_REPLICA_PATH set, user lookups and the /logs views read from a
+SQLite file on local disk instead of going to Turso over HTTPS. Writes
+still go to the primary (the replica is opened read-only).
+
+The first sync installs triggers on the primary that record every
+insert, update and delete on the replicated tables in ``replica_changes``.
+A sync does the following:
+
+- Pulls the changes past the replica's last ``seq``.
+- Re-reads those rows from the primary and replaces or deletes them
+  locally, in one local transaction.
+- Copies the tables afresh (a "full" sync) on first use, after a schema
+  migration, when the triggers were missing, or when the change log was
+  trimmed past the replica's position.
+
+The change log is trimmed to DB_REPLICA_CHANGE_RETENTION by the syncing
+process and by log retention runs. ``flask sync-replica --uninstall``
+removes the triggers once replicas are turned off.
+
+One process per replica file syncs at a time, every
+DB_REPLICA_SYNC_INTERVAL seconds; the other workers on the host only
+read it.
+
+Each sync records ``synced_through``: the time it started reading the
+change log, so every write committed before that time is in the replica.
+Reads fall back to the primary in these cases:
+
+- The replica is older than DB_REPLICA_MAX_LAG.
+- The caller wrote something after ``synced_through`` (read-your-writes;
+  see ``app.note_write``).
+
+A ``file:`` TURSO_DATABASE_URL works as the primary, so the whole path can
+be run and tested offline.
+"""
+import os
+import time
+import fcntl
+import sqlite3
+import logging
+import threading
+import click
+from flask.cli import with_appcontext
+from . import database
+
+log = logging.getLogger(__name__)
+
+# Replicated tables and their INTEGER PRIMARY KEY (rowid) column.
+REPLICATED_TABLES = {'users': 'id', 'logs': 'id', 'log_payloads': 'log_id'}
+CHANGE_BATCH_SIZE = 5000
+COPY_BATCH_SIZE = 1000
+ROW_BATCH_SIZE = 500
+TRIM_INTERVAL = 3600
+
+
+class ResultSet:
+    """The ``columns``/``rows`` shape of a libsql result set."""
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+
+
+class ReplicaClient:
+    """A read-only client on the replica, with the pooled client's execute API."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, stmt, args=None):
+        sql = database._sql_text(stmt)
+        started = time.perf_counter()
+        try:
+            cursor = self._conn.execute(sql, tuple(args or ()))
+            columns = tuple(d[0] for d in cursor.description or ())
+            return ResultSet(columns, cursor.fetchall())
+        finally:
+            if database.query_listeners:
+                database._notify_query(sql, time.perf_counter() - started)
+
+    @property
+    def closed(self):
+        return False
+
+    def close(self):
+        # The connection stays open for this thread's next read.
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class Replica:
+    """A replica file, its sync, and per-thread read connections."""
+
+    def __init__(self, path, max_lag=30.0, change_retention=86400.0, tables=REPLICATED_TABLES):
+        self.path = path
+        self.max_lag = max_lag
+        self.change_retention = change_retention
+        self.tables = tuple(tables)
+        self._local = threading.local()
+        self._trimmed_at = 0.0
+        self.stats = {'syncs': 0, 'full_syncs': 0, 'rows_applied': 0, 'reads': 0, 'fallbacks': 0}
+
+    # --- Reads ---
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def synced_through(self):
+        """When the last completed sync started, or None if the replica isn't usable."""
+        try:
+            rows = self._reader().execute("SELECT value FROM replica_meta WHERE key = 'synced_through'").fetchall()
+        except sqlite3.Error:
+            self._local.conn = None
+            return None
+        return float(rows[0][0]) if rows else None
+
+    def client(self, written_at=None):
+        """A replica client if it is fresh enough for this caller, else None."""
+        synced_through = self.synced_through()
+        if (synced_through is None or time.time() - synced_through > self.max_lag
+                or (written_at and written_at > synced_through)):
+            self.stats['fallbacks'] += 1
+            return None
+        self.stats['reads'] += 1
+        return ReplicaClient(self._reader())
+
+    def lag(self):
+        synced_through = self.synced_through()
+        return None if synced_through is None else time.time() - synced_through
+
+    # --- Sync ---
+
+    def sync(self):
+        """Brings the replica up to date. Returns a summary, or None if another process is syncing."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            local = sqlite3.connect(self.path, isolation_level=None)
+            try:
+                local.execute("PRAGMA journal_mode=WAL")
+                local.execute("CREATE TABLE IF NOT EXISTS replica_meta (key TEXT PRIMARY KEY, value)")
+                return self._sync(local)
+            finally:
+                local.close()
+
+    def _sync(self, local):
+        meta = dict(local.execute("SELECT key, value FROM replica_meta").fetchall())
+        started = time.time()
+        summary = {'full': False, 'changes': 0, 'rows': 0}
+        with database.get_db_connection() as primary:
+            schema = primary.execute("SELECT MAX(version) FROM schema_version").rows[0][0]
+            last_seq = meta.get('last_seq')
+            # Triggers go when their table is dropped (tests, manual repairs),
+            # and whatever changed meanwhile was never logged.
+            installed = triggers_installed(primary)
+            if not installed:
+                install_triggers(primary)
+            if (not installed or last_seq is None or meta.get('schema_version') != schema
+                    or self._has_gap(primary, last_seq)):
+                summary['full'] = True
+                last_seq = self._copy_tables(primary, local)
+                summary['rows'] = sum(local.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in self.tables)
+            else:
+                while True:
+                    changes = primary.execute(
+                        "SELECT seq, table_name, row_id FROM replica_changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                        (last_seq, CHANGE_BATCH_SIZE),
+                    ).rows
+                    if changes:
+                        summary['rows'] += self._apply(primary, local, changes, changes[-1][0])
+                        summary['changes'] += len(changes)
+                        last_seq = changes[-1][0]
+                    if len(changes) < CHANGE_BATCH_SIZE:
+                        break
+            if started - self._trimmed_at >= TRIM_INTERVAL:
+                trim_changes(primary, self.change_retention)
+                self._trimmed_at = started
+        local.executemany(
+            "INSERT OR REPLACE INTO replica_meta (key, value) VALUES (?, ?)",
+            [('synced_through', started), ('schema_version', schema), ('last_seq', last_seq)],
+        )
+        self.stats['syncs'] += 1
+        self.stats['full_syncs'] += summary['full']
+        self.stats['rows_applied'] += summary['rows']
+        return summary
+
+    def _has_gap(self, primary, last_seq):
+        # Changes past last_seq were trimmed before this replica read them.
+        oldest = primary.execute("SELECT MIN(seq) FROM replica_changes").rows[0][0]
+        return oldest is not None and oldest > last_seq + 1
+
+    def _copy_tables(self, primary, local):
+        head = primary.execute("SELECT COALESCE(MAX(seq), 0) FROM replica_changes").rows[0][0]
+        placeholders = ', '.join('?' for _ in self.tables)
+        schema = primary.execute(
+            f"SELECT type, name, sql FROM sqlite_master WHERE tbl_name IN ({placeholders}) "
+            f"AND type IN ('table', 'index') AND sql IS NOT NULL ORDER BY type = 'index'",
+            list(self.tables),
+        ).rows
+        # Readers keep seeing the previous copy until this commits.
+        local.execute("BEGIN IMMEDIATE")
+        try:
+            for table in self.tables:
+                local.execute(f"DROP TABLE IF EXISTS {table}")
+            for _, _, sql in schema:
+                local.execute(sql)
+            for table in self.tables:
+                last_rowid = -1
+                while True:
+                    result_set = primary.execute(
+                        f"SELECT rowid AS _rowid, * FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                        (last_rowid, COPY_BATCH_SIZE),
+                    )
+                    if not result_set.rows:
+                        break
+                    self._insert(local, table, result_set)
+                    last_rowid = result_set.rows[-1][0]
+                    if len(result_set.rows) < COPY_BATCH_SIZE:
+                        break
+            local.execute("COMMIT")
+        except BaseException:
+            local.execute("ROLLBACK")
+            raise
+        return head
+
+    def _apply(self, primary, local, changes, last_seq):
+        row_ids = {}
+        for _, table, row_id in changes:
+            if table in self.tables:
+                row_ids.setdefault(table, set()).add(row_id)
+        # Read from the primary first, so the local write lock is held briefly.
+        fetched = []
+        for table, ids in row_ids.items():
+            ids = sorted(ids)
+            for i in range(0, len(ids), ROW_BATCH_SIZE):
+                chunk = ids[i:i + ROW_BATCH_SIZE]
+                placeholders = ', '.join('?' for _ in chunk)
+                result_set = primary.execute(
+                    f"SELECT rowid AS _rowid, * FROM {table} WHERE rowid IN ({placeholders})", chunk)
+                fetched.append((table, chunk, result_set))
+        local.execute("BEGIN IMMEDIATE")
+        try:
+            for table, chunk, result_set in fetched:
+                placeholders = ', '.join('?' for _ in chunk)
+                # Rows gone from the primary were deleted; the rest are replaced.
+                local.execute(f"DELETE FROM {table} WHERE rowid IN ({placeholders})", chunk)
+                self._insert(local, table, result_set)
+            local.execute("INSERT OR REPLACE INTO replica_meta (key, value) VALUES ('last_seq', ?)", (last_seq,))
+            local.execute("COMMIT")
+        except BaseException:
+            local.execute("ROLLBACK")
+            raise
+        return sum(len(chunk) for _, chunk, _ in fetched)
+
+    def _insert(self, local, table, result_set):
+        # Skips the leading _rowid column; every replicated table's rowid is its id.
+        columns = result_set.columns[1:]
+        local.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            [tuple(row)[1:] for row in result_set.rows],
+        )
+
+
+# --- Change log ---
+
+def _trigger_statements(tables=REPLICATED_TABLES):
+    for table, key in tables.items():
+        for event, ref in (('insert', 'new'), ('update', 'new'), ('delete', 'old')):
+            yield (
+                f"CREATE TRIGGER IF NOT EXISTS {table}_replica_{event} AFTER {event.upper()} ON {table} BEGIN "
+                f"INSERT INTO replica_changes (table_name, row_id) VALUES ('{table}', {ref}.{key}); END"
+            )
+
+
+def triggers_installed(client, tables=REPLICATED_TABLES):
+    names = [f"{table}_replica_{event}" for table in tables for event in ('insert', 'update', 'delete')]
+    placeholders = ', '.join('?' for _ in names)
+    count = client.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN ({placeholders})", names
+    ).rows[0][0]
+    return count == len(names)
+
+
+def install_triggers(client, tables=REPLICATED_TABLES):
+    """Starts recording changes to the replicated tables in ``replica_changes``."""
+    client.batch(list(_trigger_statements(tables)))
+
+
+def uninstall_triggers(client, tables=REPLICATED_TABLES):
+    """Stops recording changes and empties the change log."""
+    client.batch([
+        *(f"DROP TRIGGER IF EXISTS {table}_replica_{event}"
+          for table in tables for event in ('insert', 'update', 'delete')),
+        "DELETE FROM replica_changes",
+    ])
+
+
+def trim_changes(client, keep_seconds):
+    """Deletes change-log rows older than ``keep_seconds``, always keeping the newest."""
+    client.execute(
+        "DELETE FROM replica_changes WHERE changed_at < datetime('now', ?) "
+        "AND seq < (SELECT MAX(seq) FROM replica_changes)",
+        (f"-{int(keep_seconds)} seconds",),
+    )
+
+
+# --- Process-wide replica ---
+
+_replicas = {}
+_replicas_lock = threading.Lock()
+
+
+def get_replica():
+    """The replica configured by DB_REPLICA_PATH, or None when replicas are off."""
+    path = os.getenv("DB_REPLICA_PATH")
+    if not path:
+        return None
+    replica = _replicas.get(path)
+    if replica is None:
+        with _replicas_lock:
+            replica = _replicas.get(path)
+            if replica is None:
+                replica = Replica(
+                    path,
+                    max_lag=database._env_float("DB_REPLICA_MAX_LAG", 30.0),
+                    change_retention=change_retention(),
+                )
+                _replicas[path] = replica
+    return replica
+
+
+def change_retention():
+    """Seconds of change log kept for replicas that fall behind."""
+    return database._env_float("DB_REPLICA_CHANGE_RETENTION", 86400.0)
+
+
+def sync_interval():
+    """Seconds between syncs, or 0 when replicas are off."""
+    return database._env_float("DB_REPLICA_SYNC_INTERVAL", 1.0) if os.getenv("DB_REPLICA_PATH") else 0
+
+
+def sync_configured():
+    replica = get_replica()
+    return replica.sync() if replica is not None else None
+
+
+@click.command("sync-replica")
+@click.option("--uninstall", is_flag=True, help="Drop the change-log triggers (after turning replicas off).")
+@with_appcontext
+def sync_replica_command(uninstall):
+    """Brings the local read replica up to date."""
+    if uninstall:
+        with database.get_db_connection() as client:
+            uninstall_triggers(client)
+        click.echo("Removed the replica change-log triggers.")
+        return
+    replica = get_replica()
+    if replica is None:
+        raise click.UsageError("DB_REPLICA_PATH is not set.")
+    summary = replica.sync()
+    if summary is None:
+        click.echo("Another process is syncing the replica.")
+    else:
+        kind = "Full sync" if summary['full'] else "Synced"
+        click.echo(f"{kind}: {summary['changes']} changes, {summary['rows']} rows.")
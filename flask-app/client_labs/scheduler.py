@@ -0,0 +1,43 @@
+import os
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """Runs ``func()`` every ``interval`` seconds on a daemon thread.
+
+    ``ensure_running()`` is cheap and fork-aware: call it from a request hook
+    and each worker process starts its own timer on first use, which also
+    keeps a preloading gunicorn master from owning the thread.
+    """
+
+    def __init__(self, name, interval, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._lock = threading.Lock()
+        self._pid = None
+        self._stop = threading.Event()
+
+    def ensure_running(self):
+        if not self.interval or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            threading.Thread(target=self._run, args=(self._stop,), name=self.name, daemon=True).start()
+
+    def _run(self, stop):
+        while not stop.wait(self.interval):
+            try:
+                self.func()
+            except Exception:
+                log.exception("Periodic task %s failed", self.name)
+
+    def stop(self):
+        self._stop.set()
+        self._pid = None
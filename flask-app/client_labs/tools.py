@@ -1,7 +1,153 @@
+import re
+import codecs
+import operator
+from collections import Counter
+
+WORD_RE = re.compile(r'\S+')
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# Longer tokens (minified blobs, base64) still count as one word, but only
+# this prefix is kept as their frequency key.
+MAX_WORD_CHARS = 64
+MAX_VOCABULARY = 100_000
+# Characters trimmed from a word before it is counted for frequencies.
+PUNCTUATION = '.,;:!?"\'()[]{}<>«»“”‘’…-–—'
+
+_truncate = operator.itemgetter(slice(None, MAX_WORD_CHARS))
+_strip_punctuation = operator.methodcaller('strip', PUNCTUATION)
+
+
+class TextStats:
+    """Incrementally counts words, characters, lines and word frequencies.
+
+    Text is fed in chunks of any size; a word split across two chunks is
+    counted once. Words are whitespace-separated tokens, as with
+    ``str.split()``. Frequencies are case-insensitive and ignore surrounding
+    punctuation; tokens made only of punctuation count as words but not
+    towards frequencies.
+
+    Memory is bounded by ``max_vocabulary``: when the frequency table grows
+    past it, the least frequent half is discarded and the unique-word and
+    top-N figures become approximate (``approximate`` is set).
+    """
+
+    def __init__(self, top_n=10, max_vocabulary=MAX_VOCABULARY, preview_chars=0):
+        self.top_n = top_n
+        self.max_vocabulary = max_vocabulary
+        self.preview_chars = preview_chars
+        self.words = 0
+        self.characters = 0
+        self.lines = 0
+        self.approximate = False
+        self.preview = ''
+        self._frequencies = Counter()
+        self._pruned = 0
+        self._partial = None
+        self._last_char = ''
+
+    def feed(self, chunk):
+        if not chunk:
+            return
+        if len(self.preview) < self.preview_chars:
+            self.preview += chunk[:self.preview_chars - len(self.preview)]
+        self.characters += len(chunk)
+        self.lines += chunk.count('\n')
+        self._last_char = chunk[-1]
+
+        start, end = 0, len(chunk)
+        if self._partial is not None:
+            if chunk[0].isspace():
+                self._add_words([self._partial])
+            else:
+                # The previous chunk ended mid-word; this one continues it.
+                head = WORD_RE.match(chunk)
+                if head.end() == end:
+                    self._partial = (self._partial + chunk)[:MAX_WORD_CHARS]
+                    return
+                self._add_words([self._partial + head.group()])
+                start = head.end()
+            self._partial = None
+
+        # Hold back a trailing word: it may continue in the next chunk.
+        tail = end
+        while tail > start and not chunk[tail - 1].isspace():
+            tail -= 1
+        if tail < end:
+            self._partial = chunk[tail:tail + MAX_WORD_CHARS]
+        # Only one chunk's worth of tokens is ever materialised.
+        self._add_words(chunk[start:tail].split())
+
+    def close(self):
+        """Counts a word left open at the end of the input."""
+        if self._partial is not None:
+            self._add_words([self._partial])
+            self._partial = None
+        return self
+
+    def _add_words(self, words):
+        if not words:
+            return
+        self.words += len(words)
+        self._frequencies.update(map(_strip_punctuation, map(_truncate, map(str.casefold, words))))
+        self._frequencies.pop('', None)
+        if len(self._frequencies) > self.max_vocabulary:
+            keep = self._frequencies.most_common(self.max_vocabulary // 2)
+            self._pruned += len(self._frequencies) - len(keep)
+            self._frequencies = Counter(dict(keep))
+            self.approximate = True
+
+    @property
+    def line_count(self):
+        if not self.characters:
+            return 0
+        return self.lines + (0 if self._last_char == '\n' else 1)
+
+    @property
+    def unique_words(self):
+        return len(self._frequencies) + self._pruned
+
+    def top_words(self, n=None):
+        return self._frequencies.most_common(self.top_n if n is None else n)
+
+    def as_dict(self):
+        return {
+            'words': self.words,
+            'characters': self.characters,
+            'lines': self.line_count,
+            'unique_words': self.unique_words,
+            'top_words': self.top_words(),
+            'approximate': self.approximate,
+        }
+
+
+def analyze_text(text, top_n=10, chunk_size=DEFAULT_CHUNK_SIZE, preview_chars=0):
+    """Analyzes a string in fixed-size slices."""
+    stats = TextStats(top_n=top_n, preview_chars=preview_chars)
+    for start in range(0, len(text or ''), chunk_size):
+        stats.feed(text[start:start + chunk_size])
+    return stats.close()
+
+
+def analyze_stream(stream, top_n=10, chunk_size=DEFAULT_CHUNK_SIZE, encoding='utf-8', preview_chars=0):
+    """Analyzes a text or binary file-like object without reading it whole.
+
+    Bytes are decoded incrementally, so multi-byte characters may straddle
+    chunk boundaries; undecodable bytes are replaced.
+    """
+    stats = TextStats(top_n=top_n, preview_chars=preview_chars)
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        stats.feed(decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+    stats.feed(decoder.decode(b'', final=True))
+    return stats.close()
+
+
 def word_count(text):
     """
     Counts the number of words in a given text.
     """
     if not text:
         return 0
-    return len(text.split())
\ No newline at end of file
+    return analyze_text(text).words
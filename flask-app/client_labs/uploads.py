@@ -0,0 +1,69 @@
+import os
+import tempfile
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+CHUNK_SIZE = 64 * 1024
+
+
+class LimitedSpool(tempfile.SpooledTemporaryFile):
+    """A spooled temporary file that rejects writes past ``limit`` bytes.
+
+    Werkzeug writes each multipart chunk into it as it is received, so an
+    oversized file is refused mid-upload instead of after being spooled whole.
+    """
+
+    def __init__(self, limit=None, **kwargs):
+        super().__init__(**kwargs)
+        self._limit = limit
+        self._written = 0
+
+    def write(self, data):
+        self._written += len(data)
+        if self._limit is not None and self._written > self._limit:
+            self.close()
+            raise RequestEntityTooLarge(f"Uploaded files are limited to {self._limit} bytes each.")
+        return super().write(data)
+
+
+class UploadRequest(Request):
+    """Request class that spools uploads to the scratch volume with a per-file cap."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        config = current_app.config
+        spool_dir = config.get('UPLOAD_SPOOL_DIR') or None
+        if spool_dir:
+            os.makedirs(spool_dir, exist_ok=True)
+        return LimitedSpool(
+            limit=config.get('MAX_UPLOAD_FILE_BYTES'),
+            max_size=config.get('UPLOAD_SPOOL_MEMORY_BYTES', 512 * 1024),
+            dir=spool_dir,
+        )
+
+
+def save_upload(file_storage, dest_path, max_bytes=None, chunk_size=CHUNK_SIZE, hasher=None):
+    """Streams an uploaded file to ``dest_path`` in chunks. Returns the bytes written.
+
+    Raises RequestEntityTooLarge (and removes the partial file) if the upload
+    is larger than ``max_bytes``. If ``hasher`` (a hashlib object) is given it
+    is fed every chunk, so content can be fingerprinted without a second read.
+    """
+    written = 0
+    stream = file_storage.stream
+    try:
+        with open(dest_path, 'wb') as dest:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if max_bytes is not None and written > max_bytes:
+                    raise RequestEntityTooLarge(f"Uploaded files are limited to {max_bytes} bytes each.")
+                dest.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+    return written
@@ -11,9 +11,101 @@ class Config:
     APP_PASSWORD = os.environ.get('APP_PASSWORD')
     GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
     GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET')
+    GOOGLE_DISCOVERY_URL = os.environ.get('GOOGLE_DISCOVERY_URL', 'https://accounts.google.com/.well-known/openid-configuration')
+    # OpenID metadata and JWKS cache (memory + disk, TTL from cache headers);
+    # the disk copy defaults to <instance folder>/oauth-cache.
+    OAUTH_CACHE_DIR = os.environ.get('OAUTH_CACHE_DIR')
+    OAUTH_CACHE_DEFAULT_TTL = float(os.environ.get('OAUTH_CACHE_DEFAULT_TTL', 3600))
+    OAUTH_CACHE_MIN_TTL = float(os.environ.get('OAUTH_CACHE_MIN_TTL', 60))
+    OAUTH_CACHE_MAX_STALE = float(os.environ.get('OAUTH_CACHE_MAX_STALE', 24 * 3600))
+    OAUTH_HTTP_TIMEOUT = float(os.environ.get('OAUTH_HTTP_TIMEOUT', 5))
     SESSION_COOKIE_SECURE = True
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))
+    USER_CACHE_MAX_SIZE = int(os.environ.get('USER_CACHE_MAX_SIZE', 1024))
+    # Seconds the dashboard's usage stats are cached in each worker.
+    DASHBOARD_STATS_TTL = float(os.environ.get('DASHBOARD_STATS_TTL', 30))
+    # Trust the user snapshot in the signed session cookie instead of looking
+    # the user up on every request.
+    USER_SESSION_SNAPSHOT = os.environ.get('USER_SESSION_SNAPSHOT', 'False').lower() in ['true', '1', 't']
+    # Background jobs: 'thread', 'process' or 'inline' (runs in the request).
+    JOB_BACKEND = os.environ.get('JOB_BACKEND', 'thread')
+    JOB_MAX_WORKERS = int(os.environ.get('JOB_MAX_WORKERS', 2))
+    JOB_TIMEOUT = float(os.environ.get('JOB_TIMEOUT', 600))
+    # Uploads: MAX_CONTENT_LENGTH caps a whole request, MAX_UPLOAD_FILE_BYTES
+    # each file. Files are spooled to UPLOAD_SPOOL_DIR while being received.
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 64 * 1024 * 1024))
+    MAX_UPLOAD_FILE_BYTES = int(os.environ.get('MAX_UPLOAD_FILE_BYTES', 32 * 1024 * 1024))
+    # Non-file form fields (pasted text) are held in memory and capped separately.
+    MAX_FORM_MEMORY_SIZE = int(os.environ.get('MAX_FORM_MEMORY_SIZE', 500 * 1000))
+    UPLOAD_SPOOL_DIR = os.environ.get('UPLOAD_SPOOL_DIR')
+    SITEMAP_SCRATCH_DIR = os.environ.get('SITEMAP_SCRATCH_DIR')
+    # Finished job workspaces are swept by age and total size (0 disables the timer).
+    UPLOAD_RETENTION_SECONDS = float(os.environ.get('UPLOAD_RETENTION_SECONDS', 7 * 24 * 3600))
+    UPLOAD_QUOTA_BYTES = int(os.environ.get('UPLOAD_QUOTA_BYTES', 5 * 1024 ** 3))
+    UPLOAD_SWEEP_INTERVAL = float(os.environ.get('UPLOAD_SWEEP_INTERVAL', 0))
+    # Content-addressed cache of finished sitemap jobs.
+    SITEMAP_CACHE_ENABLED = os.environ.get('SITEMAP_CACHE_ENABLED', 'True').lower() in ['true', '1', 't']
+    SITEMAP_CACHE_DIR = os.environ.get('SITEMAP_CACHE_DIR')
+    SITEMAP_CACHE_MAX_BYTES = int(os.environ.get('SITEMAP_CACHE_MAX_BYTES', 1024 ** 3))
+    SITEMAP_CACHE_MAX_ENTRIES = int(os.environ.get('SITEMAP_CACHE_MAX_ENTRIES', 500))
+    # Fingerprinted assets written by `flask build-assets`.
+    ASSETS_ENABLED = os.environ.get('ASSETS_ENABLED', 'true').lower() in ('true', '1', 't')
+    ASSETS_BUILD_DIR = os.environ.get('ASSETS_BUILD_DIR')
+    # Live job progress over Server-Sent Events.
+    SITEMAP_EVENTS_POLL_INTERVAL = float(os.environ.get('SITEMAP_EVENTS_POLL_INTERVAL', 1.0))
+    SITEMAP_EVENTS_MAX_SECONDS = float(os.environ.get('SITEMAP_EVENTS_MAX_SECONDS', 30))
+    # Audit logs are buffered and written in batches ('sync' writes inline).
+    LOG_WRITER_MODE = os.environ.get('LOG_WRITER_MODE', 'async')
+    LOG_WRITER_BATCH_SIZE = int(os.environ.get('LOG_WRITER_BATCH_SIZE', 100))
+    LOG_WRITER_FLUSH_INTERVAL = float(os.environ.get('LOG_WRITER_FLUSH_INTERVAL', 1.0))
+    LOG_WRITER_QUEUE_SIZE = int(os.environ.get('LOG_WRITER_QUEUE_SIZE', 10000))
+    LOG_WRITER_BLOCK_TIMEOUT = float(os.environ.get('LOG_WRITER_BLOCK_TIMEOUT', 0.5))
+    # Log retention: days per tool ('word_count=30,sitemap_processor=180'),
+    # LOG_RETENTION_DAYS for the rest (0 keeps forever). Expired rows are
+    # archived ('ndjson', 'sqlite' or 'none') and deleted by `flask prune-logs`
+    # or, when LOG_RETENTION_INTERVAL is set, by a scheduled job.
+    LOG_RETENTION_DAYS = float(os.environ.get('LOG_RETENTION_DAYS', 90))
+    LOG_RETENTION_POLICIES = os.environ.get('LOG_RETENTION_POLICIES', '')
+    LOG_RETENTION_BATCH_SIZE = int(os.environ.get('LOG_RETENTION_BATCH_SIZE', 500))
+    LOG_RETENTION_INTERVAL = float(os.environ.get('LOG_RETENTION_INTERVAL', 0))
+    LOG_ARCHIVE_FORMAT = os.environ.get('LOG_ARCHIVE_FORMAT', 'ndjson')
+    LOG_ARCHIVE_DIR = os.environ.get('LOG_ARCHIVE_DIR')
+    # Payloads longer than this are stored compressed, out of row (0 disables).
+    LOG_PAYLOAD_MIN_BYTES = int(os.environ.get('LOG_PAYLOAD_MIN_BYTES', 0))
+    # Batch word counts fan out to a pool ('process', 'thread' or 'inline').
+    BATCH_BACKEND = os.environ.get('BATCH_BACKEND', 'process')
+    BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS') or 0) or None
+    BATCH_MAX_DOCUMENTS = int(os.environ.get('BATCH_MAX_DOCUMENTS', 1000))
+    BATCH_MAX_TOTAL_BYTES = int(os.environ.get('BATCH_MAX_TOTAL_BYTES', 256 * 1024 * 1024))
+    # Password hashing: 'scrypt' (work factor = log2 N) or 'pbkdf2' (iterations).
+    # The work factor is a floor; hashing is calibrated up to PASSWORD_TARGET_MS.
+    PASSWORD_ALGORITHM = os.environ.get('PASSWORD_ALGORITHM', 'scrypt')
+    PASSWORD_WORK_FACTOR = int(os.environ.get('PASSWORD_WORK_FACTOR') or 0) or None
+    PASSWORD_TARGET_MS = float(os.environ.get('PASSWORD_TARGET_MS', 250))
+    PASSWORD_MAX_CONCURRENCY = int(os.environ.get('PASSWORD_MAX_CONCURRENCY') or 0) or None
+    PASSWORD_MAX_PENDING = int(os.environ.get('PASSWORD_MAX_PENDING', 32))
+    PASSWORD_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_QUEUE_TIMEOUT', 5.0))
+    # Per-user limits on the expensive tools: token buckets ('N/second|minute|hour|day',
+    # empty disables), each request costing 1 token plus 1 per RATELIMIT_BYTES_PER_TOKEN
+    # of body; in-flight word counts and active sitemap jobs per user (0 disables).
+    # 'memory' keeps buckets per worker, 'sqlite' shares them between a host's workers.
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'true').lower() in ('true', '1', 't')
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND', 'memory')
+    RATELIMIT_STORAGE_PATH = os.environ.get('RATELIMIT_STORAGE_PATH')
+    RATELIMIT_TOOL = os.environ.get('RATELIMIT_TOOL', '60/minute')
+    RATELIMIT_TOOL_MAX_CONCURRENT = int(os.environ.get('RATELIMIT_TOOL_MAX_CONCURRENT', 2))
+    RATELIMIT_SITEMAP = os.environ.get('RATELIMIT_SITEMAP', '20/hour')
+    RATELIMIT_SITEMAP_MAX_JOBS = int(os.environ.get('RATELIMIT_SITEMAP_MAX_JOBS', 2))
+    RATELIMIT_BYTES_PER_TOKEN = int(os.environ.get('RATELIMIT_BYTES_PER_TOKEN', 1024 * 1024))
+    # Request/query instrumentation, served at /metrics to holders of the bearer
+    # token, or to logged-in users when no token is set (to anyone with METRICS_PUBLIC).
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('true', '1', 't')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_PUBLIC = os.environ.get('METRICS_PUBLIC', 'false').lower() in ('true', '1', 't')
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'true').lower() in ('true', '1', 't')
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
     DEBUG = False
     TESTING = False
 
@@ -24,4 +116,8 @@ class DevelopmentConfig(Config):
 class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
-    WTF_CSRF_ENABLED = False
\ No newline at end of file
+    WTF_CSRF_ENABLED = False
+    JOB_BACKEND = 'inline'
+    BATCH_BACKEND = 'inline'
+    PASSWORD_TARGET_MS = 0
+    LOG_WRITER_MODE = 'sync'
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""Gunicorn settings for the client portal.
+
+Run with: gunicorn -c gunicorn.conf.py "client_labs.app:create_app()"
+
+Every setting can be overridden through a GUNICORN_* environment variable.
+"""
+import os
+import multiprocessing
+
+
+def _env(name, default):
+    return os.environ.get(name) or default
+
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = _env("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Always 'gthread' unless GUNICORN_WORKER_CLASS=gevent is set; gevent is
+# never picked just because it is installed, since the libsql clients and
+# background threads are only tested under real threads.
+worker_class = _env("GUNICORN_WORKER_CLASS", "gthread")
+if worker_class == "gevent":
+    try:
+        import gevent  # noqa: F401
+    except ImportError:
+        raise RuntimeError("GUNICORN_WORKER_CLASS=gevent needs the gevent package installed") from None
+
+# Requests mostly wait on Turso over the network, so each process serves
+# several at once: threads for gthread, greenlets for gevent.
+if worker_class == "gevent":
+    _default_workers = cpu_count
+elif worker_class == "gthread":
+    _default_workers = cpu_count + 1
+else:
+    _default_workers = cpu_count * 2 + 1
+workers = int(_env("GUNICORN_WORKERS", _default_workers))
+threads = int(_env("GUNICORN_THREADS", 4))
+worker_connections = int(_env("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+# Import the app once in the master and fork it into workers. Connection
+# pools, job executors and background threads are created lazily per worker.
+preload_app = _env("GUNICORN_PRELOAD", "true").lower() in ("true", "1", "t")
+
+# Recycle workers periodically to cap slow memory growth; the jitter keeps
+# them from all restarting at once.
+max_requests = int(_env("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(_env("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+keepalive = int(_env("GUNICORN_KEEPALIVE", 5))
+timeout = int(_env("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(_env("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+accesslog = _env("GUNICORN_ACCESSLOG", "-")
+errorlog = _env("GUNICORN_ERRORLOG", "-")
+loglevel = _env("GUNICORN_LOGLEVEL", "info")
+
+
+def on_starting(server):
+    """Creates the schema once in the master, before any worker starts."""
+    if _env("GUNICORN_INIT_DB", "true").lower() not in ("true", "1", "t"):
+        return
+    from client_labs import database
+
+    database.init_db()
+    # Don't hand the master's clients down to the workers.
+    database.close_pools()
+    server.log.info("Database schema initialised")
+
+
+def when_ready(server):
+    """Calibrates password hashing once in the master, for preloaded workers to inherit."""
+    if preload_app:
+        from client_labs.passwords import password_hasher
+
+        server.log.info("Password hashing uses %s", password_hasher.method)
+
+
+def post_worker_init(worker):
+    """Warms the OpenID metadata/JWKS cache and password calibration without holding up the worker."""
+    from client_labs.oauth_cache import discovery_cache
+    from client_labs.passwords import password_hasher
+
+    discovery_cache.prewarm_in_background()
+    password_hasher.calibrate_in_background()
@@ -1,5 +1,5 @@
 import pytest
-from client_labs.app import app
+from client_labs.app import app, create_app
 from client_labs.database import init_db, get_db_connection
 
 @pytest.fixture
@@ -14,6 +14,7 @@ def client():
             with get_db_connection() as db_client:
                 db_client.execute("DROP TABLE IF EXISTS users")
                 db_client.execute("DROP TABLE IF EXISTS logs")
+                db_client.execute("DROP TABLE IF EXISTS schema_version")
             init_db()
             with get_db_connection() as db_client:
                 db_client.execute(
@@ -63,4 +64,12 @@ def test_sitemap_tool_access(client):
     # Test GET request to the sitemap tool page
     rv = client.get('/tools/sitemap-processor')
     assert rv.status_code == 200
-    assert b"Sitemap Processor" in rv.data
\ No newline at end of file
+    assert b"Sitemap Processor" in rv.data
+
+def test_create_app_builds_independent_apps():
+    """Test that the factory returns separately configured app instances."""
+    testing_app = create_app('config.TestingConfig')
+    assert testing_app is not app
+    assert testing_app.config["TESTING"] is True
+    assert testing_app.config["JOB_BACKEND"] == "inline"
+    assert "main.index" in {rule.endpoint for rule in testing_app.url_map.iter_rules()}
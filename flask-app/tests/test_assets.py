@@ -0,0 +1,52 @@
+import gzip
+import pytest
+from client_labs.app import create_app
+from client_labs import assets
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app('config.TestingConfig')
+    app.config.update({"SECRET_KEY": "test_secret", "ASSETS_BUILD_DIR": str(tmp_path)})
+    return app
+
+def test_asset_url_falls_back_before_build(app):
+    with app.test_request_context():
+        assert assets.asset_url('client_labs.static', filename='client_labs.css') == \
+            '/client_labs/static/client_labs.css'
+
+def test_built_assets_are_fingerprinted_compressed_and_cacheable(app):
+    result = app.test_cli_runner().invoke(args=['build-assets'])
+    assert result.exit_code == 0, result.output
+
+    with app.test_request_context():
+        url = assets.asset_url('client_labs.static', filename='client_labs.css')
+        missing = assets.asset_url('client_labs.static', filename='not-built.css')
+    assert url.startswith('/static-build/client_labs/client_labs.') and url.endswith('.css')
+    assert missing == '/client_labs/static/not-built.css'
+
+    client = app.test_client()
+    plain = client.get(url)
+    assert plain.status_code == 200
+    assert 'Content-Encoding' not in plain.headers
+    assert 'immutable' in plain.headers['Cache-Control']
+    assert 'max-age=31536000' in plain.headers['Cache-Control']
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+
+    compressed = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers['ETag'] != plain.headers['ETag']
+
+    cached = client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': compressed.headers['ETag']})
+    assert cached.status_code == 304
+
+    # PNGs are served as-is, and unknown paths are not served at all.
+    with app.test_request_context():
+        png = assets.asset_url('main_assets.static', filename='signature.png')
+    assert 'Content-Encoding' not in client.get(png, headers={'Accept-Encoding': 'gzip'}).headers
+    assert client.get('/static-build/client_labs/manifest.json').status_code == 404
+
+def test_layout_uses_fingerprinted_urls(app):
+    app.test_cli_runner().invoke(args=['build-assets'])
+    rv = app.test_client().get('/login')
+    assert b'/static-build/main_assets/style.' in rv.data
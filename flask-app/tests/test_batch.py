@@ -0,0 +1,103 @@
+import io
+import re
+import csv
+import json
+import zipfile
+import pytest
+from client_labs.app import app
+from client_labs import log_writer as log_writer_module
+from client_labs.batch import batch_analyzer, batch_word_count_command
+from client_labs.database import init_db, get_db_connection
+
+@pytest.fixture
+def client(monkeypatch):
+    app.config.update({"TESTING": True, "SECRET_KEY": "test_secret", "WTF_CSRF_ENABLED": False})
+    batch_analyzer.configure(backend='inline')
+    with get_db_connection() as db_client:
+        db_client.execute("DROP TABLE IF EXISTS users")
+        db_client.execute("DROP TABLE IF EXISTS logs")
+        db_client.execute("DROP TABLE IF EXISTS schema_version")
+    init_db()
+    with get_db_connection() as db_client:
+        db_client.execute("INSERT INTO users (id, email) VALUES (?, ?)", (1, "test@example.com"))
+
+    inserts = []
+    insert_records = log_writer_module.insert_records
+    def recording_insert(records):
+        inserts.append(len(records))
+        insert_records(records)
+    monkeypatch.setattr(log_writer_module, "insert_records", recording_insert)
+
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+        client.inserts = inserts
+        yield client
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+def test_batch_counts_files_and_zip_members(client):
+    archive = make_zip({'docs/a.txt': 'one two three', 'docs/b.txt': 'four five'})
+    rv = client.post('/tool-1/batch', data={
+        'files': [(io.BytesIO(b'hello world'), 'single.txt'), (archive, 'bundle.zip')],
+    }, content_type='multipart/form-data')
+    assert rv.status_code == 200
+    report = rv.get_json()
+    assert [(d['document'], d['words']) for d in report['documents']] == [
+        ('single.txt', 2), ('bundle.zip/docs/a.txt', 3), ('bundle.zip/docs/b.txt', 2)]
+    assert report['totals'] == {'documents': 3, 'failed': 0, 'words': 7, 'characters': 33, 'lines': 3}
+
+    # Every document is logged, in a single insert.
+    assert client.inserts == [3]
+    with get_db_connection() as db_client:
+        rows = db_client.execute(
+            "SELECT input_data, output_data FROM logs WHERE tool_name = 'batch_word_count' ORDER BY id").rows
+    assert [tuple(row) for row in rows] == [
+        ('single.txt', '2'), ('bundle.zip/docs/a.txt', '3'), ('bundle.zip/docs/b.txt', '2')]
+
+def test_batch_csv_and_limits(client):
+    rv = client.post('/tool-1/batch', data={
+        'format': 'csv', 'files': [(io.BytesIO(b'a b\nc'), 'x.txt')],
+    }, content_type='multipart/form-data')
+    rows = list(csv.DictReader(io.StringIO(rv.get_data(as_text=True))))
+    assert rows[0]['document'] == 'x.txt' and rows[0]['words'] == '3' and rows[0]['lines'] == '2'
+    assert rows[-1]['document'] == 'TOTAL'
+
+    batch_analyzer.configure(max_documents=2)
+    try:
+        archive = make_zip({f'{i}.txt': 'word' for i in range(3)})
+        rv = client.post('/tool-1/batch', data={'files': [(archive, 'many.zip')]},
+                         content_type='multipart/form-data')
+        assert rv.status_code == 413
+    finally:
+        batch_analyzer.configure(max_documents=1000)
+
+    assert client.post('/tool-1/batch', data={}).status_code == 400
+
+def test_cli_uses_a_process_pool(tmp_path):
+    (tmp_path / 'a.txt').write_text('alpha beta gamma')
+    with open(tmp_path / 'b.zip', 'wb') as f:
+        f.write(make_zip({'c.txt': 'delta'}).getvalue())
+    result = app.test_cli_runner().invoke(
+        batch_word_count_command, [str(tmp_path / 'a.txt'), str(tmp_path / 'b.zip'), '--workers', '2'])
+    assert result.exit_code == 0, result.output
+    report = json.loads(result.output)
+    assert report['totals']['words'] == 4
+    assert [d['document'] for d in report['documents']] == ['a.txt', 'b.zip/c.txt']
+
+def test_batch_needs_a_csrf_token(client, monkeypatch):
+    monkeypatch.setitem(app.config, "WTF_CSRF_ENABLED", True)
+    data = lambda: {'files': [(io.BytesIO(b'hello world'), 'single.txt')]}
+    assert client.post('/tool-1/batch', data=data(), content_type='multipart/form-data').status_code == 400
+
+    token = re.search(r'name="csrf_token" value="([^"]+)"', client.get('/tool-1').get_data(as_text=True)).group(1)
+    rv = client.post('/tool-1/batch', data={**data(), 'csrf_token': token}, content_type='multipart/form-data')
+    assert rv.status_code == 200 and rv.get_json()['documents'][0]['words'] == 2
+    rv = client.post('/tool-1/batch', data=data(), headers={'X-CSRFToken': token}, content_type='multipart/form-data')
+    assert rv.status_code == 200
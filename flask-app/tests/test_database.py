@@ -0,0 +1,88 @@
+import pytest
+from libsql_client import LibsqlError
+from client_labs.database import ConnectionPool, PoolClosedError, PoolTimeoutError, get_db_connection
+
+class FakeClient:
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+        self.queries = []
+    def execute(self, stmt, args=None):
+        if not self.healthy:
+            raise OSError("connection reset")
+        self.queries.append(stmt)
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def created():
+    return []
+
+@pytest.fixture
+def pool(created):
+    def factory():
+        client = FakeClient()
+        created.append(client)
+        return client
+    return ConnectionPool(factory, size=2, timeout=0.05, max_idle=60, health_check_interval=0)
+
+def test_released_clients_are_reused(pool, created):
+    with pool.acquire() as conn:
+        conn.execute("SELECT 1")
+    with pool.acquire() as conn:
+        conn.execute("SELECT 2")
+
+    assert len(created) == 1
+    stats = pool.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+    assert stats["in_use"] == 0
+    assert stats["idle"] == 1
+
+def test_acquire_times_out_when_pool_is_exhausted(pool):
+    first = pool.acquire()
+    second = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+
+    first.close()
+    third = pool.acquire()
+    assert pool.stats()["hits"] == 1
+    second.close()
+    third.close()
+
+def test_unhealthy_and_idle_clients_are_replaced(pool, created):
+    with pool.acquire():
+        pass
+    created[0].healthy = False
+    with pool.acquire():
+        pass
+    assert created[0].closed
+    assert pool.stats()["health_check_failures"] == 1
+
+    pool.max_idle = 0
+    with pool.acquire():
+        pass
+    assert created[1].closed
+    assert len(created) == 3
+    assert pool.stats()["evictions"] == 1
+
+def test_clients_checked_out_at_close_are_closed_on_release(pool, created):
+    idle = pool.acquire()
+    busy = pool.acquire()
+    idle.close()
+    pool.close()
+    assert created[0].closed and not created[1].closed
+    busy.close()
+    assert created[1].closed
+    with pytest.raises(PoolClosedError):
+        pool.acquire()
+
+def test_returned_connection_cannot_be_used(monkeypatch, tmp_path):
+    monkeypatch.setenv("TURSO_DATABASE_URL", f"file:{tmp_path}/pool.db")
+    with get_db_connection() as client:
+        assert client.execute("SELECT 1 AS one").rows[0][0] == 1
+    with pytest.raises(LibsqlError) as excinfo:
+        client.execute("SELECT 1")
+    assert excinfo.value.code == "CLIENT_CLOSED"
@@ -0,0 +1,214 @@
+import io
+import json
+import time
+import threading
+import pytest
+from client_labs.app import app
+from client_labs import jobs
+from client_labs.log_writer import log_writer
+from client_labs.jobs import JobQueue, get_job
+from client_labs.database import init_db, get_db_connection
+
+@pytest.fixture
+def queue():
+    with get_db_connection() as db_client:
+        db_client.execute("DROP TABLE IF EXISTS jobs")
+        db_client.execute("DROP TABLE IF EXISTS schema_version")
+    init_db()
+    queue = JobQueue(backend='inline')
+    yield queue
+    queue.shutdown()
+
+def succeed(ctx, value):
+    return f"{ctx.job_id}:{value}"
+
+def explode(ctx):
+    raise RuntimeError("boom")
+
+def test_inline_jobs_record_result_and_errors(queue):
+    job_id = queue.submit("test_tool", succeed, user_id=7, value="ok")
+    job = get_job(job_id)
+    assert job["status"] == jobs.SUCCEEDED
+    assert job["result"] == f"{job_id}:ok"
+    assert job["user_id"] == 7
+    assert job["started_at"] and job["finished_at"]
+
+    job_id = queue.submit("test_tool", explode)
+    job = get_job(job_id)
+    assert job["status"] == jobs.FAILED
+    assert job["error"] == "boom"
+
+def test_thread_jobs_can_be_cancelled_and_time_out(queue):
+    release = threading.Event()
+    def block(ctx):
+        release.wait(5)
+        return "late"
+
+    queue.configure(backend='thread', max_workers=1, timeout=1)
+    running = queue.submit("test_tool", block)
+    queued = queue.submit("test_tool", block, timeout=30)
+    assert queue.cancel(queued)
+
+    deadline = time.monotonic() + 5
+    while get_job(running)["status"] != jobs.TIMED_OUT and time.monotonic() < deadline:
+        time.sleep(0.1)
+    release.set()
+    queue.shutdown()
+
+    assert get_job(running)["status"] == jobs.TIMED_OUT
+    assert get_job(running)["result"] is None
+    assert get_job(queued)["status"] == jobs.CANCELLED
+
+def test_sitemap_processor_runs_as_job(tmp_path, monkeypatch):
+    app.config.update({
+        "TESTING": True,
+        "SECRET_KEY": "test_secret",
+        "WTF_CSRF_ENABLED": False,
+    })
+    monkeypatch.setattr(app, "root_path", str(tmp_path))
+    jobs.job_queue.configure(backend='inline')
+    with get_db_connection() as db_client:
+        db_client.execute("DROP TABLE IF EXISTS users")
+        db_client.execute("DROP TABLE IF EXISTS logs")
+        db_client.execute("DROP TABLE IF EXISTS jobs")
+        db_client.execute("DROP TABLE IF EXISTS schema_version")
+    init_db()
+    with get_db_connection() as db_client:
+        db_client.execute("INSERT INTO users (id, email) VALUES (?, ?)", (1, "test@example.com"))
+
+    sitemap = {"startUrl": ["https://a.example/1", "https://a.example/2"]}
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+        rv = client.post('/tools/sitemap-processor', data={
+            'job_name': 'Test',
+            'new_sitemap_filename': 'new.xml',
+            'old_sitemap_file': (io.BytesIO(json.dumps(sitemap).encode()), 'old.xml'),
+            'empty_pages_file': (io.BytesIO(b"https://a.example/2\n"), 'empty.txt'),
+        }, headers={'Accept': 'application/json'}, content_type='multipart/form-data')
+        assert rv.status_code == 202
+        job_id = rv.get_json()["job_id"]
+
+        status = client.get(rv.get_json()["status_url"]).get_json()
+        assert status["status"] == jobs.SUCCEEDED
+        assert "New Total URLs" in status["result"]
+
+        with client.session_transaction() as sess:
+            sess['user_id'] = 2
+        assert client.get(f'/tools/sitemap-processor/jobs/{job_id}/status').status_code == 302
+
+    log_writer.flush()
+    with get_db_connection() as db_client:
+        result_set = db_client.execute("SELECT input_data FROM logs WHERE tool_name = 'sitemap_processor'")
+    assert job_id in result_set.rows[0][0]
+
+def test_progress_writes_are_throttled(queue, monkeypatch):
+    writes = []
+    monkeypatch.setattr(jobs, "set_progress", lambda job_id, progress: writes.append(dict(progress)) or True)
+    def work(ctx):
+        for i in range(1, 1001):
+            ctx.report_progress('parsing', fraction=i / 1000, parsed=i)
+        ctx.report_progress('done', parsed=1000)
+        return "ok"
+
+    queue.submit("test_tool", work)
+    # The phase changes are always written; updates in between are throttled.
+    assert len(writes) <= 4
+    assert writes[0]['phase'] == 'parsing'
+    assert writes[-1] == {'phase': 'done', 'parsed': 1000}
+
+def test_cancelled_job_stops_at_its_next_progress_write(queue):
+    reached = []
+    def work(ctx):
+        for i in range(3):
+            if i == 1:
+                queue.cancel(ctx.job_id)
+            ctx.report_progress('parsing', parsed=i, force=True)
+            reached.append(i)
+        return "finished"
+
+    job_id = queue.submit("test_tool", work)
+    assert reached == [0]
+    assert get_job(job_id)["status"] == jobs.CANCELLED
+    assert get_job(job_id)["result"] is None
+
+def test_failed_sitemap_job_is_recorded_as_failed(queue, tmp_path):
+    from client_labs.blueprints.sitemap_tool.tasks import process_sitemap_job
+    with get_db_connection() as db_client:
+        db_client.execute("DROP TABLE IF EXISTS logs")
+        db_client.execute("DROP TABLE IF EXISTS schema_version")
+    init_db()
+    (tmp_path / "old.xml").write_text("<urlset><url><loc>https://a.example/1")  # Truncated.
+    (tmp_path / "empty.txt").write_text("")
+    job_id = queue.submit("sitemap_processor", process_sitemap_job, job_name="Broken", upload_path=str(tmp_path),
+                          old_sitemap_filename="old.xml", empty_pages_filename="empty.txt",
+                          new_sitemap_filename="new.xml")
+    assert get_job(job_id)["status"] == jobs.FAILED
+    log_writer.flush()
+    with get_db_connection() as db_client:
+        result_set = db_client.execute("SELECT output_data FROM logs WHERE tool_name = 'sitemap_processor'")
+    assert result_set.rows[0][0].startswith("Tool execution failed")
+
+def test_sitemap_job_cancelled_mid_run_is_logged_as_cancelled(queue, tmp_path, monkeypatch):
+    from client_labs.blueprints.sitemap_tool.tasks import process_sitemap_job
+    with get_db_connection() as db_client:
+        db_client.execute("DROP TABLE IF EXISTS logs")
+        db_client.execute("DROP TABLE IF EXISTS schema_version")
+    init_db()
+    urls = ''.join(f"<url><loc>https://a.example/{i}</loc></url>" for i in range(10))
+    (tmp_path / "old.xml").write_text(f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>')
+    (tmp_path / "empty.txt").write_text("")
+    set_progress = jobs.set_progress
+    def cancel_while_parsing(job_id, progress):
+        if progress['phase'] == 'parsing':
+            queue.cancel(job_id)
+        return set_progress(job_id, progress)
+    monkeypatch.setattr(jobs, "set_progress", cancel_while_parsing)
+
+    job_id = queue.submit("sitemap_processor", process_sitemap_job, job_name="Cancelled", upload_path=str(tmp_path),
+                          old_sitemap_filename="old.xml", empty_pages_filename="empty.txt",
+                          new_sitemap_filename="new.xml")
+    assert get_job(job_id)["status"] == jobs.CANCELLED
+    log_writer.flush()
+    with get_db_connection() as db_client:
+        result_set = db_client.execute("SELECT output_data FROM logs WHERE tool_name = 'sitemap_processor'")
+    assert [tuple(row) for row in result_set.rows] == [("Tool execution cancelled",)]
+
+def test_sitemap_job_streams_progress_events(tmp_path, monkeypatch):
+    app.config.update({
+        "TESTING": True,
+        "SECRET_KEY": "test_secret",
+        "WTF_CSRF_ENABLED": False,
+        "SITEMAP_EVENTS_POLL_INTERVAL": 0.01,
+    })
+    monkeypatch.setattr(app, "root_path", str(tmp_path))
+    jobs.job_queue.configure(backend='inline')
+    with get_db_connection() as db_client:
+        db_client.execute("DROP TABLE IF EXISTS users")
+        db_client.execute("DROP TABLE IF EXISTS jobs")
+        db_client.execute("DROP TABLE IF EXISTS schema_version")
+    init_db()
+    with get_db_connection() as db_client:
+        db_client.execute("INSERT INTO users (id, email) VALUES (?, ?)", (1, "test@example.com"))
+
+    body = ''.join(f'<url><loc>https://a.example/{i}</loc></url>' for i in range(3))
+    sitemap = f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{body}</urlset>'
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+        rv = client.post('/tools/sitemap-processor', data={
+            'job_name': 'Test',
+            'new_sitemap_filename': 'new.xml',
+            'old_sitemap_file': (io.BytesIO(sitemap.encode()), 'old.xml'),
+            'empty_pages_file': (io.BytesIO(b"https://a.example/2\n"), 'empty.txt'),
+        }, headers={'Accept': 'application/json'}, content_type='multipart/form-data')
+        job_id = rv.get_json()["job_id"]
+
+        rv = client.get(f'/tools/sitemap-processor/jobs/{job_id}/events')
+        assert rv.mimetype == 'text/event-stream'
+        events = [json.loads(line[len('data: '):]) for line in rv.get_data(as_text=True).splitlines()
+                  if line.startswith('data: ')]
+        assert events[-1]["finished"] and events[-1]["status"] == jobs.SUCCEEDED
+        assert events[-1]["progress"]["phase"] == 'done'
+        assert events[-1]["progress"]["removed"] == 1
+        assert "New Total URLs              2" in events[-1]["result"]
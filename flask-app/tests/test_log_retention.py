@@ -0,0 +1,97 @@
+import gzip
+import json
+import sqlite3
+import calendar
+import pytest
+from client_labs import database, log_store, log_retention
+from client_labs.app import app
+from client_labs.migrations import migrate
+
+NOW = calendar.timegm((2025, 6, 1, 0, 0, 0))
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setenv("TURSO_DATABASE_URL", f"file:{tmp_path / 'retention.db'}")
+    migrate()
+    with database.get_db_connection() as client:
+        for day, tool_name in [(1, 'word_count'), (2, 'word_count'), (3, 'sitemap_processor'),
+                               (20, 'word_count'), (25, 'sitemap_processor'), (31, 'ocr')]:
+            client.execute(
+                "INSERT INTO logs (timestamp, tool_name, input_data, output_data) VALUES (?, ?, ?, ?)",
+                (f"2025-05-{day:02d} 12:00:00", tool_name, f"input {day} " + "x" * 2000, str(day)),
+            )
+    yield
+    database.close_pools()
+
+def remaining():
+    with database.get_db_connection() as client:
+        return [tuple(row) for row in client.execute("SELECT tool_name, timestamp FROM logs ORDER BY id").rows]
+
+def test_parse_policies():
+    assert log_retention.parse_policies(" word_count=30, ocr=7.5 ,") == {'word_count': 30, 'ocr': 7.5}
+    assert log_retention.parse_policies('') == {}
+    with pytest.raises(ValueError):
+        log_retention.parse_policies('word_count')
+
+def test_prune_archives_then_deletes_per_policy(db, tmp_path):
+    summary = log_retention.prune_logs(
+        policies={'word_count': 20}, default_days=10, archive_dir=str(tmp_path / 'archive'),
+        batch_size=1, now=NOW,
+    )
+    # word_count keeps 20 days (from 2025-05-12), everything else 10 days (from 2025-05-22).
+    assert summary['by_tool'] == {'word_count': 2, 'sitemap_processor': 1}
+    assert summary['deleted'] == summary['archived'] == 3
+    assert summary['bytes_reclaimed'] > 6000
+    assert remaining() == [('word_count', '2025-05-20 12:00:00'), ('sitemap_processor', '2025-05-25 12:00:00'),
+                           ('ocr', '2025-05-31 12:00:00')]
+
+    with gzip.open(summary['archive'], 'rt') as f:
+        archived = [json.loads(line) for line in f]
+    assert [row['timestamp'][:10] for row in archived] == ['2025-05-01', '2025-05-02', '2025-05-03']
+    assert archived[0]['input_data'].startswith('input 1 xxx')
+
+def test_dry_run_deletes_nothing(db, tmp_path):
+    summary = log_retention.prune_logs(default_days=10, dry_run=True, archive_dir=str(tmp_path), now=NOW)
+    assert summary['deleted'] == 4 and summary['archive'] is None
+    assert len(remaining()) == 6
+
+def test_zero_days_keeps_forever(db, tmp_path):
+    summary = log_retention.prune_logs(policies={'word_count': 0}, default_days=0,
+                                       archive_dir=str(tmp_path), now=NOW)
+    assert summary['deleted'] == 0 and len(remaining()) == 6
+
+def test_compaction_keeps_payloads_readable(db, tmp_path):
+    summary = log_retention.compact_payloads(min_bytes=1000, batch_size=4)
+    assert summary['compacted'] == 6 and summary['bytes_saved'] > 6 * 1500
+    with database.get_db_connection() as client:
+        rows, _ = log_store.list_logs(client, tool_name='ocr')
+        assert rows[0]['input_length'] == len("input 31 ") + 2000
+        assert len(rows[0]['input_preview']) == log_store.PREVIEW_CHARS
+        full = log_store.get_log(client, rows[0]['id'])
+    assert full['input_data'] == "input 31 " + "x" * 2000 and full['output_data'] == '31'
+    assert log_retention.compact_payloads(min_bytes=1000)['compacted'] == 0
+
+    # Archives hold the full payloads, and the blobs go with the rows.
+    summary = log_retention.prune_logs(default_days=10, archive_format='sqlite',
+                                       archive_dir=str(tmp_path / 'archive'), now=NOW)
+    archive = sqlite3.connect(summary['archive'])
+    assert [len(row[0]) for row in archive.execute("SELECT input_data FROM logs")] == [2008, 2008, 2008, 2009]
+    with database.get_db_connection() as client:
+        assert client.execute("SELECT COUNT(*) FROM log_payloads").rows[0][0] == 2
+
+def test_lease_has_one_holder(db):
+    assert log_retention.acquire_lease('job', 'a', ttl=60, now=NOW)
+    assert not log_retention.acquire_lease('job', 'b', ttl=60, now=NOW + 30)
+    assert log_retention.acquire_lease('job', 'a', ttl=60, now=NOW + 30)
+    assert log_retention.acquire_lease('job', 'b', ttl=60, now=NOW + 120)
+
+def test_cli(db, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'LOG_RETENTION_DAYS', 10)
+    monkeypatch.setitem(app.config, 'LOG_RETENTION_POLICIES', '')
+    runner = app.test_cli_runner()
+    result = runner.invoke(log_retention.prune_logs_command, ['--dry-run'])
+    assert 'Would delete' in result.output
+    result = runner.invoke(log_retention.prune_logs_command,
+                           ['--format', 'none', '--archive-dir', str(tmp_path / 'none')])
+    assert result.exit_code == 0, result.output
+    assert 'Deleted' in result.output and 'archived' not in result.output
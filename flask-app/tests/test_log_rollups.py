@@ -0,0 +1,79 @@
+import calendar
+import pytest
+from client_labs import database, log_rollups
+from client_labs.app import app, dashboard_cache
+from client_labs.log_writer import LogWriter
+from client_labs.migrations import migrate
+
+NOW = calendar.timegm((2025, 6, 10, 12, 0, 0))
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setenv("TURSO_DATABASE_URL", f"file:{tmp_path / 'rollups.db'}")
+    migrate()
+    dashboard_cache.clear()
+    yield
+    dashboard_cache.clear()
+    database.close_pools()
+
+def rollups():
+    with database.get_db_connection() as client:
+        return [tuple(row) for row in client.execute(
+            "SELECT day, tool_name, runs, last_run_at FROM log_rollups ORDER BY day, tool_name").rows]
+
+def test_writes_update_rollups_in_the_same_batch(db):
+    writer = LogWriter(mode='async', batch_size=10, flush_interval=5)
+    writer.write_many([("word_count", "a", "1"), ("word_count", "b", "2"), ("sitemap_processor", "c", "3")])
+    writer.write("word_count", "d", "4")
+    writer.close()
+    rows = rollups()
+    assert [(tool_name, runs) for _, tool_name, runs, _ in rows] == [('sitemap_processor', 1), ('word_count', 3)]
+
+def test_dashboard_stats(db):
+    records = [("2025-06-10 09:00:00", "word_count", "a", "1"), ("2025-06-10 10:00:00", "word_count", "b", "2"),
+               ("2025-06-05 08:00:00", "sitemap_processor", "c", "3"), ("2025-05-01 08:00:00", "word_count", "e", "5")]
+    with database.get_db_connection() as client:
+        client.batch(log_rollups.rollup_statements(records))
+        for record in records:
+            client.execute("INSERT INTO logs (timestamp, tool_name, input_data, output_data) VALUES (?, ?, ?, ?)",
+                           record)
+        stats = log_rollups.dashboard_stats(client, now=NOW, recent_limit=2)
+
+    assert stats['total_runs'] == 4 and stats['runs_today'] == 2
+    assert stats['tools'][0] == {'tool_name': 'word_count', 'total': 3, 'today': 2, 'last_7_days': 2,
+                                 'last_run_at': '2025-06-10 10:00:00'}
+    assert stats['tools'][1]['last_7_days'] == 1
+    assert len(stats['series']) == log_rollups.SERIES_DAYS
+    assert stats['series'][-1] == {'day': '2025-06-10', 'runs': 2}
+    assert [log['timestamp'] for log in stats['recent']] == ["2025-06-10 10:00:00", "2025-06-10 09:00:00"]
+
+def test_backfill_recounts_days_with_logs(db):
+    with database.get_db_connection() as client:
+        for timestamp in ("2025-06-01 10:00:00", "2025-06-01 11:00:00", "2025-06-02 10:00:00"):
+            client.execute("INSERT INTO logs (timestamp, tool_name) VALUES (?, 'word_count')", (timestamp,))
+        # A pruned day and a miscounted one.
+        client.execute("INSERT INTO log_rollups VALUES ('2025-01-01', 'word_count', 7, NULL)")
+        client.execute("INSERT INTO log_rollups VALUES ('2025-06-01', 'word_count', 99, NULL)")
+    result = app.test_cli_runner().invoke(log_rollups.backfill_rollups_command)
+    assert 'Recounted 10 runs in 3' in result.output
+    assert [(day, runs) for day, _, runs, _ in rollups()] == [
+        ('2025-01-01', 7), ('2025-06-01', 2), ('2025-06-02', 1)]
+
+    assert log_rollups.backfill_rollups(since='2025-06-02 12:00:00') == {'rollups': 1, 'runs': 1}
+
+def test_dashboard_page_is_cached(db, monkeypatch):
+    app.config.update({"TESTING": True, "SECRET_KEY": "test_secret"})
+    with database.get_db_connection() as client:
+        client.execute("INSERT INTO users (id, email, name) VALUES (1, 'a@example.com', 'Ann')")
+    LogWriter(mode='sync').write("word_count", "text", "1")
+    loads = []
+    stats = log_rollups.dashboard_stats
+    monkeypatch.setattr(log_rollups, "dashboard_stats", lambda client: loads.append(1) or stats(client))
+
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+        rv = client.get('/')
+        assert b'1 runs today, 1 in total' in rv.data and b'word_count' in rv.data
+        client.get('/')
+    assert loads == [1]
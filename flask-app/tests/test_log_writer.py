@@ -0,0 +1,62 @@
+import time
+import threading
+import pytest
+from client_labs import log_writer as log_writer_module
+from client_labs.log_writer import LogWriter
+from client_labs.database import init_db, get_db_connection
+
+@pytest.fixture
+def batches(monkeypatch):
+    with get_db_connection() as db_client:
+        db_client.execute("DROP TABLE IF EXISTS logs")
+        db_client.execute("DROP TABLE IF EXISTS schema_version")
+    init_db()
+    batches = []
+    insert_records = log_writer_module.insert_records
+    def recording_insert(records):
+        batches.append(len(records))
+        insert_records(records)
+    monkeypatch.setattr(log_writer_module, "insert_records", recording_insert)
+    return batches
+
+def count_logs():
+    with get_db_connection() as db_client:
+        return db_client.execute("SELECT COUNT(*) FROM logs").rows[0][0]
+
+def test_async_writer_batches_by_size(batches):
+    writer = LogWriter(mode='async', batch_size=10, flush_interval=5)
+    for i in range(25):
+        writer.write("word_count", f"text {i}", str(i))
+    writer.close()
+
+    assert count_logs() == 25
+    assert batches == [10, 10, 5]
+    assert writer.stats["written"] == 25
+
+def test_async_writer_flushes_by_interval(batches):
+    writer = LogWriter(mode='async', batch_size=100, flush_interval=0.05)
+    writer.write("word_count", "a", "1")
+    writer.write("word_count", "b", "2")
+    writer.flush()
+    assert count_logs() == 2
+    assert batches == [2]
+    writer.close()
+
+def test_full_queue_falls_back_to_synchronous_write(batches, monkeypatch):
+    writer = LogWriter(mode='async', batch_size=1, flush_interval=5, max_queue=1, block_timeout=0)
+    release = threading.Event()
+    def slow_insert(records):
+        if threading.current_thread().name == 'log-writer':
+            release.wait(5)
+        batches.append(len(records))
+    monkeypatch.setattr(log_writer_module, "insert_records", slow_insert)
+    writer.write("word_count", "blocks the writer thread", "1")
+    while writer.queue_depth():
+        time.sleep(0.01)
+    writer.write("word_count", "fills the queue", "2")
+    writer.write("word_count", "written by the caller", "3")
+    assert writer.stats["sync_writes"] == 1
+    assert batches == [1]
+    release.set()
+    writer.close()
+    assert sum(batches) == 3
@@ -0,0 +1,96 @@
+import gzip
+import json
+import pytest
+from client_labs.app import app
+from client_labs import log_store
+from client_labs.database import init_db, get_db_connection
+
+@pytest.fixture
+def client():
+    app.config.update({
+        "TESTING": True,
+        "SECRET_KEY": "test_secret",
+        "WTF_CSRF_ENABLED": False,
+    })
+    with app.test_client() as client:
+        with app.app_context():
+            with get_db_connection() as db_client:
+                db_client.execute("DROP TABLE IF EXISTS users")
+                db_client.execute("DROP TABLE IF EXISTS logs")
+                db_client.execute("DROP TABLE IF EXISTS log_payloads")
+                db_client.execute("DROP TABLE IF EXISTS schema_version")
+            init_db()
+            with get_db_connection() as db_client:
+                db_client.execute(
+                    "INSERT INTO users (id, email, name) VALUES (?, ?, ?)",
+                    (1, "test@example.com", "Test User")
+                )
+                for i in range(5):
+                    db_client.execute(
+                        "INSERT INTO logs (timestamp, tool_name, input_data, output_data) VALUES (?, ?, ?, ?)",
+                        (f"2025-01-0{i + 1} 12:00:00", "word_count" if i % 2 else "sitemap_processor",
+                         f"input {i} " + "x" * 1000, str(i))
+                    )
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+        yield client
+
+def test_list_logs_pages_by_keyset():
+    with get_db_connection() as db_client:
+        db_client.execute("DROP TABLE IF EXISTS logs")
+        db_client.execute("DROP TABLE IF EXISTS log_payloads")
+        db_client.execute("DROP TABLE IF EXISTS schema_version")
+    init_db()
+    with get_db_connection() as db_client:
+        for i in range(3):
+            # Identical timestamps: the id breaks the tie.
+            db_client.execute(
+                "INSERT INTO logs (timestamp, tool_name, input_data) VALUES (?, ?, ?)",
+                ("2025-01-01 00:00:00", "word_count", str(i))
+            )
+        first, cursor = log_store.list_logs(db_client, limit=2)
+        second, last_cursor = log_store.list_logs(db_client, limit=2, cursor=cursor)
+
+    assert [row["input_preview"] for row in first] == ["2", "1"]
+    assert [row["input_preview"] for row in second] == ["0"]
+    assert last_cursor is None
+
+def test_logs_view_truncates_and_filters(client):
+    rv = client.get('/logs?tool_name=word_count&start=2025-01-02&end=2025-01-02')
+    assert rv.status_code == 200
+    assert b"input 1" in rv.data
+    assert b"input 3" not in rv.data
+    assert b"x" * 1000 not in rv.data
+    assert b"Show all 1008 characters" in rv.data
+
+def test_logs_view_rejects_bad_filters(client):
+    assert client.get('/logs?start=yesterday').status_code == 400
+    assert client.get('/logs?cursor=not-a-cursor').status_code == 400
+
+def test_log_detail_loads_full_payload(client):
+    rv = client.get('/logs/1', headers={'Accept': 'application/json'})
+    assert rv.status_code == 200
+    assert rv.get_json()["input_data"] == "input 0 " + "x" * 1000
+    assert client.get('/logs/999').status_code == 404
+
+def test_export_streams_filtered_csv_and_ndjson(client):
+    rv = client.get('/logs/export?format=csv&tool_name=word_count')
+    assert rv.status_code == 200
+    assert rv.mimetype == 'text/csv'
+    lines = rv.data.decode().splitlines()
+    assert lines[0] == "id,timestamp,tool_name,input_data,output_data"
+    assert len(lines) == 3
+
+    rv = client.get('/logs/export?format=ndjson&gzip=1&start=2025-01-04')
+    assert rv.status_code == 200
+    records = [json.loads(line) for line in gzip.decompress(rv.data).splitlines()]
+    assert [r["output_data"] for r in records] == ["3", "4"]
+
+def test_export_logs_cli_pages_through_table(client, tmp_path):
+    output = tmp_path / "logs.ndjson"
+    result = app.test_cli_runner().invoke(
+        args=["export-logs", "--format", "ndjson", "--batch-size", "2", "-o", str(output)]
+    )
+    assert result.exit_code == 0, result.output
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [r["id"] for r in records] == [1, 2, 3, 4, 5]
@@ -0,0 +1,82 @@
+import logging
+import pytest
+from client_labs import metrics
+from client_labs.app import app, user_cache
+from client_labs.database import init_db, get_db_connection
+
+@pytest.fixture
+def client():
+    app.config.update({
+        "TESTING": True,
+        "SECRET_KEY": "test_secret",
+        "WTF_CSRF_ENABLED": False,
+        "METRICS_TOKEN": None,
+    })
+    with get_db_connection() as db_client:
+        db_client.execute("DROP TABLE IF EXISTS users")
+        db_client.execute("DROP TABLE IF EXISTS logs")
+        db_client.execute("DROP TABLE IF EXISTS schema_version")
+    init_db()
+    with get_db_connection() as db_client:
+        db_client.execute("INSERT INTO users (id, email) VALUES (?, ?)", (1, "test@example.com"))
+    with app.test_client() as client:
+        yield client
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    histogram = registry.histogram('demo_seconds', 'Demo.', ('route',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, route='a"b')
+    histogram.observe(0.5, route='a"b')
+    histogram.observe(5, route='a"b')
+    text = registry.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{route="a\\"b",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="a\\"b",le="1.0"} 2' in text
+    assert 'demo_seconds_bucket{route="a\\"b",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{route="a\\"b"} 3' in text
+
+def test_requests_report_timing_and_query_counts(client):
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+    rv = client.get('/logs')
+    assert rv.status_code == 200
+    timing = rv.headers['Server-Timing']
+    assert timing.startswith('app;dur=')
+    assert 'db;dur=' in timing and 'queries"' in timing
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{endpoint="main.logs",method="GET",status="200"}' in text
+    assert 'db_query_duration_seconds_count{operation="SELECT"}' in text
+    assert 'db_pool_hits_total' in text
+    assert 'log_writer_written_total' in text
+    assert 'cache_hits_total{cache="user"}' in text
+
+def test_server_timing_counts_queries_made_by_hooks(client):
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+    user_cache.clear()
+    # /protected makes no queries itself; loading the user on a cache miss does.
+    timing = client.get('/protected').headers['Server-Timing']
+    assert 'desc="0 queries"' not in timing
+
+def test_metrics_need_a_login_without_a_token(client, monkeypatch):
+    assert client.get('/metrics').status_code == 401
+    monkeypatch.setitem(app.config, 'METRICS_PUBLIC', True)
+    assert client.get('/metrics').status_code == 200
+
+def test_metrics_token_is_enforced(client):
+    app.config['METRICS_TOKEN'] = 's3cret'
+    try:
+        assert client.get('/metrics').status_code == 401
+        rv = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+        assert rv.status_code == 200
+    finally:
+        app.config['METRICS_TOKEN'] = None
+
+def test_slow_queries_are_logged(client, caplog):
+    recorder = metrics.QueryRecorder(slow_query_seconds=0.01)
+    with caplog.at_level(logging.WARNING, logger='client_labs.metrics'):
+        recorder("SELECT * FROM logs", 0.02)
+        recorder("SELECT 1", 0.001)
+    assert [r.getMessage() for r in caplog.records] == ["Slow query (20.0 ms): SELECT * FROM logs"]
+    assert metrics.slow_queries.value(operation='SELECT') >= 1
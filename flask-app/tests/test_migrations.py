@@ -0,0 +1,83 @@
+import os
+import sys
+import shutil
+import subprocess
+import pytest
+from client_labs import database
+from client_labs.app import app
+from client_labs.migrations import (
+    MIGRATIONS_DIR, MigrationError, load_migrations, migrate, migrate_command, split_statements,
+)
+
+@pytest.fixture
+def db_url(tmp_path, monkeypatch):
+    url = f"file:{tmp_path / 'migrations.db'}"
+    monkeypatch.setenv("TURSO_DATABASE_URL", url)
+    yield url
+    database.close_pools()
+
+def query(sql):
+    with database.get_db_connection() as client:
+        return [tuple(row) for row in client.execute(sql).rows]
+
+def test_split_statements_keeps_semicolons_in_strings_and_triggers():
+    sql = """
+        -- comment; not a statement
+        CREATE TABLE t (a TEXT DEFAULT 'x;y');
+        CREATE TRIGGER tr AFTER INSERT ON t BEGIN
+            UPDATE t SET a = 'z;' WHERE rowid = new.rowid;
+        END;
+    """
+    statements = split_statements(sql)
+    assert len(statements) == 2
+    assert statements[1].startswith('CREATE TRIGGER') and statements[1].endswith('END;')
+    with pytest.raises(ValueError):
+        split_statements("CREATE TABLE t (a TEXT)")
+
+def test_fresh_database_is_migrated_once(db_url):
+    expected = [(m.version, m.name) for m in load_migrations()]
+    assert expected[:2] == [(1, 'initial'), (2, 'log_retention')]
+    assert [(m.version, m.name) for m in migrate()] == expected
+    assert migrate() == []
+    assert query("SELECT version, name FROM schema_version ORDER BY version") == expected
+    indexes = {row[1] for row in query("PRAGMA index_list(logs)")}
+    assert {'idx_logs_timestamp', 'idx_logs_tool_name_timestamp'} <= indexes
+
+def test_legacy_database_is_adopted(db_url):
+    with database.get_db_connection() as client:
+        client.execute("CREATE TABLE jobs (id TEXT PRIMARY KEY, tool_name TEXT NOT NULL, "
+                       "user_id INTEGER, status TEXT NOT NULL)")
+        client.execute("INSERT INTO jobs (id, tool_name, status) VALUES ('j1', 'sitemap', 'succeeded')")
+    migrate()
+    assert 'progress' in [row[1] for row in query("PRAGMA table_info(jobs)")]
+    assert query("SELECT id, progress FROM jobs") == [('j1', None)]
+
+def test_failed_migration_rolls_back(db_url, tmp_path):
+    directory = tmp_path / 'migrations'
+    directory.mkdir()
+    shutil.copy(os.path.join(MIGRATIONS_DIR, '0001_initial.sql'), directory)
+    (directory / '0002_users_locale.sql').write_text("ALTER TABLE users ADD COLUMN locale TEXT;\n")
+    (directory / '0003_broken.sql').write_text(
+        "CREATE TABLE half_done (id INTEGER);\nINSERT INTO no_such_table VALUES (1);\n")
+    (directory / 'README.md').write_text("not a migration")
+    assert [m.version for m in load_migrations(str(directory))] == [1, 2, 3]
+
+    assert [m.version for m in migrate(target=2, directory=str(directory))] == [1, 2]
+    with pytest.raises(MigrationError):
+        migrate(directory=str(directory))
+    assert query("SELECT version FROM schema_version ORDER BY version") == [(1,), (2,)]
+    assert query("SELECT name FROM sqlite_master WHERE name = 'half_done'") == []
+    assert 'locale' in [row[1] for row in query("PRAGMA table_info(users)")]
+
+def test_concurrent_workers_apply_each_migration_once(db_url):
+    code = "from client_labs.migrations import migrate; migrate()"
+    workers = [subprocess.Popen([sys.executable, '-c', code]) for _ in range(4)]
+    assert [worker.wait(timeout=60) for worker in workers] == [0, 0, 0, 0]
+    assert query("SELECT version FROM schema_version ORDER BY version") == [
+        (m.version,) for m in load_migrations()]
+
+def test_cli_reports_status(db_url):
+    runner = app.test_cli_runner()
+    assert 'pending  0001_initial.sql' in runner.invoke(migrate_command, ['--status']).output
+    assert 'Applied 0001_initial.sql' in runner.invoke(migrate_command).output
+    assert 'Schema is up to date.' in runner.invoke(migrate_command).output
@@ -0,0 +1,136 @@
+import os
+import time
+import threading
+import pytest
+import requests
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+from authlib.jose import JsonWebKey, jwt
+from client_labs import oauth_cache
+from client_labs.oauth_cache import DiscoveryCache, cache_lifetime
+from client_labs.oauth_client import CachedOAuth
+
+@pytest.fixture(scope='module')
+def signing_key():
+    return JsonWebKey.generate_key('RSA', 2048, is_private=True, options={'kid': 'key-1'})
+
+@pytest.fixture
+def idp(signing_key):
+    """A local identity provider serving discovery metadata and a JWKS."""
+    stub = Flask('stub_idp')
+    stub.hits = {'metadata': 0, 'jwks': 0}
+    stub.up = True
+
+    @stub.before_request
+    def fail_when_down():
+        if not stub.up:
+            return 'down', 503
+
+    @stub.route('/.well-known/openid-configuration')
+    def metadata():
+        stub.hits['metadata'] += 1
+        base = request.host_url.rstrip('/')
+        resp = jsonify(issuer=base, jwks_uri=f'{base}/jwks', authorization_endpoint=f'{base}/auth',
+                       token_endpoint=f'{base}/token', id_token_signing_alg_values_supported=['RS256'])
+        resp.headers['Cache-Control'] = 'public, max-age=3600'
+        return resp
+
+    @stub.route('/jwks')
+    def jwks():
+        stub.hits['jwks'] += 1
+        if request.headers.get('If-None-Match') == '"v1"':
+            return '', 304, {'ETag': '"v1"', 'Cache-Control': 'max-age=600'}
+        resp = jsonify(keys=[signing_key.as_dict()])
+        resp.headers.update({'Cache-Control': 'max-age=600', 'Age': '100', 'ETag': '"v1"'})
+        return resp
+
+    server = make_server('127.0.0.1', 0, stub, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    stub.url = f'http://127.0.0.1:{server.server_port}'
+    yield stub
+    server.shutdown()
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+def test_cache_lifetime_from_headers():
+    assert cache_lifetime({'Cache-Control': 'public, max-age=300'}, 60) == 300
+    assert cache_lifetime({'Cache-Control': 'max-age=300', 'Age': '100'}, 60) == 200
+    assert cache_lifetime({'Cache-Control': 'no-cache'}, 60, min_ttl=10) == 10
+    assert cache_lifetime({'Expires': 'Thu, 01 Jan 1970 00:10:00 GMT'}, 60, now=0) == 600
+    assert cache_lifetime({}, 60) == 60
+
+def test_memory_disk_and_conditional_refresh(idp, tmp_path):
+    cache = DiscoveryCache(str(tmp_path), min_ttl=0)
+    url = idp.url + '/.well-known/openid-configuration'
+    jwks_url = idp.url + '/jwks'
+
+    assert cache.get(url)['jwks_uri'] == jwks_url
+    assert cache.get(url)['issuer'] == idp.url
+    assert idp.hits['metadata'] == 1
+    keys = cache.get(jwks_url)['keys']
+    entry = cache._entries[jwks_url]
+    assert 499 <= entry['expires_at'] - entry['fetched_at'] <= 501
+
+    # A new process starts warm from disk.
+    fresh = DiscoveryCache(str(tmp_path), min_ttl=0)
+    assert fresh.get(url)['jwks_uri'] == jwks_url
+    assert idp.hits['metadata'] == 1
+
+    # Expired documents are served stale while being revalidated.
+    entry['expires_at'] = time.time() - 1
+    assert cache.get(jwks_url)['keys'] == keys
+    wait_for(lambda: cache.stats['not_modified'] == 1)
+    assert cache._entries[jwks_url]['expires_at'] > time.time() + 500
+    assert idp.hits['jwks'] == 2
+
+def test_disk_cache_is_private_and_owned(idp, tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'oauth'
+    url = idp.url + '/.well-known/openid-configuration'
+    DiscoveryCache(str(cache_dir), min_ttl=0).get(url)
+    assert cache_dir.stat().st_mode & 0o777 == 0o700
+
+    # A cache file that isn't ours is treated as missing.
+    monkeypatch.setattr(os, 'getuid', lambda: cache_dir.stat().st_uid + 1)
+    DiscoveryCache(str(cache_dir), min_ttl=0).get(url)
+    assert idp.hits['metadata'] == 2
+
+def test_stale_if_error_and_cold_failure(idp, tmp_path):
+    cache = DiscoveryCache(str(tmp_path), max_stale=60)
+    url = idp.url + '/.well-known/openid-configuration'
+    cache.get(url)
+    idp.up = False
+
+    # Past max_stale the cache refetches synchronously, and keeps the old copy on failure.
+    cache._entries[url]['expires_at'] = time.time() - 120
+    assert cache.get(url)['issuer'] == idp.url
+    assert cache.stats['errors'] == 1
+
+    with pytest.raises(requests.HTTPError):
+        DiscoveryCache(str(tmp_path / 'cold')).get(url)
+
+def test_prewarm_and_id_token_verification(idp, signing_key, tmp_path, monkeypatch):
+    cache = DiscoveryCache(str(tmp_path))
+    cache.urls = [idp.url + '/.well-known/openid-configuration']
+    monkeypatch.setattr(oauth_cache, 'discovery_cache', cache)
+    cache.prewarm()
+    assert idp.hits == {'metadata': 1, 'jwks': 1}
+
+    app = Flask(__name__)
+    app.secret_key = 'test_secret'
+    oauth = CachedOAuth(app)
+    google = oauth.register('google', client_id='client-1', client_secret='secret',
+                            server_metadata_url=cache.urls[0])
+    now = int(time.time())
+    claims = {'iss': idp.url, 'aud': 'client-1', 'sub': '12345', 'email': 'test@example.com',
+              'iat': now, 'exp': now + 300, 'nonce': 'n-1'}
+    id_token = jwt.encode({'alg': 'RS256', 'kid': 'key-1'}, claims, signing_key).decode()
+
+    with app.test_request_context():
+        user_info = google.parse_id_token({'id_token': id_token}, nonce='n-1')
+    assert user_info['sub'] == '12345'
+    assert idp.hits == {'metadata': 1, 'jwks': 1}
@@ -16,6 +16,7 @@ class PasswordAuthTestCase(unittest.TestCase):
             with get_db_connection() as client:
                 client.execute("DROP TABLE IF EXISTS users")
                 client.execute("DROP TABLE IF EXISTS logs")
+                client.execute("DROP TABLE IF EXISTS schema_version")
             init_db()
 
     def tearDown(self):
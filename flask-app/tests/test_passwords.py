@@ -0,0 +1,89 @@
+import threading
+import pytest
+from werkzeug.security import generate_password_hash, check_password_hash
+from client_labs import passwords
+from client_labs.app import app, user_cache
+from client_labs.passwords import PasswordHasher, HasherBusy, password_hasher
+from client_labs.database import init_db, get_db_connection
+
+def test_calibration_raises_the_cost_to_the_target(monkeypatch):
+    monkeypatch.setattr(passwords, '_time_hash', lambda method: 0.01)
+    assert passwords.calibrate('scrypt', 14, 0) == 'scrypt:16384:8:1'
+    assert passwords.calibrate('scrypt', 14, 0.05) == 'scrypt:16384:8:5'
+    assert passwords.calibrate('scrypt', 14, 0.005) == 'scrypt:16384:8:1'
+    assert passwords.calibrate('pbkdf2', 100000, 0.25) == 'pbkdf2:sha256:2500000'
+
+def test_hash_verify_and_rehash():
+    hasher = PasswordHasher('scrypt', work_factor=10)
+    pwhash = hasher.hash('secret')
+    assert pwhash.startswith('scrypt:1024:8:1$')
+    assert hasher.verify(pwhash, 'secret') and not hasher.verify(pwhash, 'wrong')
+    assert not hasher.verify(None, 'secret')
+    assert not hasher.needs_rehash(pwhash)
+    assert hasher.needs_rehash(generate_password_hash('secret', method='pbkdf2:sha256:1000'))
+
+    hasher.configure('pbkdf2', work_factor=1000)
+    assert hasher.needs_rehash(pwhash)
+    assert hasher.verify(pwhash, 'secret')
+    hasher.shutdown()
+
+def test_rehash_ignores_calibration_noise(monkeypatch):
+    hasher = PasswordHasher('scrypt', work_factor=10)
+    # Another worker calibrated to p=4; this one lands on p=5.
+    monkeypatch.setitem(hasher._calibrated, ('scrypt', 10, 0), 'scrypt:1024:8:5')
+    pwhash = generate_password_hash('secret', method='scrypt:1024:8:4')
+    assert not hasher.needs_rehash(pwhash)
+    assert not hasher.needs_rehash(generate_password_hash('secret', method='scrypt:2048:8:4'))
+    # Below the memory floor, or far below the target.
+    assert hasher.needs_rehash(generate_password_hash('secret', method='scrypt:512:8:20'))
+    assert hasher.needs_rehash(generate_password_hash('secret', method='scrypt:1024:8:1'))
+    assert hasher.needs_rehash('plain$text')
+    assert hasher.verify(pwhash, 'secret')
+    hasher.shutdown()
+
+def test_busy_when_every_slot_is_taken(monkeypatch):
+    hasher = PasswordHasher('scrypt', work_factor=10, max_concurrency=1, max_pending=0, queue_timeout=0.05)
+    started, release = threading.Event(), threading.Event()
+    def slow_hash(password, method):
+        started.set()
+        release.wait(5)
+    monkeypatch.setattr(passwords, 'generate_password_hash', slow_hash)
+    holder = threading.Thread(target=hasher.hash, args=('a',))
+    holder.start()
+    started.wait(5)
+    try:
+        with pytest.raises(HasherBusy):
+            hasher.verify(generate_password_hash('b', method='scrypt:1024:8:1'), 'b')
+        assert hasher.stats['rejected'] == 1
+    finally:
+        release.set()
+        holder.join()
+        hasher.shutdown()
+
+@pytest.fixture
+def client():
+    app.config.update({"TESTING": True, "SECRET_KEY": "test_secret", "WTF_CSRF_ENABLED": False})
+    password_hasher.configure('scrypt', work_factor=10)
+    with get_db_connection() as db_client:
+        db_client.execute("DROP TABLE IF EXISTS users")
+        db_client.execute("DROP TABLE IF EXISTS schema_version")
+    init_db()
+    yield app.test_client()
+    user_cache.clear()
+    password_hasher.init_app(app)
+
+def test_login_upgrades_outdated_hashes(client):
+    old_hash = generate_password_hash('password', method='pbkdf2:sha256:1000')
+    with get_db_connection() as db_client:
+        db_client.execute("INSERT INTO users (id, email, password_hash) VALUES (?, ?, ?)",
+                          (1, 'test@example.com', old_hash))
+
+    rv = client.post('/login', data={'email': 'test@example.com', 'password': 'wrong'})
+    assert rv.headers['Location'].endswith('/login')
+
+    rv = client.post('/login', data={'email': 'test@example.com', 'password': 'password'})
+    assert rv.headers['Location'] == '/'
+    with get_db_connection() as db_client:
+        new_hash = db_client.execute("SELECT password_hash FROM users WHERE id = 1").rows[0][0]
+    assert new_hash != old_hash and new_hash.startswith('scrypt:1024:8:1$')
+    assert check_password_hash(new_hash, 'password')
@@ -0,0 +1,98 @@
+import pytest
+from flask import g
+from client_labs import database, jobs
+from client_labs.app import app
+from client_labs.log_writer import log_writer
+from client_labs.migrations import migrate
+from client_labs.ratelimit import MemoryBackend, SqliteBackend, limiter, parse_rate, rate_limit
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setenv("TURSO_DATABASE_URL", f"file:{tmp_path / 'ratelimit.db'}")
+    migrate()
+    with database.get_db_connection() as client:
+        client.execute("INSERT INTO users (id, email, name) VALUES (1, 'a@example.com', 'Ann')")
+    app.config.update({"TESTING": True, "SECRET_KEY": "test_secret", "WTF_CSRF_ENABLED": False})
+    limiter.reset()
+    yield
+    log_writer.flush()
+    limiter.reset()
+    database.close_pools()
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    return MemoryBackend() if request.param == "memory" else SqliteBackend(str(tmp_path / "buckets.sqlite"))
+
+def test_parse_rate():
+    assert parse_rate("10/minute") == (10, 60)
+    assert parse_rate("5/hours") == (5, 3600)
+    assert parse_rate("") is None
+    with pytest.raises(ValueError):
+        parse_rate("ten/minute")
+
+def test_bucket_refills_over_time(backend):
+    assert [backend.consume("k", 2, 60, 1, 1000.0) for _ in range(2)] == [0, 0]
+    assert backend.consume("k", 2, 60, 1, 1000.0) == pytest.approx(30)
+    assert backend.consume("k", 2, 60, 1, 1030.0) == 0
+    # A cost above the capacity waits for a full bucket rather than forever.
+    assert backend.consume("other", 2, 60, 5, 1000.0) == 0
+
+def test_slots_cap_concurrency(backend):
+    first = backend.acquire("k", 2, 1000.0)
+    assert backend.acquire("k", 2, 1000.0)
+    assert backend.acquire("k", 2, 1000.0) is None
+    backend.release("k", first)
+    assert backend.acquire("k", 2, 1000.0)
+
+def test_tool_returns_429_with_retry_after(db, monkeypatch):
+    monkeypatch.setitem(app.config, "RATELIMIT_TOOL", "2/minute")
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+        assert client.get('/tool-1').status_code == 200  # GETs aren't limited.
+        assert [client.post('/tool-1', data={"text_input": "a b"}).status_code for _ in range(3)] == [200, 200, 429]
+        rv = client.post('/tool-1', data={"text_input": "a b"}, headers={"Accept": "application/json"})
+        assert rv.status_code == 429
+        assert int(rv.headers["Retry-After"]) > 0 and rv.get_json()["retry_after"] > 0
+        metrics = client.get('/metrics').data.decode()
+    assert limiter.stats == {('word_count', 'allowed'): 2, ('word_count', 'rate'): 2}
+    assert 'ratelimit_rejected_total{scope="word_count",limit="rate"} 2' in metrics
+
+def test_concurrent_requests_are_capped(db, monkeypatch):
+    monkeypatch.setitem(app.config, "RATELIMIT_TOOL_MAX_CONCURRENT", 1)
+    responses = []
+
+    @rate_limit('slow', max_concurrent='RATELIMIT_TOOL_MAX_CONCURRENT')
+    def view():
+        # A second request while this one is still running.
+        responses.append(inner())
+        return "done"
+
+    @rate_limit('slow', max_concurrent='RATELIMIT_TOOL_MAX_CONCURRENT')
+    def inner():
+        return "inner"
+
+    with app.test_request_context('/', method='POST'):
+        g.user = {'id': 1}
+        assert view() == "done"
+        assert responses[0].status_code == 429
+        assert inner() == "inner"  # The slot was released.
+    assert limiter.stats[('slow', 'concurrency')] == 1
+
+def test_active_jobs_cap_sitemap_submissions(db):
+    for job_id in ("a", "b"):
+        jobs.create_job(job_id, "sitemap_processor", user_id=1)
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+        rv = client.post('/tools/sitemap-processor', data={"sitemap_url": "https://example.com/sitemap.xml"})
+    assert rv.status_code == 429 and rv.headers["Retry-After"]
+    assert limiter.stats == {('sitemap_processor', 'jobs'): 1}
+
+def test_disabled_limiter_lets_everything_through(db, monkeypatch):
+    monkeypatch.setitem(app.config, "RATELIMIT_TOOL", "1/minute")
+    monkeypatch.setattr(limiter, "enabled", False)
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+        assert [client.post('/tool-1', data={"text_input": "a"}).status_code for _ in range(3)] == [200] * 3
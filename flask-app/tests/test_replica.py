@@ -0,0 +1,115 @@
+import time
+import sqlite3
+import pytest
+from client_labs import database, replica
+from client_labs.app import app, user_cache, LOG_COMMIT_MARGIN_SECONDS
+from client_labs.log_writer import log_writer
+from client_labs.migrations import migrate
+from client_labs.replica import ReplicaClient
+
+@pytest.fixture
+def primary(tmp_path, monkeypatch):
+    # A file: database stands in for the remote primary.
+    monkeypatch.setenv("TURSO_DATABASE_URL", f"file:{tmp_path / 'primary.db'}")
+    migrate()
+    with database.get_db_connection() as client:
+        client.execute("INSERT INTO users (id, email, name) VALUES (1, 'a@example.com', 'Ann')")
+        client.execute("INSERT INTO logs (tool_name, input_data) VALUES ('word_count', 'hello')")
+    yield
+    database.close_pools()
+
+@pytest.fixture
+def local(tmp_path, monkeypatch, primary):
+    path = str(tmp_path / 'replica' / 'replica.db')
+    monkeypatch.setenv("DB_REPLICA_PATH", path)
+    yield replica.get_replica()
+    replica._replicas.clear()
+
+def on_replica(current, sql, args=()):
+    client = current.client()
+    assert isinstance(client, ReplicaClient)
+    return [tuple(row) for row in client.execute(sql, args).rows]
+
+def test_full_then_incremental_sync(local):
+    assert local.client() is None  # Never synced: reads go to the primary.
+    assert local.sync()['full']
+    assert on_replica(local, "SELECT id, name FROM users") == [(1, 'Ann')]
+
+    with database.get_db_connection() as client:
+        client.execute("INSERT INTO users (id, email, name) VALUES (2, 'b@example.com', 'Bob')")
+        client.execute("UPDATE users SET name = 'Anne' WHERE id = 1")
+        client.execute("DELETE FROM logs")
+    summary = local.sync()
+    assert not summary['full'] and summary['changes'] == 3
+    assert on_replica(local, "SELECT id, name FROM users ORDER BY id") == [(1, 'Anne'), (2, 'Bob')]
+    assert on_replica(local, "SELECT COUNT(*) FROM logs") == [(0,)]
+
+    with pytest.raises(sqlite3.OperationalError):
+        local.client().execute("DELETE FROM users")
+
+def test_trimmed_change_log_forces_full_sync(local):
+    local.sync()
+    with database.get_db_connection() as client:
+        for i in range(3):
+            client.execute("INSERT INTO logs (tool_name) VALUES (?)", (f"tool-{i}",))
+        client.execute("UPDATE replica_changes SET changed_at = '2000-01-01 00:00:00'")
+        replica.trim_changes(client, 60)
+        assert client.execute("SELECT COUNT(*) FROM replica_changes").rows[0][0] == 1
+    assert local.sync()['full']
+    assert on_replica(local, "SELECT COUNT(*) FROM logs") == [(4,)]
+
+def test_stale_or_behind_replica_falls_back(local):
+    local.sync()
+    synced_through = local.synced_through()
+    assert local.client(written_at=synced_through - 1) is not None
+    assert local.client(written_at=time.time() + 1) is None
+    local.max_lag = 0
+    time.sleep(0.01)
+    assert local.client() is None
+    assert local.stats['fallbacks'] == 2
+
+def test_triggers_are_only_installed_by_replicas(primary):
+    with database.get_db_connection() as client:
+        assert client.execute("SELECT COUNT(*) FROM replica_changes").rows[0][0] == 0
+        assert not replica.triggers_installed(client)
+
+def test_read_your_writes(local, monkeypatch):
+    app.config.update({"TESTING": True, "SECRET_KEY": "test_secret", "USER_SESSION_SNAPSHOT": False})
+    user_cache.clear()
+    local.sync()
+    reads = []
+    read_connection = database.get_read_connection
+    def recording(written_at=None):
+        client = read_connection(written_at)
+        reads.append('replica' if isinstance(client, ReplicaClient) else 'primary')
+        return client
+    monkeypatch.setattr(database, "get_read_connection", recording)
+    monkeypatch.setattr(log_writer, "mode", "async")
+    monkeypatch.setattr(log_writer, "flush_interval", 0.05)
+
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+        assert client.get('/logs').status_code == 200
+        started = time.monotonic()
+        assert client.post('/tool-1', data={'text_input': 'one two'}).status_code == 200
+        assert time.monotonic() - started < LOG_COMMIT_MARGIN_SECONDS  # Didn't wait for the flush.
+        # The new log row isn't on the replica yet, so this session reads the primary.
+        log_writer.flush()
+        rv = client.get('/logs')
+        assert b'one two' in rv.data
+        local.sync()  # Started before the writer's flush deadline: still not trusted.
+        client.get('/logs')
+        time.sleep(0.05 + LOG_COMMIT_MARGIN_SECONDS)
+        local.sync()
+        client.get('/logs')
+    assert reads == ['replica', 'replica', 'primary', 'primary', 'replica']
+    user_cache.clear()
+
+def test_cli(local):
+    runner = app.test_cli_runner()
+    assert 'Full sync' in runner.invoke(replica.sync_replica_command).output
+    assert 'Synced: 0 changes' in runner.invoke(replica.sync_replica_command).output
+    runner.invoke(replica.sync_replica_command, ['--uninstall'])
+    with database.get_db_connection() as client:
+        assert not replica.triggers_installed(client)
@@ -0,0 +1,104 @@
+import io
+import os
+import json
+import time
+from client_labs.app import app
+from client_labs import jobs
+from client_labs.log_writer import log_writer
+from client_labs.database import init_db, get_db_connection
+from client_labs.blueprints.sitemap_tool.result_cache import ResultCache, job_cache_key
+from client_labs.blueprints.sitemap_tool.tasks import process_sitemap_job
+
+def test_cache_round_trip_and_lru_eviction(tmp_path):
+    source = tmp_path / "job"
+    source.mkdir()
+    (source / "out.json").write_text("x" * 100)
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=10_000, max_entries=2)
+    keys = [job_cache_key({"old_sitemap": str(i)}, {}) for i in range(3)]
+
+    cache.put(keys[0], "first", str(source), ["out.json"])
+    cache.put(keys[1], "second", str(source), ["out.json"])
+    past = time.time() - 60
+    os.utime(tmp_path / "cache" / keys[1], (past, past))
+    assert cache.get(keys[0])[0] == "first"  # Touching keeps it recently used.
+    cache.put(keys[2], "third", str(source), ["out.json"])
+
+    assert cache.get(keys[1]) is None
+    restored = tmp_path / "restored"
+    restored.mkdir()
+    assert cache.restore(keys[0], str(restored)) == "first"
+    assert (restored / "out.json").read_text() == "x" * 100
+
+    cache.max_bytes = 150
+    cache.evict()
+    assert len([name for name in os.listdir(tmp_path / "cache")]) == 1
+
+def test_identical_sitemap_jobs_are_served_from_cache(tmp_path, monkeypatch):
+    app.config.update({
+        "TESTING": True,
+        "SECRET_KEY": "test_secret",
+        "WTF_CSRF_ENABLED": False,
+        "SITEMAP_SCRATCH_DIR": str(tmp_path / "scratch"),
+        "SITEMAP_CACHE_DIR": str(tmp_path / "cache"),
+    })
+    jobs.job_queue.configure(backend='inline')
+    with get_db_connection() as db_client:
+        for table in ("users", "logs", "jobs", "schema_version"):
+            db_client.execute(f"DROP TABLE IF EXISTS {table}")
+    init_db()
+    with get_db_connection() as db_client:
+        db_client.execute("INSERT INTO users (id, email) VALUES (?, ?)", (1, "test@example.com"))
+
+    sitemap = json.dumps({"startUrl": ["https://a.example/1", "https://a.example/2"]}).encode()
+    results = []
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+        for _ in range(2):
+            rv = client.post('/tools/sitemap-processor', data={
+                'job_name': 'Cached',
+                'new_sitemap_filename': 'new.json',
+                'old_sitemap_file': (io.BytesIO(sitemap), 'old.xml'),
+                'empty_pages_file': (io.BytesIO(b"https://a.example/2\n"), 'empty.txt'),
+            }, headers={'Accept': 'application/json'}, content_type='multipart/form-data')
+            job_id = rv.get_json()["job_id"]
+            results.append(jobs.get_job(job_id)["result"])
+            assert (tmp_path / "scratch" / job_id / "new.json").exists()
+    app.config.update({"SITEMAP_SCRATCH_DIR": None, "SITEMAP_CACHE_DIR": None})
+
+    assert results[0] == results[1]
+    log_writer.flush()
+    with get_db_connection() as db_client:
+        rows = db_client.execute("SELECT input_data FROM logs ORDER BY id").rows
+    assert rows[0][0].endswith("Cache: miss")
+    assert rows[1][0].endswith("Cache: hit")
+
+class FakeContext:
+    job_id = "job"
+    def report_progress(self, *args, **kwargs):
+        pass
+
+def test_unreadable_cache_entry_falls_back_to_a_run(tmp_path):
+    with get_db_connection() as db_client:
+        for table in ("logs", "schema_version"):
+            db_client.execute(f"DROP TABLE IF EXISTS {table}")
+    init_db()
+    cache_config = {"root": str(tmp_path / "cache")}
+    key = "a" * 64
+    broken = tmp_path / "cache" / key
+    broken.mkdir(parents=True)
+    (broken / "result.txt").write_text("stale")
+    (broken / "manifest.json").write_text("{not json")
+    work = tmp_path / "work"
+    work.mkdir()
+    (work / "old.xml").write_text('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                                  '<url><loc>https://a.example/1</loc></url></urlset>')
+    (work / "empty.txt").write_text("")
+
+    result = process_sitemap_job(FakeContext(), "Job", str(work), "old.xml", "empty.txt", "new.xml",
+                                 cache_key=key, cache_config=cache_config)
+    assert result != "stale" and (work / "new.xml").exists()
+    assert ResultCache(**cache_config).get(key)[0] == result  # Replaced by the fresh run.
+    log_writer.flush()
+    with get_db_connection() as db_client:
+        assert db_client.execute("SELECT input_data FROM logs").rows[0][0].endswith("Cache: miss")
@@ -0,0 +1,73 @@
+import io
+import gzip
+import zipfile
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+from client_labs.blueprints.sitemap_tool import engine
+from client_labs.blueprints.sitemap_tool.engine import DigestSet, process_sitemaps
+
+NS = {'sm': engine.SITEMAP_NS}
+
+def urlset(urls):
+    body = ''.join(f'<url><loc>{escape(url)}</loc><lastmod>2025-01-01</lastmod></url>' for url in urls)
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="{engine.SITEMAP_NS}">{body}</urlset>'.encode()
+
+def sitemap_index(locs):
+    body = ''.join(f'<sitemap><loc>{loc}</loc></sitemap>' for loc in locs)
+    return f'<?xml version="1.0"?><sitemapindex xmlns="{engine.SITEMAP_NS}">{body}</sitemapindex>'.encode()
+
+def locs(path):
+    return [loc.text for loc in ElementTree.parse(path).getroot().iterfind('.//sm:loc', NS)]
+
+def test_digest_set_spills_to_disk(tmp_path):
+    urls = DigestSet(str(tmp_path / 'set.sqlite'), max_in_memory=10)
+    assert all(urls.add(f'https://a.example/{i}') for i in range(25))
+    assert not urls.add('https://a.example/3')
+    assert 'https://a.example/24' in urls and 'https://a.example/99' not in urls
+    assert len(urls) == 25
+    urls.close()
+    assert not (tmp_path / 'set.sqlite').exists()
+
+def test_plain_sitemap_is_filtered_deduplicated_and_merged(tmp_path):
+    (tmp_path / 'old.xml').write_bytes(urlset([
+        'https://a.example/1', 'https://a.example/2', 'https://a.example/1', 'https://a.example/3&x=1']))
+    (tmp_path / 'empty.txt').write_text("Empty: https://a.example/2\n")
+    (tmp_path / 'new.txt').write_text("https://a.example/3&x=1\nhttps://a.example/4\n")
+
+    stats = process_sitemaps(str(tmp_path), 'old.xml', 'empty.txt', 'out.xml', 'new.txt')
+    assert stats['files'] == ['out.xml']
+    assert locs(tmp_path / 'out.xml') == ['https://a.example/1', 'https://a.example/3&x=1', 'https://a.example/4']
+    assert (stats['previous'], stats['removed'], stats['duplicates'], stats['added'], stats['total']) == (4, 1, 1, 1, 3)
+    assert "New Total URLs" in stats['summary']
+    lastmods = ElementTree.parse(tmp_path / 'out.xml').getroot().findall('.//sm:lastmod', NS)
+    assert len(lastmods) == 2
+
+def test_zipped_index_with_gzipped_children_is_sharded(tmp_path):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('index.xml', sitemap_index([
+            'https://a.example/sitemaps/part-1.xml.gz',
+            'https://a.example/sitemaps/part-2.xml.gz',
+            'https://a.example/sitemaps/missing.xml.gz',
+        ]))
+        zf.writestr('part-1.xml.gz', gzip.compress(urlset(f'https://a.example/p{i}' for i in range(7))))
+        zf.writestr('part-2.xml.gz', gzip.compress(urlset(f'https://a.example/p{i}' for i in range(5, 12))))
+    (tmp_path / 'old.zip').write_bytes(archive.getvalue())
+    (tmp_path / 'empty.txt').write_text("https://a.example/p0\n")
+
+    stats = process_sitemaps(str(tmp_path), 'old.zip', 'empty.txt', 'out.xml', max_urls=4, max_in_memory=3)
+    assert stats['child_sitemaps'] == 2
+    assert stats['missing_children'] == ['https://a.example/sitemaps/missing.xml.gz']
+    assert stats['total'] == 11
+    assert stats['files'] == ['out.xml', 'out-00001.xml', 'out-00002.xml', 'out-00003.xml']
+    assert locs(tmp_path / 'out.xml') == ['out-00001.xml', 'out-00002.xml', 'out-00003.xml']
+    merged = [loc for name in stats['files'][1:] for loc in locs(tmp_path / name)]
+    assert merged == [f'https://a.example/p{i}' for i in range(1, 12)]
+
+def test_source_detection(tmp_path):
+    (tmp_path / 'a.xml').write_bytes(b'\xef\xbb\xbf\n' + urlset(['https://a.example/']))
+    (tmp_path / 'b.xml').write_bytes(gzip.compress(urlset(['https://a.example/'])))
+    (tmp_path / 'c.xml').write_bytes(b'{"startUrl": []}')
+    assert engine.is_xml_source(str(tmp_path / 'a.xml'))
+    assert engine.is_xml_source(str(tmp_path / 'b.xml'))
+    assert not engine.is_xml_source(str(tmp_path / 'c.xml'))
@@ -0,0 +1,45 @@
+import os
+import sys
+import json
+import subprocess
+from benchmarks import importtime
+
+def test_heavy_dependencies_load_on_first_use():
+    code = (
+        "import sys, json\n"
+        "import client_labs.app as m\n"
+        "m.create_app('config.TestingConfig')\n"
+        "print(json.dumps(sorted(sys.modules)))\n"
+    )
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    loaded = {name.split('.')[0] for name in json.loads(out.strip().splitlines()[-1])}
+    assert not loaded & set(importtime.FORBIDDEN)
+
+def load_config(**env):
+    """Imports config in a fresh interpreter with ``env`` set, as .env.example would."""
+    code = (
+        "import json, config\n"
+        f"print(json.dumps({{key: getattr(config.Config, key) for key in {sorted(env)!r}}}))\n"
+    )
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                         env={**os.environ, **env}).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def test_empty_optional_settings_mean_unset():
+    assert load_config(BATCH_MAX_WORKERS='') == {'BATCH_MAX_WORKERS': None}
+    assert load_config(BATCH_MAX_WORKERS='3') == {'BATCH_MAX_WORKERS': 3}
+    assert load_config(PASSWORD_WORK_FACTOR='', PASSWORD_MAX_CONCURRENCY='') == {
+        'PASSWORD_MAX_CONCURRENCY': None, 'PASSWORD_WORK_FACTOR': None}
+
+def test_lazy_oauth_registers_on_first_use():
+    from client_labs.app import app, oauth
+    from client_labs.oauth_client import CachedOAuth2App
+    with app.app_context():
+        assert isinstance(oauth.google, CachedOAuth2App)
+        assert oauth.google.client_id == app.config.get('GOOGLE_CLIENT_ID')
+
+def test_parse_importtime():
+    stderr = ("import time: self [us] | cumulative | imported package\n"
+              "import time:       120 |        120 |   json.decoder\n"
+              "import time:       300 |        420 | json\n")
+    assert importtime.parse_importtime(stderr) == [(120, 'json.decoder'), (420, 'json')]
@@ -0,0 +1,94 @@
+import io
+import pytest
+from client_labs.app import app
+from client_labs.tools import TextStats, analyze_text, analyze_stream, word_count
+from client_labs.log_writer import log_writer
+from client_labs.database import init_db, get_db_connection
+
+SAMPLE = "The quick brown fox.\nThe lazy dog, the END\n\nfin"
+
+def test_word_count_matches_split():
+    assert word_count("This is a test.") == 4
+    assert word_count("") == 0
+    assert word_count(None) == 0
+    assert word_count("  spaced\tout words \n") == len("  spaced\tout words \n".split())
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_chunk_boundaries_do_not_change_results(chunk_size):
+    stats = analyze_text(SAMPLE, chunk_size=chunk_size).as_dict()
+    assert stats["words"] == len(SAMPLE.split())
+    assert stats["characters"] == len(SAMPLE)
+    assert stats["lines"] == len(SAMPLE.splitlines())
+    assert stats["unique_words"] == 8
+    assert stats["top_words"][0] == ("the", 3)
+
+def test_stream_decodes_multibyte_characters_across_chunks():
+    text = "naïve café résumé " * 1000
+    stats = analyze_stream(io.BytesIO(text.encode()), chunk_size=5)
+    assert stats.words == 3000
+    assert stats.characters == len(text)
+    assert stats.top_words(1) == [("naïve", 1000)]
+
+def test_vocabulary_is_bounded():
+    stats = TextStats(max_vocabulary=100)
+    for i in range(1000):
+        stats.feed(f"common word{i} ")
+    stats.close()
+    assert stats.words == 2000
+    assert stats.approximate
+    assert len(stats._frequencies) <= 100
+    assert stats.top_words(1) == [("common", 1000)]
+
+def test_tool_1_accepts_uploads_and_logs_a_preview():
+    app.config.update({"TESTING": True, "SECRET_KEY": "test_secret", "WTF_CSRF_ENABLED": False})
+    with get_db_connection() as db_client:
+        db_client.execute("DROP TABLE IF EXISTS users")
+        db_client.execute("DROP TABLE IF EXISTS logs")
+        db_client.execute("DROP TABLE IF EXISTS schema_version")
+    init_db()
+    with get_db_connection() as db_client:
+        db_client.execute("INSERT INTO users (id, email) VALUES (?, ?)", (1, "test@example.com"))
+
+    document = ("word " * 200 + "\n") * 500
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+        rv = client.post('/tool-1', data={
+            'text_input': '',
+            'text_file': (io.BytesIO(document.encode()), 'doc.txt'),
+        }, content_type='multipart/form-data')
+    assert rv.status_code == 200
+    assert b"The number of words is: 100000" in rv.data
+    assert b"Lines: 500" in rv.data
+
+    log_writer.flush()
+    with get_db_connection() as db_client:
+        input_data, output_data = db_client.execute(
+            "SELECT input_data, output_data FROM logs WHERE tool_name = 'word_count'").rows[0]
+    assert output_data == "100000"
+    assert len(input_data) < 1100
+    assert input_data.endswith(f"[{len(document)} characters in total]")
+
+def test_tool_1_points_oversized_pastes_to_the_upload_field(monkeypatch):
+    app.config.update({"TESTING": True, "SECRET_KEY": "test_secret", "WTF_CSRF_ENABLED": False})
+    monkeypatch.setitem(app.config, "MAX_FORM_MEMORY_SIZE", 10_000)
+    with get_db_connection() as db_client:
+        db_client.execute("DROP TABLE IF EXISTS users")
+        db_client.execute("DROP TABLE IF EXISTS schema_version")
+    init_db()
+    with get_db_connection() as db_client:
+        db_client.execute("INSERT INTO users (id, email) VALUES (?, ?)", (1, "test@example.com"))
+
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+        rv = client.post('/tool-1', data={'text_input': "word " * 5000}, content_type='multipart/form-data')
+        assert rv.status_code == 413
+        assert b"Upload long documents as a file" in rv.data
+
+        # Large pastes within the limit are counted but not echoed back.
+        monkeypatch.setitem(app.config, "MAX_FORM_MEMORY_SIZE", 500_000)
+        rv = client.post('/tool-1', data={'text_input': "word " * 5000})
+    assert b"The number of words is: 5000" in rv.data
+    assert b"word word" not in rv.data
+    log_writer.flush()
@@ -0,0 +1,89 @@
+import io
+import os
+import re
+import time
+import pytest
+from client_labs.app import app
+from client_labs.database import init_db, get_db_connection
+from client_labs.jobs import create_job, get_job, set_status, RUNNING, QUEUED, CANCELLED
+from client_labs.blueprints.sitemap_tool.workspace import sweep_job_dirs
+
+@pytest.fixture
+def client(tmp_path):
+    app.config.update({
+        "TESTING": True,
+        "SECRET_KEY": "test_secret",
+        "WTF_CSRF_ENABLED": False,
+        "SITEMAP_SCRATCH_DIR": str(tmp_path / "scratch"),
+        "MAX_UPLOAD_FILE_BYTES": 1024,
+    })
+    with get_db_connection() as db_client:
+        db_client.execute("DROP TABLE IF EXISTS users")
+        db_client.execute("DROP TABLE IF EXISTS jobs")
+        db_client.execute("DROP TABLE IF EXISTS schema_version")
+    init_db()
+    with get_db_connection() as db_client:
+        db_client.execute("INSERT INTO users (id, email) VALUES (?, ?)", (1, "test@example.com"))
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+        yield client
+    app.config.update({"SITEMAP_SCRATCH_DIR": None, "MAX_UPLOAD_FILE_BYTES": 32 * 1024 * 1024})
+
+def test_oversized_upload_is_rejected_while_streaming(client, tmp_path):
+    rv = client.post('/tools/sitemap-processor', data={
+        'job_name': 'Too big',
+        'new_sitemap_filename': 'new.xml',
+        'old_sitemap_file': (io.BytesIO(b"x" * 4096), 'old.xml'),
+        'empty_pages_file': (io.BytesIO(b"https://a.example/\n"), 'empty.txt'),
+    }, content_type='multipart/form-data')
+    assert rv.status_code == 413
+    assert not (tmp_path / "scratch").exists()
+
+def make_workspace(root, name, size, age):
+    path = root / name
+    path.mkdir(parents=True)
+    (path / "data").write_bytes(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path / "data", (mtime, mtime))
+    os.utime(path, (mtime, mtime))
+    return path
+
+def test_sweeper_respects_age_quota_and_active_jobs(client, tmp_path):
+    root = tmp_path / "sweep"
+    old = make_workspace(root, "old-job", 100, age=3600)
+    running = make_workspace(root, "running-job", 100, age=3600)
+    mid = make_workspace(root, "mid-job", 300, age=600)
+    new = make_workspace(root, "new-job", 300, age=300)
+    fresh = make_workspace(root, "fresh-job", 300, age=5)
+    create_job("running-job", "sitemap_processor")
+    set_status("running-job", RUNNING, (QUEUED,))
+
+    summary = sweep_job_dirs(str(root), max_age=1800, max_total_bytes=800)
+
+    assert not old.exists()
+    assert running.exists()
+    assert not mid.exists()
+    assert new.exists()
+    assert fresh.exists()
+    assert summary == {'removed': 2, 'bytes_freed': 400, 'bytes_kept': 700}
+
+def test_sweeper_keeps_workspaces_still_being_written(client, tmp_path):
+    # A cancelled job's status is finished, but its thread may still be writing.
+    root = tmp_path / "sweep"
+    stale = make_workspace(root, "cancelled-job", 100, age=3600)
+    (stale / "shard-2.xml").write_bytes(b"x")
+    assert sweep_job_dirs(str(root), max_age=1800)['removed'] == 0
+    assert stale.exists()
+
+def test_cancelling_a_job_needs_a_csrf_token(client, monkeypatch):
+    monkeypatch.setitem(app.config, "WTF_CSRF_ENABLED", True)
+    create_job("csrf-job", "sitemap_processor", user_id=1)
+    cancel_url = '/tools/sitemap-processor/jobs/csrf-job/cancel'
+    assert client.post(cancel_url).status_code == 400
+    assert get_job("csrf-job")["status"] == QUEUED
+
+    page = client.get('/tools/sitemap-processor/jobs/csrf-job').get_data(as_text=True)
+    token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+    assert client.post(cancel_url, data={'csrf_token': token}).status_code == 302
+    assert get_job("csrf-job")["status"] == CANCELLED
@@ -0,0 +1,84 @@
+import pytest
+from client_labs import app as app_module
+from client_labs.app import app, user_cache
+from client_labs.cache import TTLCache
+from client_labs.database import init_db, get_db_connection
+
+@pytest.fixture
+def client(monkeypatch):
+    app.config.update({
+        "TESTING": True,
+        "SECRET_KEY": "test_secret",
+        "WTF_CSRF_ENABLED": False,
+        "USER_SESSION_SNAPSHOT": False,
+    })
+    user_cache.clear()
+    with app.app_context():
+        with get_db_connection() as db_client:
+            db_client.execute("DROP TABLE IF EXISTS users")
+            db_client.execute("DROP TABLE IF EXISTS logs")
+            db_client.execute("DROP TABLE IF EXISTS schema_version")
+        init_db()
+        with get_db_connection() as db_client:
+            db_client.execute(
+                "INSERT INTO users (id, email, name) VALUES (?, ?, ?)",
+                (1, "test@example.com", "Test User")
+            )
+
+    lookups = []
+    fetch_user = app_module.fetch_user
+    def counting_fetch_user(user_id):
+        lookups.append(user_id)
+        return fetch_user(user_id)
+    monkeypatch.setattr(app_module, "fetch_user", counting_fetch_user)
+
+    with app.test_client() as client:
+        client.lookups = lookups
+        yield client
+    user_cache.clear()
+
+def test_user_is_loaded_once_per_ttl(client):
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+
+    assert client.get('/').status_code == 200
+    assert client.get('/protected').status_code == 200
+    assert client.lookups == [1]
+
+def test_static_requests_skip_user_lookup(client):
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+
+    rv = client.get('/client_labs/static/client_labs.css')
+    assert rv.status_code == 200
+    assert client.lookups == []
+
+def test_session_snapshot_skips_lookup(client):
+    app.config["USER_SESSION_SNAPSHOT"] = True
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['user'] = {'id': 1, 'email': 'test@example.com', 'name': 'Test User', 'google_id': None}
+
+    assert client.get('/').status_code == 200
+    assert client.lookups == []
+
+def test_logout_invalidates_cached_user(client):
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+    client.get('/')
+    assert user_cache.get(1) is not None
+
+    client.get('/logout')
+    assert user_cache.get(1) is None
+
+def test_ttl_cache_expiry_and_lru_eviction():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+
+    cache.set('d', 4, ttl=0)
+    assert cache.get('d') is None